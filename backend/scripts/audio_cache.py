@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Shared cache of downloaded YouTube audio.
+
+Entries are keyed by video ID and audio format (plus the section, for a
+partial download) and hold the native stream yt-dlp fetched - opus in
+webm or AAC in m4a - without re-encoding, so every consumer converts
+from the same file once instead of downloading the video again.
+Downloads land in a temp dir inside the cache and are moved into place
+atomically. Each entry has a lock file: a download holds it exclusively,
+readers hold it shared while they use the file, and eviction skips
+entries that are locked. The total size is capped; least recently used
+entries are evicted first. Several processes may share one cache
+directory, and hit/miss/download/eviction counts are kept across them.
+
+Node services call the CLI, which prints paths as JSON. convert runs
+ffmpeg on the cached file while holding its lock, so the entry cannot be
+evicted mid-read; fetch only returns the path, which another process may
+evict at any time after:
+
+    python3 audio_cache.py convert "https://www.youtube.com/watch?v=..." \
+        --output "/tmp/audio/{video_id}.wav" --ffmpeg-args="-ar 16000 -ac 1"
+    python3 audio_cache.py fetch "https://www.youtube.com/watch?v=..."
+    python3 audio_cache.py stats
+    python3 audio_cache.py evict --max-mb 5000
+"""
+
+import os
+import argparse
+import fcntl
+import json
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_AUDIO_CACHE_DIR = os.path.expanduser(os.getenv('AUDIO_CACHE_DIR', '~/.cache/sayitownit/audio'))
+DEFAULT_AUDIO_CACHE_MAX_MB = int(os.getenv('AUDIO_CACHE_MAX_MB', 10240))
+# Extra yt-dlp arguments for every download, e.g. "--cookies-from-browser firefox"
+DEFAULT_YTDLP_ARGS = os.getenv('AUDIO_CACHE_YTDLP_ARGS', '')
+
+# yt-dlp format selectors; 'best' prefers opus, the smaller stream YouTube serves
+AUDIO_FORMATS = {
+    'best': 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio',
+    'opus': 'bestaudio[acodec=opus]',
+    'm4a': 'bestaudio[ext=m4a]'
+}
+
+VIDEO_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+VIDEO_ID_IN_URL = re.compile(r'(?:v=|youtu\.be/|/shorts/|/live/|/embed/)([A-Za-z0-9_-]{11})')
+
+STATS_FILE = 'stats.json'
+
+
+def video_id_from_url(url):
+    """The 11 character YouTube video ID in a watch/short/live URL, or the argument if it already is one."""
+    if VIDEO_ID.match(url):
+        return url
+    match = VIDEO_ID_IN_URL.search(url)
+    if not match:
+        raise ValueError(f'No YouTube video ID in {url}')
+    return match.group(1)
+
+
+def entry_key(video_id, fmt='best', section=None):
+    """Cache key of a video's audio in a format, optionally only the (start, end) seconds section."""
+    if not VIDEO_ID.match(video_id):
+        raise ValueError(f'Not a YouTube video ID: {video_id}')
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f'Unknown audio format {fmt}; choose from {", ".join(AUDIO_FORMATS)}')
+    key = f'{video_id}.{fmt}'
+    if section:
+        key += f'.{section_spec(section)}'
+    return key
+
+
+def section_spec(section):
+    """START-END seconds of a section, as in its cache key and yt-dlp's --download-sections."""
+    return f'{section[0]:g}-{section[1]:g}'
+
+
+class AudioCache:
+    """Downloaded audio files with a size cap and LRU eviction (recency is the file mtime)."""
+
+    def __init__(self, cache_dir=DEFAULT_AUDIO_CACHE_DIR, max_bytes=DEFAULT_AUDIO_CACHE_MAX_MB * 1024 * 1024,
+                 ytdlp_args=DEFAULT_YTDLP_ARGS):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ytdlp_args = shlex.split(ytdlp_args) if isinstance(ytdlp_args, str) else list(ytdlp_args)
+        self.stats = {'hits': 0, 'misses': 0, 'downloads': 0, 'downloaded_bytes': 0, 'evictions': 0}
+
+    def entry_dir(self, key):
+        return self.dir / key[:2]
+
+    def lock_path(self, key):
+        return self.entry_dir(key) / f'{key}.lock'
+
+    def lookup(self, key):
+        """Path of the stored entry, or None; its extension is whatever container yt-dlp fetched."""
+        for path in self.entry_dir(key).glob(f'{glob_escape(key)}.*'):
+            if path.suffix != '.lock' and path.name.count('.') == key.count('.') + 1:
+                return path
+        return None
+
+    @contextmanager
+    def lock(self, key, shared=False, blocking=True):
+        """Hold the entry's lock; yields False instead when blocking=False and it is taken."""
+        path = self.lock_path(key)
+        path.parent.mkdir(exist_ok=True)
+        with open(path, 'a') as f:
+            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(f, mode if blocking else mode | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def fetch(self, video_id, url=None, fmt='best', section=None):
+        """Path to the cached audio, downloading it first on a miss.
+
+        Concurrent fetches of the same entry download it once; the others
+        wait for the lock and then hit.
+        """
+        with self.lock(entry_key(video_id, fmt, section)):
+            return self.fetch_locked(video_id, url, fmt, section)
+
+    @contextmanager
+    def reading(self, video_id, url=None, fmt='best', section=None):
+        """Fetch the audio and keep it from being evicted until the with block ends."""
+        key = entry_key(video_id, fmt, section)
+        while True:
+            with self.lock(key):
+                self.fetch_locked(video_id, url, fmt, section)
+            # An evictor may win the gap between the two locks; then fetch again
+            with self.lock(key, shared=True):
+                path = self.lookup(key)
+                if path is not None:
+                    yield path
+                    return
+
+    def convert(self, video_id, output, ffmpeg_args=(), url=None, fmt='best', section=None):
+        """Convert the cached audio to output with ffmpeg while it is held; returns the cached path."""
+        with self.reading(video_id, url, fmt, section) as path:
+            cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-i', str(path), '-vn', *ffmpeg_args, '-y', str(output)]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f'ffmpeg failed: {result.stderr.strip()}')
+            return path
+
+    def fetch_locked(self, video_id, url, fmt, section):
+        key = entry_key(video_id, fmt, section)
+        path = self.lookup(key)
+        if path is not None:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                path = None
+        if path is not None:
+            self.record('hits')
+            return path
+
+        self.record('misses')
+        path = self.download(key, url or f'https://www.youtube.com/watch?v={video_id}', fmt, section)
+        self.record('downloads')
+        self.record('downloaded_bytes', path.stat().st_size)
+        self.evict()
+        return path
+
+    def download(self, key, url, fmt, section):
+        """Download the native audio stream into a temp dir, then move it into the cache atomically."""
+        downloads = self.dir / '.downloads'
+        downloads.mkdir(exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=downloads))
+        try:
+            cmd = ['yt-dlp', '-f', AUDIO_FORMATS[fmt], '--no-playlist', '-o', str(tmp_dir / 'audio.%(ext)s')]
+            if section:
+                cmd += ['--download-sections', f'*{section_spec(section)}']
+            cmd += self.ytdlp_args + [url]
+            print(f"Downloading {fmt} audio of {url} into the audio cache", file=sys.stderr)
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f'yt-dlp failed: {result.stderr.strip()}')
+
+            files = [p for p in tmp_dir.iterdir() if p.suffix not in ('.part', '.ytdl')]
+            if len(files) != 1:
+                raise RuntimeError(f'yt-dlp left {len(files)} files for {url}, expected one')
+            path = self.entry_dir(key) / f'{key}{files[0].suffix}'
+            os.replace(files[0], path)
+            return path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def scan(self):
+        """{path: (mtime, size)} of every stored entry."""
+        entries = {}
+        for path in self.dir.glob('*/*'):
+            if path.parent.name.startswith('.') or path.suffix == '.lock':
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries[path] = (stat.st_mtime, stat.st_size)
+        return entries
+
+    def size(self):
+        return sum(size for _, size in self.scan().values())
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache fits in max_bytes; entries in use are kept."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.scan()
+        total = sum(size for _, size in entries.values())
+        for path, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= max_bytes:
+                break
+            key = path.name[:-len(path.suffix)]
+            with self.lock(key, blocking=False) as locked:
+                if not locked:
+                    continue
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    # Another process evicted it first
+                    continue
+            total -= size
+            self.record('evictions')
+
+    def record(self, stat, count=1):
+        """Count in this process's stats and in the totals shared by every process using the cache."""
+        self.stats[stat] += count
+        path = self.dir / STATS_FILE
+        with open(self.dir / f'{STATS_FILE}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            totals = self.totals()
+            totals[stat] = totals.get(stat, 0) + count
+            fd, tmp_path = tempfile.mkstemp(dir=self.dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(totals, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    def totals(self):
+        try:
+            with open(self.dir / STATS_FILE, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def summary(self):
+        entries = self.scan()
+        return {
+            **self.stats,
+            'totals': self.totals(),
+            'entries': len(entries),
+            'size_mb': round(sum(size for _, size in entries.values()) / (1024 * 1024), 2),
+            'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+            'dir': str(self.dir)
+        }
+
+
+def glob_escape(text):
+    return re.sub(r'([*?\[])', r'[\1]', text)
+
+
+def add_audio_cache_arguments(parser):
+    parser.add_argument('--audio-cache-dir', default=DEFAULT_AUDIO_CACHE_DIR, help='Shared audio cache directory')
+    parser.add_argument('--audio-cache-max-mb', type=int, default=DEFAULT_AUDIO_CACHE_MAX_MB,
+                        help='Audio cache size cap in MB (LRU eviction)')
+
+
+def open_audio_cache(args):
+    """Build the cache from parsed add_audio_cache_arguments() options."""
+    return AudioCache(args.audio_cache_dir, args.audio_cache_max_mb * 1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch audio through, inspect or trim the shared audio cache')
+    parser.add_argument('command', choices=['convert', 'fetch', 'stats', 'evict'])
+    parser.add_argument('url', nargs='?', help='YouTube URL or video ID (convert, fetch)')
+    parser.add_argument('--output', default=None,
+                        help='File to convert to; {video_id} is replaced by the video ID (convert)')
+    parser.add_argument('--ffmpeg-args', default='',
+                        help='ffmpeg output arguments, e.g. --ffmpeg-args="-ar 16000 -ac 1" (convert)')
+    parser.add_argument('--format', default='best', choices=list(AUDIO_FORMATS), help='Audio format to fetch')
+    parser.add_argument('--section', default=None, metavar='START-END',
+                        help='Fetch only this part of the video, in seconds')
+    parser.add_argument('--ytdlp-args', default=DEFAULT_YTDLP_ARGS,
+                        help='Extra yt-dlp arguments, e.g. --ytdlp-args="--cookies-from-browser firefox"')
+    parser.add_argument('--max-mb', type=int, default=None, help='Size cap in MB to evict down to (evict)')
+    add_audio_cache_arguments(parser)
+
+    args = parser.parse_args()
+
+    cache = AudioCache(args.audio_cache_dir, args.audio_cache_max_mb * 1024 * 1024, args.ytdlp_args)
+    try:
+        if args.command in ('convert', 'fetch'):
+            if not args.url:
+                parser.error(f'{args.command} needs a URL or video ID')
+            if args.command == 'convert' and not args.output:
+                parser.error('convert needs --output')
+            video_id = video_id_from_url(args.url)
+            url = args.url if '/' in args.url else None
+            section = tuple(float(part) for part in args.section.split('-', 1)) if args.section else None
+            if args.command == 'convert':
+                output = Path(args.output.replace('{video_id}', video_id))
+                output.parent.mkdir(parents=True, exist_ok=True)
+                source = cache.convert(video_id, output, shlex.split(args.ffmpeg_args), url, args.format, section)
+                print(json.dumps({'path': str(output), 'source': str(source), 'hit': cache.stats['hits'] > 0,
+                                  'size_mb': round(output.stat().st_size / (1024 * 1024), 2)}))
+                return
+            path = cache.fetch(video_id, url, args.format, section)
+            print(json.dumps({'path': str(path), 'hit': cache.stats['hits'] > 0,
+                              'size_mb': round(path.stat().st_size / (1024 * 1024), 2)}))
+            return
+        if args.command == 'evict':
+            cache.evict(None if args.max_mb is None else args.max_mb * 1024 * 1024)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
+    print(json.dumps(cache.summary(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
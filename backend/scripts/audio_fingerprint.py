@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Landmark audio fingerprints for finding the same broadcast in several videos.
+
+Zee Business often publishes overlapping live streams on one day (a long
+"First Trade" stream and a shorter "Share Bazaar Live" cut of the same
+feed). Each transcribed video stores compact spectral-peak pair hashes and
+its segments under <fingerprint dir>/<group>/, where the group is usually
+the upload date. A later video of the same group looks its chunks up in
+that index; transcribe_batch.py --dedupe-group reuses that video's
+segments for any chunk whose audio is found there instead of decoding it.
+
+Hashes pack (anchor bin, target bin, frame distance) into 24 bits and are
+kept with the anchor frame, so a match also gives the time offset between
+the two videos. Re-encoding and small level changes keep most peaks.
+"""
+
+import os
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+DEFAULT_FINGERPRINT_DIR = os.path.expanduser(
+    os.getenv('TRANSCRIBE_FINGERPRINT_DIR', '~/.cache/sayitownit/fingerprints'))
+
+SAMPLE_RATE = 16000
+N_FFT = 1024
+HOP = 512  # 32 ms frames
+MAX_BIN = 512  # only bins below 8 kHz (all of them at 16 kHz); 9 bits
+# Spectral peaks must be the maximum of this many frames x bins around them
+PEAK_FRAMES = 15
+PEAK_BINS = 15
+# Each anchor peak is paired with this many following peaks within MAX_DT frames
+FAN_OUT = 3
+MAX_DT = 63  # 6 bits, about 2 s
+
+# A chunk is a duplicate when at least this many hashes agree on one offset...
+MIN_MATCHES = 20
+# ...and they are at least this share of the chunk's hashes
+MIN_MATCH_RATIO = 0.05
+
+
+def fingerprint(samples, start_frame=0):
+    """Return (hashes, frames) of float32 samples; frames are absolute when start_frame is given."""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    samples = np.asarray(samples, dtype=np.float32)
+    count = (len(samples) - N_FFT) // HOP + 1
+    if count < 2:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int64)
+
+    frames = sliding_window_view(samples, N_FFT)[::HOP][:count]
+    spectrum = np.log(np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1))[:, :MAX_BIN] + 1e-6)
+
+    # Local maxima over a frames x bins neighbourhood (a separable max filter),
+    # above the loudness of their own frame
+    padded = np.pad(spectrum, ((PEAK_FRAMES // 2,), (PEAK_BINS // 2,)), mode='constant', constant_values=-np.inf)
+    neighbourhood = sliding_window_view(padded, PEAK_FRAMES, axis=0).max(axis=-1)
+    neighbourhood = sliding_window_view(neighbourhood, PEAK_BINS, axis=1).max(axis=-1)
+    peaks = (spectrum == neighbourhood) & (spectrum > spectrum.mean(axis=1, keepdims=True) + 2.0)
+    peak_frames, peak_bins = np.nonzero(peaks)
+
+    hashes, anchors = [], []
+    for step in range(1, FAN_OUT + 1):
+        dt = peak_frames[step:] - peak_frames[:-step]
+        valid = (dt > 0) & (dt <= MAX_DT)
+        hashes.append((peak_bins[:-step][valid].astype(np.uint32) << 15)
+                      | (peak_bins[step:][valid].astype(np.uint32) << 6)
+                      | dt[valid].astype(np.uint32))
+        anchors.append(peak_frames[:-step][valid])
+
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.int64) + start_frame
+
+
+def seconds_to_frames(seconds):
+    return int(round(seconds * SAMPLE_RATE / HOP))
+
+
+def frames_to_seconds(frames):
+    return frames * HOP / SAMPLE_RATE
+
+
+def chunk_start(chunk, chunk_seconds):
+    """Start of a chunk within its video; chunk files are chunk_seconds apart."""
+    return chunk.describe().get('start_time', chunk.index * chunk_seconds)
+
+
+class VideoPrint:
+    """Fingerprints and transcript of one video."""
+
+    def __init__(self, video_id, hashes, frames, transcript):
+        import numpy as np
+
+        order = np.argsort(hashes, kind='stable')
+        self.video_id = video_id
+        self.hashes = hashes[order]
+        self.frames = frames[order]
+        self.transcript = transcript
+        self.ranges = merge_ranges(transcript.get('ranges', []))
+
+    def offset_for(self, hashes, frames):
+        """Frame offset of this video relative to the query, or None if it does not match."""
+        import numpy as np
+
+        if not len(hashes) or not len(self.hashes):
+            return None
+        left = np.searchsorted(self.hashes, hashes, side='left')
+        right = np.searchsorted(self.hashes, hashes, side='right')
+        hits = right - left
+        if not hits.sum():
+            return None
+
+        # Every (query hash, reference hash) pair votes for one time offset
+        query = np.repeat(np.arange(len(hashes)), hits)
+        reference = np.concatenate([np.arange(l, r) for l, r in zip(left[hits > 0], right[hits > 0])])
+        deltas = self.frames[reference] - frames[query]
+        values, counts = np.unique(deltas, return_counts=True)
+        best = counts.argmax()
+        if counts[best] < MIN_MATCHES or counts[best] < MIN_MATCH_RATIO * len(hashes):
+            return None
+        return int(values[best])
+
+    def covers(self, start, end):
+        """Whether [start, end) seconds lies in the part of this video that was transcribed."""
+        return any(s <= start + 0.5 and end - 0.5 <= e for s, e in self.ranges)
+
+    def excerpt(self, start, end):
+        """Segments whose midpoint falls in [start, end) seconds, relative to start."""
+        segments = []
+        for segment in self.transcript.get('segments', []):
+            middle = (segment['start'] + segment['end']) / 2
+            if start <= middle < end:
+                segments.append({
+                    **segment,
+                    'start': round(max(segment['start'] - start, 0.0), 3),
+                    'end': round(min(segment['end'], end) - start, 3)
+                })
+        return segments
+
+    def language_at(self, time):
+        for s, e, language, probability in self.transcript.get('languages', []):
+            if s <= time < e:
+                return language, probability
+        return None, None
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 0.5:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class FingerprintStore:
+    """<dir>/<group>/<video_id>.npz (hashes) and .json (transcript) for each transcribed video.
+
+    The transcript holds the transcribed time ranges, segments and per-range
+    language, all in seconds from the start of the video.
+    """
+
+    def __init__(self, fingerprint_dir, group):
+        self.dir = Path(fingerprint_dir) / group
+
+    def load_others(self, video_id):
+        import numpy as np
+
+        videos = []
+        if not self.dir.exists():
+            return videos
+        for path in sorted(self.dir.glob('*.npz')):
+            if path.stem == video_id:
+                continue
+            try:
+                with np.load(path) as data:
+                    hashes, frames = data['hashes'], data['frames']
+                with open(path.with_suffix('.json'), encoding='utf-8') as f:
+                    transcript = json.load(f)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable fingerprints {path}: {e}", file=sys.stderr)
+                continue
+            videos.append(VideoPrint(path.stem, hashes, frames, transcript))
+        return videos
+
+    def save(self, video_id, hashes, frames, transcript):
+        import numpy as np
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # The transcript is written last: a video counts as indexed once both files exist
+        self.write(self.dir / f'{video_id}.npz',
+                   lambda f: np.savez_compressed(f, hashes=hashes.astype(np.uint32), frames=frames.astype(np.int64)))
+        self.write(self.dir / f'{video_id}.json',
+                   lambda f: f.write(json.dumps(transcript, ensure_ascii=False).encode('utf-8')))
+
+    @staticmethod
+    def write(path, dump):
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                dump(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find where the audio of one recording appears in another')
+    parser.add_argument('reference', help='Chunk directory or 16 kHz mono WAV/raw PCM file to search in')
+    parser.add_argument('query', help='Chunk directory or 16 kHz mono WAV/raw PCM file whose chunks are looked up')
+    parser.add_argument('--chunk-seconds', type=float, default=30, help='Chunk length')
+
+    args = parser.parse_args()
+
+    import numpy as np
+    from audio_source import load_chunks
+
+    reference = load_chunks(args.reference, args.chunk_seconds)
+    prints = [fingerprint(chunk.samples(), seconds_to_frames(chunk_start(chunk, args.chunk_seconds)))
+              for chunk in reference]
+    video = VideoPrint(args.reference, np.concatenate([h for h, _ in prints]),
+                       np.concatenate([f for _, f in prints]), {})
+
+    for chunk in load_chunks(args.query, args.chunk_seconds):
+        start = chunk_start(chunk, args.chunk_seconds)
+        hashes, frames = fingerprint(chunk.samples(), seconds_to_frames(start))
+        offset = video.offset_for(hashes, frames)
+        print(json.dumps({
+            'chunk_index': chunk.index,
+            'start_time': start,
+            'hashes': len(hashes),
+            'reference_time': round(start + frames_to_seconds(offset), 3) if offset is not None else None
+        }))
+
+
+if __name__ == '__main__':
+    main()
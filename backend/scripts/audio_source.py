@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Audio inputs for transcribe_batch.py.
+
+Either a directory of chunk_XXX.wav files written by ffmpeg, or a single
+16 kHz mono PCM stream (raw or WAV) that is memory-mapped and cut into
+windows without temporary files. Window samples are NumPy views into the
+mapping, so the OS page cache serves repeated passes over the same audio.
+"""
+
+import os
+import hashlib
+import struct
+from pathlib import Path
+
+from transcription_cache import audio_digest
+
+SAMPLE_RATE = 16000
+
+# Raw PCM formats accepted with --pcm-format, as NumPy dtypes
+PCM_DTYPES = {'s16le': '<i2', 'f32le': '<f4'}
+DTYPE_SIZES = {'<i2': 2, '<f4': 4}
+
+
+class ChunkFile:
+    """One chunk_XXX.wav file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.name = self.path.name
+        self.index = int(self.path.stem.split('_')[1])
+
+    def source(self):
+        """What to hand to model.transcribe(): faster-whisper decodes the file itself."""
+        return str(self.path)
+
+    def samples(self):
+        return load_samples(self.path)
+
+    def identity(self):
+        """Changes whenever the chunk file is rewritten, even with audio of the same length."""
+        stat = self.path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def digest(self):
+        return audio_digest(self.path)
+
+    def describe(self):
+        return {'chunk_index': self.index, 'file': self.name}
+
+
+def read_wav_header(path):
+    """Return (dtype, data_offset, data_bytes) for a 16 kHz mono PCM16 or float32 WAV."""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise ValueError(f'{path} is not a WAV file')
+        riff, _, wave = struct.unpack('<4sI4s', header)
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError(f'{path} is not a WAV file')
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f'{path} has no data chunk')
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+
+            if chunk_id == b'fmt ':
+                data = f.read(chunk_size + (chunk_size & 1))
+                if len(data) < 16:
+                    raise ValueError(f'{path} has a truncated fmt chunk')
+                audio_format, channels, rate, _, _, bits = struct.unpack('<HHIIHH', data[:16])
+                if audio_format == 0xFFFE and chunk_size >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE: the real format leads the sub-format GUID
+                    audio_format = struct.unpack('<H', data[24:26])[0]
+                fmt = (audio_format, channels, rate, bits)
+            elif chunk_id == b'data':
+                offset = f.tell()
+                # ffmpeg writing to a pipe leaves the size unset
+                if chunk_size in (0, 0xFFFFFFFF) or offset + chunk_size > file_size:
+                    chunk_size = file_size - offset
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+    return wav_dtype(path, fmt), offset, chunk_size
+
+
+def read_wav_stream_header(f, name):
+    """Read a WAV header from a pipe (no seeking) and return the sample dtype.
+
+    f is left at the first sample.
+    """
+    def read(size):
+        data = b''
+        while len(data) < size:
+            block = f.read(size - len(data))
+            if not block:
+                raise ValueError(f'{name} ended inside the WAV header')
+            data += block
+        return data
+
+    riff, _, wave = struct.unpack('<4sI4s', read(12))
+    if riff != b'RIFF' or wave != b'WAVE':
+        raise ValueError(f'{name} is not a WAV stream')
+
+    fmt = None
+    while True:
+        chunk_id, chunk_size = struct.unpack('<4sI', read(8))
+        if chunk_id == b'data':
+            return wav_dtype(name, fmt)
+        data = read(chunk_size + (chunk_size & 1))
+        if chunk_id == b'fmt ':
+            if len(data) < 16:
+                raise ValueError(f'{name} has a truncated fmt chunk')
+            audio_format, channels, rate, _, _, bits = struct.unpack('<HHIIHH', data[:16])
+            if audio_format == 0xFFFE and chunk_size >= 26:
+                audio_format = struct.unpack('<H', data[24:26])[0]
+            fmt = (audio_format, channels, rate, bits)
+
+
+def wav_dtype(path, fmt):
+    """NumPy dtype of a 16 kHz mono PCM16 or float32 WAV format chunk."""
+    if fmt is None:
+        raise ValueError(f'{path} has no fmt chunk')
+    audio_format, channels, rate, bits = fmt
+    if channels != 1 or rate != SAMPLE_RATE:
+        raise ValueError(f'{path} must be 16 kHz mono (got {rate} Hz, {channels} channels); '
+                         'convert with: ffmpeg -i in -ar 16000 -ac 1 -c:a pcm_s16le out.wav')
+    if (audio_format, bits) == (1, 16):
+        return '<i2'
+    if (audio_format, bits) == (3, 32):
+        return '<f4'
+    raise ValueError(f'{path} must be 16-bit PCM or 32-bit float (format {audio_format}, {bits} bits)')
+
+
+def load_samples(path, start=0):
+    """float32 samples of an audio file at 16 kHz, from sample start on.
+
+    16 kHz mono WAVs (what ffmpeg writes for chunks) are memory-mapped
+    directly, and only the samples from start on are converted; anything
+    else goes through faster-whisper's decoder.
+    """
+    if Path(path).suffix.lower() == '.wav':
+        try:
+            pcm = PcmFile(path)
+            return ChunkWindow(pcm, 0, min(start, pcm.length), pcm.length).samples()
+        except ValueError:
+            pass
+
+    from faster_whisper import decode_audio
+    return decode_audio(str(path), sampling_rate=SAMPLE_RATE)[start:]
+
+
+class PcmFile:
+    """A 16 kHz mono PCM stream, memory-mapped on first access.
+
+    Pickles without the mapping, so worker processes map the file themselves
+    instead of receiving a copy of the audio.
+    """
+
+    def __init__(self, path, pcm_format='s16le'):
+        """WAV files are parsed; anything else is raw PCM in pcm_format."""
+        self.path = str(path)
+        self.size = os.path.getsize(path)
+        if Path(path).suffix.lower() == '.wav':
+            self.dtype, self.offset, data_bytes = read_wav_header(path)
+        else:
+            self.dtype, self.offset, data_bytes = PCM_DTYPES[pcm_format], 0, self.size
+        self.length = data_bytes // DTYPE_SIZES[self.dtype]
+        self._samples = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_samples'] = None
+        return state
+
+    @property
+    def samples(self):
+        if self._samples is None:
+            import numpy as np
+            self._samples = np.memmap(self.path, dtype=self.dtype, mode='r',
+                                      offset=self.offset, shape=(self.length,))
+        return self._samples
+
+    def windows(self, chunk_seconds=30, overlap_seconds=0):
+        """Cut the stream into windows of chunk_seconds that overlap by overlap_seconds."""
+        size = int(chunk_seconds * SAMPLE_RATE)
+        hop = size - int(overlap_seconds * SAMPLE_RATE)
+        if size <= 0 or hop <= 0:
+            raise ValueError('Chunk length must be positive and longer than the overlap')
+
+        windows = []
+        start = 0
+        while start < self.length:
+            windows.append(ChunkWindow(self, len(windows), start, min(start + size, self.length)))
+            if start + size >= self.length:
+                break
+            start += hop
+        return windows
+
+
+class ChunkWindow:
+    """Samples [start, end) of a PcmFile."""
+
+    def __init__(self, pcm, index, start, end):
+        self.pcm = pcm
+        self.index = index
+        self.start = start
+        self.end = end
+        self.name = f'window_{index:05d}'
+
+    def view(self):
+        return self.pcm.samples[self.start:self.end]
+
+    def samples(self):
+        """float32 samples; a zero-copy view for f32le input, one window-sized copy for s16le."""
+        import numpy as np
+
+        view = self.view()
+        if view.dtype == np.float32:
+            return view
+        return np.divide(view, 32768.0, dtype=np.float32)
+
+    def source(self):
+        return self.samples()
+
+    def identity(self):
+        return [self.pcm.size, self.start, self.end]
+
+    def digest(self):
+        digest = hashlib.sha256(self.pcm.dtype.encode('ascii'))
+        digest.update(self.view())
+        return digest.hexdigest()
+
+    def describe(self):
+        return {
+            'chunk_index': self.index,
+            'file': self.name,
+            'start_time': self.start / SAMPLE_RATE,
+            'end_time': self.end / SAMPLE_RATE
+        }
+
+
+def load_chunks(audio_path, chunk_seconds=30, overlap_seconds=0, pcm_format='s16le'):
+    """Chunks for a chunk directory or a single PCM/WAV file, in chunk_index order."""
+    path = Path(audio_path)
+    if path.is_dir():
+        return sorted((ChunkFile(chunk_path) for chunk_path in path.glob('chunk_*.wav')),
+                      key=lambda chunk: chunk.index)
+    return PcmFile(path, pcm_format).windows(chunk_seconds, overlap_seconds)
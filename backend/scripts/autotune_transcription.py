@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Find the fastest transcription settings for this machine and save them.
+
+Runs a short calibration with benchmark_transcription.py's isolated cells
+and searches in three stages:
+
+1. compute type, one process using every physical core;
+2. worker process count x cpu_threads (CPU only), all processes decoding
+   at once, scored by combined x real-time;
+3. ctranslate2 num_workers for the transcription server, that many jobs
+   decoding concurrently in one process.
+
+The winners go to the per-host config that transcribe.py,
+transcribe_batch.py and transcribe_server.py read (see host_tuning.py).
+Every measured cell is kept in a report in benchmark_transcription.py's
+format; each result holds its full cell, so rerunning it with the same
+corpus arguments reproduces the measurement.
+
+    python3 autotune_transcription.py --model large-v3
+    python3 autotune_transcription.py --model small --dry-run   # report only
+"""
+
+import os
+import argparse
+import json
+import platform
+import socket
+import sys
+import time
+
+from benchmark_transcription import cell_result, markdown_table, start_cell
+from decode_profiles import DEFAULT_PROFILE
+from host_tuning import DEFAULT_HOST_CONFIG, physical_cores, save_host_config
+
+# Compute types tried per device, first is the fallback if all fail
+COMPUTE_TYPES = {
+    'cpu': ['int8', 'int8_float32', 'float32'],
+    'cuda': ['float16', 'int8_float16', 'int8']
+}
+
+
+def process_counts(cores, max_processes):
+    """1, 2, 4, ... worker processes, while each keeps at least one core."""
+    counts = []
+    processes = 1
+    while processes <= min(cores, max_processes):
+        counts.append(processes)
+        processes *= 2
+    return counts
+
+
+def run_processes(cell, processes, args, stage):
+    """Run the same cell in that many processes at once; one record with their combined throughput."""
+    started = [start_cell(cell, args) for _ in range(processes)]
+    records = [cell_result(process, cell) for process in started]
+
+    failed = [record for record in records if 'error' in record]
+    if failed:
+        return {**cell, 'processes': processes, 'stage': stage, 'error': failed[0]['error']}
+
+    decode_seconds = max(record['decode_seconds'] for record in records)
+    audio_seconds = sum(record['audio_seconds'] for record in records)
+    segments = sum(record['segments'] for record in records)
+    return {
+        **cell,
+        'processes': processes,
+        'stage': stage,
+        'load_seconds': max(record['load_seconds'] for record in records),
+        'audio_seconds': round(audio_seconds, 3),
+        'decode_seconds': round(decode_seconds, 3),
+        'rtf': round(decode_seconds / audio_seconds, 4) if audio_seconds else None,
+        'throughput': round(audio_seconds / decode_seconds, 2) if decode_seconds else None,
+        'segments': segments,
+        'segments_per_second': round(segments / decode_seconds, 3) if decode_seconds else None,
+        'peak_rss_mb': round(sum(record['peak_rss_mb'] for record in records), 1)
+    }
+
+
+def best(records):
+    usable = [record for record in records if 'error' not in record and record.get('throughput')]
+    return max(usable, key=lambda record: record['throughput'], default=None)
+
+
+def report_progress(record):
+    if 'error' in record:
+        print(f"  failed: {record['error']}", file=sys.stderr)
+    else:
+        print(f"  {record['throughput']}x real-time (RTF {record['rtf']}), "
+              f"peak RSS {record['peak_rss_mb']:.0f} MB", file=sys.stderr)
+
+
+def autotune(args, device):
+    physical = physical_cores()
+    logical = os.cpu_count() or physical
+    results = []
+
+    def measure(stage, processes=1, **changes):
+        cell = {'model': args.model, 'device': device, 'compute_type': changes.get('compute_type'),
+                'profile': args.profile, 'beam_size': 0, 'cpu_threads': changes.get('cpu_threads', 0),
+                'num_workers': changes.get('num_workers', 1), 'batch_size': 1}
+        print(f"[{stage}] {processes} x {json.dumps(cell)}", file=sys.stderr)
+        record = run_processes(cell, processes, args, stage)
+        report_progress(record)
+        results.append(record)
+        return record
+
+    # 1. Compute type, one process on all physical cores
+    threads = physical if device == 'cpu' else 0
+    single = best([measure('compute_type', compute_type=compute_type, cpu_threads=threads)
+                   for compute_type in args.compute_types])
+    if single is None:
+        raise RuntimeError('Every compute type failed; see the report for errors')
+    compute_type = single['compute_type']
+
+    # 2. Worker processes x cpu_threads
+    batch = single
+    if device == 'cpu':
+        for processes in process_counts(physical, args.max_processes):
+            for threads in sorted({max(1, physical // processes), max(1, logical // processes)}):
+                if processes == 1 and threads == single['cpu_threads']:
+                    continue
+                record = measure('processes', processes, compute_type=compute_type, cpu_threads=threads)
+                if processes == 1 and record.get('throughput') and record['throughput'] > single['throughput']:
+                    single = record
+        batch = best([record for record in results if record['stage'] == 'processes'] + [single])
+
+    # 3. Concurrent server jobs in one process
+    server = single
+    for num_workers in args.num_workers:
+        threads = max(1, physical // num_workers) if device == 'cpu' else 0
+        record = measure('num_workers', compute_type=compute_type, cpu_threads=threads, num_workers=num_workers)
+        if record.get('throughput') and record['throughput'] > server['throughput']:
+            server = record
+
+    config = {
+        'host': socket.gethostname(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model': args.model,
+        'profile': args.profile,
+        'device': device,
+        'compute_type': compute_type,
+        'cpu_threads': single['cpu_threads'] or None,
+        'workers': batch['processes'],
+        'worker_cpu_threads': batch['cpu_threads'] or None,
+        'num_workers': server['num_workers'],
+        'server_cpu_threads': server['cpu_threads'] or None,
+        'throughput': {'single': single['throughput'], 'workers': batch['throughput'],
+                       'server': server['throughput']},
+        'cores': {'physical': physical, 'logical': logical}
+    }
+    return config, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune transcription settings for this host")
+    parser.add_argument('--model', default='large-v3', help='Model to calibrate with')
+    parser.add_argument('--device', default='auto', help='Device to tune (auto, cpu, cuda)')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, help='Decoding profile to calibrate with')
+    parser.add_argument('--profiles-file', default=None, help='TOML or JSON file with custom decoding profiles')
+    parser.add_argument('--compute-types', nargs='+', default=None,
+                        help='Compute types to try (default: int8/int8_float32/float32 on CPU, '
+                             'float16/int8_float16/int8 on CUDA)')
+    parser.add_argument('--max-processes', type=int, default=8, help='Most worker processes to try')
+    parser.add_argument('--num-workers', nargs='+', type=int, default=[2, 4],
+                        help='Server num_workers to try besides 1')
+    parser.add_argument('--corpus', default=None, help='Directory of audio files to calibrate with')
+    parser.add_argument('--synthetic-files', type=int, default=2, help='Synthetic fixtures when no --corpus is given')
+    parser.add_argument('--synthetic-seconds', type=float, default=30, help='Length of each synthetic fixture')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first synthetic fixture')
+    parser.add_argument('--no-vad', dest='vad', action='store_false',
+                        help='Decode everything instead of only what Silero VAD keeps')
+    parser.add_argument('--config', default=DEFAULT_HOST_CONFIG, help='Per-host config file to write')
+    parser.add_argument('--report', default=None,
+                        help='Calibration report JSON (default: next to --config, ending .report.json)')
+    parser.add_argument('--dry-run', action='store_true', help='Write the report but not the host config')
+
+    args = parser.parse_args()
+
+    from transcribe import resolve_device
+
+    device, _ = resolve_device(args.device, 'auto')
+    args.compute_types = args.compute_types or COMPUTE_TYPES.get(device, ['int8'])
+    report_path = args.report or os.path.splitext(args.config)[0] + '.report.json'
+
+    try:
+        config, results = autotune(args, device)
+    except RuntimeError as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
+    config['report'] = os.path.abspath(report_path)
+
+    report = {
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count(),
+                 'hostname': socket.gethostname()},
+        'corpus': args.corpus or {'synthetic_files': args.synthetic_files,
+                                  'synthetic_seconds': args.synthetic_seconds, 'seed': args.seed},
+        'vad': args.vad,
+        'profiles_file': args.profiles_file,
+        'command': [os.path.basename(sys.argv[0])] + sys.argv[1:],
+        'created_at': config['created_at'],
+        'results': results,
+        'config': config
+    }
+    save_host_config(report_path, report)
+    print(f"Report written to {report_path}", file=sys.stderr)
+    print(markdown_table(results), file=sys.stderr)
+
+    if not args.dry_run:
+        save_host_config(args.config, config)
+        print(f"Host config written to {args.config}", file=sys.stderr)
+    print(json.dumps(config, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Transcription benchmark across models, compute types, decoding profiles,
+beam sizes, cpu_threads, num_workers and batch sizes.
+
+Every combination runs in a fresh subprocess so load time and peak RSS
+belong to that combination alone. The corpus is either a directory of
+local audio files or deterministic synthetic speech-like fixtures (the
+same seed always gives the same audio), so runs on different days or
+hosts are comparable.
+
+    python3 benchmark_transcription.py --models tiny small --compute-types int8 float32 \\
+        --profiles fast balanced accurate --output bench.json --markdown bench.md
+    python3 benchmark_transcription.py ... --baseline bench.json   # exits 1 on regressions
+"""
+
+import os
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from transcription_metrics import peak_rss_mb
+
+SAMPLE_RATE = 16000
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.m4a', '.flac', '.ogg', '.opus', '.webm'}
+# Keywords BatchedInferencePipeline.transcribe() accepts (it has no **kwargs)
+PIPELINE_OPTIONS = (
+    'language', 'task', 'beam_size', 'best_of', 'patience', 'length_penalty', 'repetition_penalty',
+    'no_repeat_ngram_size', 'temperature', 'compression_ratio_threshold', 'log_prob_threshold',
+    'no_speech_threshold', 'initial_prompt', 'prefix', 'suppress_blank', 'suppress_tokens',
+    'without_timestamps', 'max_initial_timestamp', 'word_timestamps', 'prepend_punctuations',
+    'append_punctuations', 'multilingual', 'vad_filter', 'vad_parameters', 'max_new_tokens',
+    'chunk_length', 'clip_timestamps', 'hotwords', 'language_detection_threshold',
+    'language_detection_segments'
+)
+
+# Metrics compared against a baseline, and whether higher is worse
+COMPARED_METRICS = {'rtf': True, 'load_seconds': True, 'peak_rss_mb': True, 'segments_per_second': False}
+DEFAULT_TOLERANCE = 0.15
+
+
+def synthetic_speech(seconds, seed):
+    """Speech-like float32 audio: voiced syllables with a wandering pitch, pauses and a little noise."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    count = int(seconds * SAMPLE_RATE)
+    t = np.arange(count) / SAMPLE_RATE
+
+    # A new pitch every 250 ms, syllables at about 4 Hz, phrases separated by pauses
+    pitch = np.repeat(rng.uniform(90, 260, count // 4000 + 1), 4000)[:count]
+    phase = np.cumsum(2 * np.pi * pitch / SAMPLE_RATE)
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)), 0, None)
+    phrases = np.repeat(rng.uniform(size=count // 32000 + 1) > 0.2, 32000)[:count]
+    voice = np.sin(phase) + 0.5 * np.sin(2 * phase) + 0.25 * np.sin(3 * phase)
+    audio = 0.3 * syllables * phrases * voice + 0.01 * rng.standard_normal(count)
+    return audio.astype(np.float32)
+
+
+def load_corpus(args):
+    """[(name, float32 samples)] from --corpus, or synthetic fixtures."""
+    if args.corpus:
+        from audio_source import load_samples
+
+        paths = sorted(path for path in Path(args.corpus).iterdir() if path.suffix.lower() in AUDIO_EXTENSIONS)
+        if not paths:
+            raise ValueError(f'No audio files found in {args.corpus}')
+        return [(path.name, load_samples(path)) for path in paths]
+
+    return [
+        (f'synthetic_{i}', synthetic_speech(args.synthetic_seconds, seed=args.seed + i))
+        for i in range(args.synthetic_files)
+    ]
+
+
+def run_cell(cell, corpus, vad, profiles_file=None):
+    """Benchmark one combination in this process. Returns its metrics."""
+    from decode_profiles import resolve_profile
+    from loop_guard import GuardedSegments, loop_report
+    from transcribe import iter_segments, load_model
+
+    options = dict(resolve_profile(cell['profile'], profiles_file))
+    if cell['beam_size']:
+        options['beam_size'] = cell['beam_size']
+    if not vad:
+        options = {**options, 'vad_filter': False}
+        options.pop('vad_parameters', None)
+
+    kwargs = {'cpu_threads': cell['cpu_threads']} if cell['cpu_threads'] else {}
+    num_workers = cell.get('num_workers', 1)
+    if num_workers > 1:
+        kwargs['num_workers'] = num_workers
+    started = time.perf_counter()
+    model = load_model(cell['model'], cell['device'], cell['compute_type'], **kwargs)
+    load_seconds = time.perf_counter() - started
+
+    pipeline = None
+    if cell['batch_size'] > 1:
+        from faster_whisper import BatchedInferencePipeline
+        pipeline = BatchedInferencePipeline(model=model)
+
+    def decode(name, audio):
+        """Segments kept and segments the loop guard suppressed"""
+        if pipeline:
+            segments, _ = pipeline.transcribe(audio, batch_size=cell['batch_size'], **batched_options)
+            if not loop_guard:
+                return sum(1 for _ in segments), 0
+            # Already decoded by the pipeline, so loops can only be dropped
+            segments = GuardedSegments(({'start': segment.start, 'end': segment.end, 'text': segment.text,
+                                         'avg_logprob': segment.avg_logprob,
+                                         'compression_ratio': segment.compression_ratio,
+                                         'no_speech_prob': segment.no_speech_prob} for segment in segments),
+                                       loop_guard)
+        else:
+            segments, _ = iter_segments(model, audio, None, label=name, options=options)
+        count = sum(1 for _ in segments)
+        loops = loop_report(segments)
+        return count, loops['suppressed_segments'] if loops else 0
+
+    # BatchedInferencePipeline.transcribe() takes only its own keywords
+    batched_options = {key: value for key, value in options.items() if key in PIPELINE_OPTIONS}
+    loop_guard = options.get('loop_guard')
+    started = time.perf_counter()
+    if num_workers > 1:
+        # Every worker decodes the whole corpus at the same time, as concurrent server jobs would
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            counts = list(executor.map(lambda item: decode(*item), corpus * num_workers))
+    else:
+        counts = [decode(name, audio) for name, audio in corpus]
+    segment_count = sum(kept for kept, _ in counts)
+    decode_seconds = time.perf_counter() - started
+    audio_seconds = num_workers * sum(len(audio) for _, audio in corpus) / SAMPLE_RATE
+
+    return {
+        'load_seconds': round(load_seconds, 3),
+        'audio_seconds': round(audio_seconds, 3),
+        'decode_seconds': round(decode_seconds, 3),
+        'rtf': round(decode_seconds / audio_seconds, 4) if audio_seconds else None,
+        'segments': segment_count,
+        'segments_per_second': round(segment_count / decode_seconds, 3) if decode_seconds else None,
+        'suppressed_segments': sum(suppressed for _, suppressed in counts),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def cell_key(cell):
+    return (cell['model'], cell['device'], cell['compute_type'], cell.get('profile', 'balanced'),
+            cell['beam_size'], cell['cpu_threads'], cell['batch_size'], cell.get('num_workers', 1))
+
+
+def spawn_cell(cell, args):
+    """Run one combination in a fresh interpreter and return its record."""
+    return cell_result(start_cell(cell, args), cell)
+
+
+def start_cell(cell, args):
+    """Start one combination in a fresh interpreter; several may run at once."""
+    command = [sys.executable, os.path.abspath(__file__), '--cell', json.dumps(cell)]
+    command += ['--corpus', args.corpus] if args.corpus else [
+        '--synthetic-files', str(args.synthetic_files),
+        '--synthetic-seconds', str(args.synthetic_seconds),
+        '--seed', str(args.seed)
+    ]
+    if not args.vad:
+        command.append('--no-vad')
+    if args.profiles_file:
+        command += ['--profiles-file', args.profiles_file]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+
+def cell_result(process, cell):
+    stdout, _ = process.communicate()
+    try:
+        metrics = json.loads(stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        metrics = {'error': f'exited with code {process.returncode} without a result'}
+    return {**cell, **metrics}
+
+
+def compare(results, baseline, tolerance):
+    """Mark each result with the metrics that regressed beyond tolerance against the baseline."""
+    previous = {cell_key(record): record for record in baseline.get('results', [])}
+    regressions = 0
+
+    for record in results:
+        before = previous.get(cell_key(record))
+        if before is None or 'error' in record or 'error' in before:
+            continue
+
+        record['regressions'] = {}
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, new = before.get(metric), record.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change if higher_is_worse else -change) > tolerance:
+                record['regressions'][metric] = {'baseline': old, 'current': new, 'change': round(change, 3)}
+        regressions += bool(record['regressions'])
+    return regressions
+
+
+def markdown_table(results):
+    lines = [
+        '| Model | Device | Compute | Profile | Beam | Threads | Workers | Batch | Load (s) | RTF | x real-time | Segments/s | Peak RSS (MB) | Regressions |',
+        '|---|---|---|---|---|---|---|---|---|---|---|---|---|---|'
+    ]
+    for record in results:
+        if 'error' in record:
+            metrics = ['-'] * 5 + [f"error: {record['error']}"]
+        else:
+            rtf = record['rtf']
+            metrics = [
+                f"{record['load_seconds']:.2f}",
+                f'{rtf:.4f}' if rtf is not None else '-',
+                f'{1 / rtf:.1f}' if rtf else '-',
+                f"{record['segments_per_second']:.2f}" if record['segments_per_second'] is not None else '-',
+                f"{record['peak_rss_mb']:.0f}",
+                ', '.join(f"{metric} {change['change']:+.0%}" for metric, change in record.get('regressions', {}).items())
+                or ('-' if 'regressions' in record else 'no baseline')
+            ]
+        lines.append('| ' + ' | '.join([
+            record['model'], record['device'], record['compute_type'], record['profile'],
+            str(record['beam_size'] or 'profile'),
+            str(record['cpu_threads'] or 'default'), str(record.get('num_workers', 1)), str(record['batch_size']),
+            *metrics
+        ]) + ' |')
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark faster-whisper transcription speed')
+    parser.add_argument('--models', nargs='+', default=['tiny', 'base', 'small'],
+                        help='Models to run (tiny, base, small, medium, large-v2, large-v3)')
+    parser.add_argument('--compute-types', nargs='+', default=['int8'], help='Compute types (int8, float32, float16)')
+    parser.add_argument('--profiles', nargs='+', default=['balanced'],
+                        help='Decoding profiles (fast, balanced, accurate, or from --profiles-file)')
+    parser.add_argument('--profiles-file', default=None, help='TOML or JSON file with custom decoding profiles')
+    parser.add_argument('--beam-sizes', nargs='+', type=int, default=[0],
+                        help="Beam sizes overriding the profile's (0: the profile's own)")
+    parser.add_argument('--cpu-threads', nargs='+', type=int, default=[0], help='ctranslate2 cpu_threads (0: default)')
+    parser.add_argument('--num-workers', nargs='+', type=int, default=[1],
+                        help='ctranslate2 num_workers; above 1 decodes that many copies of the corpus concurrently')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1],
+                        help='Batch sizes (above 1 uses the batched inference pipeline)')
+    parser.add_argument('--device', default='cpu', help='Device to use (cpu, cuda)')
+    parser.add_argument('--corpus', default=None, help='Directory of audio files to benchmark with')
+    parser.add_argument('--synthetic-files', type=int, default=3, help='Synthetic fixtures when no --corpus is given')
+    parser.add_argument('--synthetic-seconds', type=float, default=60, help='Length of each synthetic fixture')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first synthetic fixture')
+    parser.add_argument('--no-vad', dest='vad', action='store_false',
+                        help='Decode everything instead of only what Silero VAD keeps')
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    parser.add_argument('--markdown', default=None, help='Write the Markdown table here (default: stdout)')
+    parser.add_argument('--baseline', default=None, help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Relative change beyond which a metric counts as a regression')
+    parser.add_argument('--cell', default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    try:
+        corpus = load_corpus(args) if args.cell else None
+    except (OSError, ValueError) as e:
+        print(json.dumps({'error': str(e)}))
+        sys.exit(1)
+
+    # Child process: one combination, result on the last stdout line
+    if args.cell:
+        try:
+            print(json.dumps(run_cell(json.loads(args.cell), corpus, args.vad, args.profiles_file)))
+        except Exception as e:
+            print(json.dumps({'error': str(e)}))
+        return
+
+    cells = [
+        {'model': model, 'device': args.device, 'compute_type': compute_type, 'profile': profile,
+         'beam_size': beam_size, 'cpu_threads': cpu_threads, 'num_workers': num_workers, 'batch_size': batch_size}
+        for model, compute_type, profile, beam_size, cpu_threads, num_workers, batch_size in itertools.product(
+            args.models, args.compute_types, args.profiles, args.beam_sizes, args.cpu_threads, args.num_workers,
+            args.batch_sizes)
+    ]
+
+    results = []
+    for i, cell in enumerate(cells):
+        print(f"[{i+1}/{len(cells)}] {json.dumps(cell)}", file=sys.stderr)
+        record = spawn_cell(cell, args)
+        if 'error' in record:
+            print(f"  failed: {record['error']}", file=sys.stderr)
+        else:
+            print(f"  load {record['load_seconds']:.2f}s, RTF {record['rtf']}, "
+                  f"peak RSS {record['peak_rss_mb']:.0f} MB", file=sys.stderr)
+        results.append(record)
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    report = {
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'corpus': args.corpus or {'synthetic_files': args.synthetic_files,
+                                  'synthetic_seconds': args.synthetic_seconds, 'seed': args.seed},
+        'vad': args.vad,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+        'regressions': regressions if args.baseline else None
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    table = markdown_table(results)
+    if args.markdown:
+        Path(args.markdown).write_text(table, encoding='utf-8')
+        print(f"Table written to {args.markdown}", file=sys.stderr)
+    else:
+        print(table)
+
+    if regressions:
+        print(f"{regressions} combinations regressed beyond {args.tolerance:.0%} against {args.baseline}",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Named speed/accuracy decoding profiles for the faster-whisper scripts.
+
+A profile is the set of model.transcribe() options that trade speed for
+accuracy together: beam size, best_of, the temperature fallback ladder,
+condition_on_previous_text, without_timestamps and the Silero VAD
+thresholds. 'balanced' is what the scripts always used; the daily backlog
+can run on 'fast' and flagged videos on 'accurate'. Every profile also
+carries the hallucination-loop guard settings (loop_guard.py), which the
+scripts take out before calling faster-whisper.
+
+Custom profiles live in a TOML or JSON file whose top-level tables are
+profile names. A custom profile may name another profile to start from:
+
+    [market-hours]
+    base = "fast"
+    beam_size = 2
+    vad_parameters = { threshold = 0.4, min_silence_duration_ms = 300 }
+    loop_guard = { max_repeats = 4 }
+"""
+
+import os
+import argparse
+import json
+from pathlib import Path
+
+from loop_guard import DEFAULT_LOOP_GUARD
+
+DEFAULT_PROFILE = 'balanced'
+DEFAULT_PROFILES_FILE = os.getenv('TRANSCRIBE_PROFILES')
+
+PROFILES = {
+    'fast': {
+        'beam_size': 1,
+        'best_of': 1,
+        'temperature': [0.0, 0.4, 0.8],
+        'condition_on_previous_text': False,
+        'without_timestamps': True,
+        'vad_filter': True,
+        'vad_parameters': {'threshold': 0.6, 'min_silence_duration_ms': 300, 'speech_pad_ms': 200},
+        'loop_guard': DEFAULT_LOOP_GUARD
+    },
+    'balanced': {
+        'beam_size': 5,
+        'best_of': 5,
+        'temperature': [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        'condition_on_previous_text': True,
+        'without_timestamps': False,
+        'vad_filter': True,
+        'vad_parameters': {'min_silence_duration_ms': 500},
+        'loop_guard': DEFAULT_LOOP_GUARD
+    },
+    'accurate': {
+        'beam_size': 8,
+        'best_of': 5,
+        'temperature': [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        'condition_on_previous_text': True,
+        'without_timestamps': False,
+        'vad_filter': True,
+        'vad_parameters': {'threshold': 0.35, 'min_silence_duration_ms': 1000, 'speech_pad_ms': 600},
+        'loop_guard': DEFAULT_LOOP_GUARD
+    }
+}
+
+
+def load_profiles(path):
+    """Built-in profiles plus those defined in a TOML or JSON file."""
+    path = Path(path)
+    if path.suffix.lower() == '.toml':
+        import tomllib
+        with open(path, 'rb') as f:
+            custom = tomllib.load(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            custom = json.load(f)
+
+    if not isinstance(custom, dict) or not all(isinstance(options, dict) for options in custom.values()):
+        raise ValueError(f'{path} must map profile names to tables of decoding options')
+
+    profiles = dict(PROFILES)
+    for name, options in custom.items():
+        options = dict(options)
+        base = options.pop('base', None)
+        if base is not None and base not in profiles:
+            raise ValueError(f'Profile {name} in {path} is based on unknown profile {base}')
+        profiles[name] = merge_options(profiles.get(base, {}), options)
+    return profiles
+
+
+def merge_options(base, overrides):
+    """base with overrides applied; nested tables such as vad_parameters are merged key by key."""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = {**merged[key], **value}
+        merged[key] = value
+    return merged
+
+
+def resolve_profile(name=DEFAULT_PROFILE, profiles_file=DEFAULT_PROFILES_FILE):
+    """Decoding options of a named profile. Raises ValueError for unknown names or bad files."""
+    profiles = load_profiles(profiles_file) if profiles_file else PROFILES
+    if name not in profiles:
+        raise ValueError(f'Unknown profile {name} (available: {", ".join(sorted(profiles))})')
+    return profiles[name]
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', default=DEFAULT_PROFILE,
+                        help='Decoding profile: fast, balanced, accurate, or one from --profiles-file')
+    parser.add_argument('--profiles-file', default=DEFAULT_PROFILES_FILE,
+                        help='TOML or JSON file with custom decoding profiles')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show decoding profiles')
+    parser.add_argument('profile', nargs='?', default=None, help='Profile to show (default: all)')
+    parser.add_argument('--profiles-file', default=DEFAULT_PROFILES_FILE,
+                        help='TOML or JSON file with custom decoding profiles')
+
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profiles_file) if args.profiles_file else PROFILES
+    if args.profile:
+        print(json.dumps(resolve_profile(args.profile, args.profiles_file), indent=2))
+    else:
+        print(json.dumps(profiles, indent=2))
+
+
+if __name__ == '__main__':
+    main()
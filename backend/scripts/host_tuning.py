@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Per-host transcription settings found by autotune_transcription.py.
+
+The autotuner writes the fastest compute type, cpu_threads, worker process
+count and server num_workers it measured on this machine to
+~/.config/sayitownit/hosts/<hostname>.json (or TRANSCRIBE_HOST_CONFIG).
+transcribe.py, transcribe_batch.py and transcribe_server.py read it and use
+its values for whatever was left on auto; explicit flags always win, and
+settings tuned for another device are ignored.
+"""
+
+import os
+import json
+import sys
+from pathlib import Path
+
+DEFAULT_HOST_CONFIG = os.path.expanduser(
+    os.getenv('TRANSCRIBE_HOST_CONFIG', f'~/.config/sayitownit/hosts/{os.uname().nodename}.json'))
+
+
+def physical_cores():
+    """Count physical CPU cores (hyperthreads excluded), falling back to logical CPUs."""
+    try:
+        cores = set()
+        physical_id = None
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'physical id':
+                    physical_id = value.strip()
+                elif key == 'core id':
+                    cores.add((physical_id, value.strip()))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+
+def load_host_config(path=DEFAULT_HOST_CONFIG):
+    """This host's autotuned settings, or None if it has not been tuned."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable host config {path}: {e}", file=sys.stderr)
+        return None
+
+
+def host_settings(path, device, compute_type):
+    """Autotuned settings for a resolved device; {} when the host was not tuned for it.
+
+    compute_type is the one requested: the tuned compute type is only
+    returned when it is 'auto'.
+    """
+    config = load_host_config(path)
+    if not config or config.get('device') != device:
+        return {}
+    settings = dict(config)
+    if compute_type != 'auto':
+        settings.pop('compute_type', None)
+    print(f"Using autotuned settings from {path}", file=sys.stderr)
+    return settings
+
+
+def save_host_config(path, config):
+    import tempfile
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def add_host_config_arguments(parser):
+    parser.add_argument('--host-config', default=DEFAULT_HOST_CONFIG,
+                        help="Autotuned settings of this host (see autotune_transcription.py; '' to ignore)")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Online detection of Whisper hallucination loops.
+
+On music beds and crosstalk Whisper can emit the same phrase dozens of
+times; every repeat costs decode time and then ends up in the text sent
+to the LLM. GuardedSegments watches segments as the decoder yields them
+and flags:
+
+- repetition: the same text max_repeats times in a row (the first copy is kept);
+- phrase_loop: a phrase of two or more words repeated max_phrase_repeats
+  times in a row inside one segment;
+- compression_ratio: text more repetitive than max_compression_ratio;
+- no_speech: no_speech_prob above max_no_speech_prob while avg_logprob is
+  below -1.0, the way Whisper itself judges silence.
+
+The decode is abandoned at the first flagged segment, whatever was flagged
+is dropped, and decoding starts afresh (without the looping text as its
+context) at the next Silero VAD region, at most max_skip_seconds on. Each
+cut is recorded as a range with the segments suppressed and the seconds
+skipped.
+
+Profiles configure the guard under loop_guard (see decode_profiles.py);
+loop_guard = false turns it off.
+"""
+
+import re
+import sys
+
+SAMPLE_RATE = 16000
+
+DEFAULT_LOOP_GUARD = {
+    'max_repeats': 3,
+    'max_phrase_repeats': 4,
+    # Whisper retries at a higher temperature above 2.4; a segment still above it is a loop
+    'max_compression_ratio': 2.4,
+    'max_no_speech_prob': 0.6,
+    'max_skip_seconds': 30.0
+}
+
+# Whisper only trusts no_speech_prob when the text is also improbable
+NO_SPEECH_MAX_AVG_LOGPROB = -1.0
+# Shortest and longest phrase (in words) checked for repeats inside a segment. Single
+# words repeat in real speech ("haan haan haan haan"); a long run of one word is
+# caught by max_compression_ratio instead
+MIN_PHRASE_WORDS = 2
+MAX_PHRASE_WORDS = 8
+# Characters of the looping text kept in a flagged range
+FLAGGED_TEXT_CHARS = 80
+
+PUNCTUATION = re.compile(r'[\s.,!?;:।॥"\'()…-]+')
+
+
+def normalize(text):
+    return PUNCTUATION.sub(' ', text.lower()).strip()
+
+
+def phrase_repeats(words, min_words=MIN_PHRASE_WORDS, max_words=MAX_PHRASE_WORDS):
+    """Most times any phrase of min_words to max_words words repeats back to back.
+
+    A phrase of one word said over and over ("haan haan") is a single word
+    repeating, so it does not count either.
+    """
+    most = 1
+    for n in range(min_words, max_words + 1):
+        for i in range(len(words) - n):
+            if len(set(words[i:i + n])) == 1:
+                continue
+            repeats = 1
+            while words[i + repeats * n:i + (repeats + 1) * n] == words[i:i + n]:
+                repeats += 1
+            most = max(most, repeats)
+    return most
+
+
+class GuardedSegments:
+    """iter_segments()'s segments with hallucination loops cut out.
+
+    segments yields segment dicts. restart(samples) decodes the audio from
+    a later point and yields its segments; without it (segments that are
+    already decoded) flagged segments are only dropped. audio is the path
+    or samples being decoded, read for the VAD skip. Iterate once, then
+    report() says what was cut.
+    """
+
+    def __init__(self, segments, settings, restart=None, audio=None, vad_parameters=None):
+        settings = {} if settings is True else settings
+        unknown = set(settings) - set(DEFAULT_LOOP_GUARD)
+        if unknown:
+            raise ValueError(f'Unknown loop_guard settings: {", ".join(sorted(unknown))}')
+        self.settings = {**DEFAULT_LOOP_GUARD, **settings}
+        self.segments = segments
+        self.restart = restart
+        self.audio = audio
+        self.vad_parameters = vad_parameters or {}
+        self.suppressed_segments = 0
+        self.skipped_seconds = 0.0
+        self.ranges = []
+
+    def __iter__(self):
+        segments, offset, looped = self.segments, 0.0, None
+        while segments is not None:
+            segments, offset, looped = yield from self.watch(segments, offset, looped)
+
+    def suspicious(self, segment, text):
+        """Why one segment on its own is a hallucination, or None."""
+        settings = self.settings
+        if phrase_repeats(text.split()) >= settings['max_phrase_repeats']:
+            return 'phrase_loop'
+        if (segment.get('compression_ratio') or 0) > settings['max_compression_ratio']:
+            return 'compression_ratio'
+        if ((segment.get('no_speech_prob') or 0) > settings['max_no_speech_prob']
+                and (segment.get('avg_logprob') or 0) < NO_SPEECH_MAX_AVG_LOGPROB):
+            return 'no_speech'
+        return None
+
+    def watch(self, segments, offset, looped=None):
+        """Yield segments until one is flagged; returns the segments, offset and looping text to go on with.
+
+        looped is the text of a loop cut right before segments start: more
+        copies of it belong to that cut.
+        """
+        held = []  # repeats of the last text, not yet known to be a loop
+        last, looping = looped, looped is not None
+        for segment in segments:
+            if offset:
+                segment = {**segment, 'start': round(segment['start'] + offset, 3),
+                           'end': round(segment['end'] + offset, 3)}
+            text = normalize(segment['text'])
+            reason = self.suspicious(segment, text)
+
+            if reason is None and text and text == last:
+                if looping:
+                    self.extend(segment)
+                else:
+                    held.append(segment)
+                    if len(held) + 1 < self.settings['max_repeats']:
+                        continue
+                    self.flag(held, 'repetition')
+                    held, looping = [], True
+            elif reason is None:
+                yield from held
+                yield segment
+                held, last, looping = [], text, False
+                continue
+            else:
+                yield from held
+                self.flag([segment], reason)
+                held, last, looping = [], None, False
+
+            # Already decoded segments can only be dropped; a live decode is cut short
+            if self.restart is not None:
+                return self.skip(segments, last if looping else None)
+
+        yield from held
+        return None, None, None
+
+    def flag(self, flagged, reason):
+        start, end = flagged[0]['start'], flagged[-1]['end']
+        self.suppressed_segments += len(flagged)
+        self.ranges.append({
+            'start': round(start, 3),
+            'end': round(end, 3),
+            'reason': reason,
+            'suppressed_segments': len(flagged),
+            'text': flagged[0]['text'][:FLAGGED_TEXT_CHARS]
+        })
+        print(f"Hallucination ({reason}) at {start:.1f}-{end:.1f}s, {len(flagged)} segments suppressed",
+              file=sys.stderr)
+
+    def extend(self, segment):
+        self.suppressed_segments += 1
+        self.ranges[-1]['suppressed_segments'] += 1
+        self.ranges[-1]['end'] = round(max(self.ranges[-1]['end'], segment['end']), 3)
+
+    def skip(self, segments, looped):
+        """Stop decoding at the last cut and restart at the next speech region."""
+        if hasattr(segments, 'close'):
+            segments.close()
+        cut = self.ranges[-1]
+        resume = max(self.resume_point(cut['end']), cut['end'])
+        self.skipped_seconds += resume - cut['end']
+        cut['end'] = round(resume, 3)
+
+        samples = self.samples()
+        if resume * SAMPLE_RATE >= len(samples):
+            return None, None, None
+        print(f"Resuming at {resume:.1f}s", file=sys.stderr)
+        return self.restart(samples[int(resume * SAMPLE_RATE):]), resume, looped
+
+    def resume_point(self, after):
+        """Start of the next VAD speech region after a cut, at most max_skip_seconds on."""
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        samples = self.samples()
+        start = int(after * SAMPLE_RATE)
+        end = min(len(samples), start + int(self.settings['max_skip_seconds'] * SAMPLE_RATE))
+        if start >= end:
+            return len(samples) / SAMPLE_RATE
+
+        # A region from the very start is the stretch that was looping; skip past it
+        for region in get_speech_timestamps(samples[start:end], VadOptions(**self.vad_parameters)):
+            if region['start'] > 0:
+                return (start + region['start']) / SAMPLE_RATE
+        return end / SAMPLE_RATE
+
+    def samples(self):
+        if not hasattr(self.audio, 'shape'):
+            from audio_source import load_samples
+            self.audio = load_samples(self.audio)
+        return self.audio
+
+    def report(self):
+        return {
+            'suppressed_segments': self.suppressed_segments,
+            'skipped_seconds': round(self.skipped_seconds, 3),
+            'ranges': self.ranges
+        }
+
+
+def loop_report(segments):
+    """What the guard on iter_segments()'s segments cut, or None if it was off. Call after iterating."""
+    return segments.report() if isinstance(segments, GuardedSegments) else None
+
+
+def merge_reports(reports):
+    """One report for several decodes of the same audio (already on one timeline)."""
+    reports = [report for report in reports if report]
+    if not reports:
+        return None
+    return {
+        'suppressed_segments': sum(report['suppressed_segments'] for report in reports),
+        'skipped_seconds': round(sum(report['skipped_seconds'] for report in reports), 3),
+        'ranges': [r for report in reports for r in report['ranges']]
+    }
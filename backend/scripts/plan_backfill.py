@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Plan which catalogued streams to transcribe within a compute budget.
+
+Reads the stream catalogue (zee_business_market_streams_2025.json:
+id, title, duration, date, views) and estimates each video's decode cost
+as duration x the measured real-time factor of its decoding profile,
+taken from --rtf or a benchmark_transcription.py report. Expected yield
+(the recommendations we hope to extract) is the show's weight x hours of
+audio, nudged by views. Videos are picked greedily by yield per compute
+hour until the budget is spent, and written as a transcribe_batch.py
+--manifest in that order.
+
+Each entry's audio is --audio-template formatted with the video's
+catalogue fields, and must exist before the manifest runs: a directory
+of chunk_XXX.wav files or one 16 kHz mono WAV. With --fetch-audio the
+scheduled videos are downloaded through the shared audio cache and
+converted to that WAV while planning:
+
+    python3 plan_backfill.py --budget-hours 40 --rtf balanced=0.08 \
+        --audio-template "audio/{id}.wav" --fetch-audio --output backfill.jsonl
+
+Show weights match title substrings, first match wins. A --show-weights
+TOML or JSON file is checked before the built-in ones:
+
+    commodity = 0.2
+
+    ["final trade"]
+    weight = 1.0
+    profile = "accurate"
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+from audio_cache import add_audio_cache_arguments, open_audio_cache
+from decode_profiles import DEFAULT_PROFILE
+
+DEFAULT_STREAMS = Path(__file__).resolve().parents[2] / 'zee_business_market_streams_2025.json'
+
+# Title substring -> weight, checked in order. Share Bazaar Live titles also
+# say "First Trade", and are a cut of the same feed, so they come first.
+SHOW_WEIGHTS = [
+    ('share bazaar live', {'weight': 0.5}),
+    ('final trade', {'weight': 1.0}),
+    ('first trade', {'weight': 0.9}),
+    ('zee business live', {'weight': 0.6})
+]
+DEFAULT_WEIGHT = 0.3
+
+# Views move yield by (views / median views) ** VIEWS_EXPONENT
+VIEWS_EXPONENT = 0.25
+
+
+def load_show_weights(path):
+    """Show rules from a TOML or JSON file, followed by the built-in ones."""
+    path = Path(path)
+    if path.suffix.lower() == '.toml':
+        import tomllib
+        with open(path, 'rb') as f:
+            custom = tomllib.load(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            custom = json.load(f)
+
+    if not isinstance(custom, dict):
+        raise ValueError(f'{path} must map title substrings to weights')
+
+    rules = []
+    for match, rule in custom.items():
+        rule = {'weight': rule} if isinstance(rule, (int, float)) else rule
+        if not isinstance(rule, dict) or not isinstance(rule.get('weight'), (int, float)):
+            raise ValueError(f'Show {match} in {path} needs a numeric weight')
+        rules.append((match.lower(), rule))
+    return rules + SHOW_WEIGHTS
+
+
+def show_rule(title, rules):
+    title = (title or '').lower()
+    for match, rule in rules:
+        if match in title:
+            return match, rule
+    return None, {'weight': DEFAULT_WEIGHT}
+
+
+def benchmark_rtfs(path, model):
+    """Best measured RTF per profile for one model in a benchmark_transcription.py report."""
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+
+    rtfs = {}
+    for record in report.get('results', []):
+        if record.get('model') != model or record.get('rtf') is None:
+            continue
+        profile = record.get('profile', DEFAULT_PROFILE)
+        rtfs[profile] = min(rtfs.get(profile, record['rtf']), record['rtf'])
+    return rtfs
+
+
+def parse_rtfs(values):
+    rtfs = {}
+    for value in values:
+        profile, _, rtf = value.partition('=')
+        try:
+            rtfs[profile] = float(rtf)
+        except ValueError:
+            raise ValueError(f'--rtf takes PROFILE=RTF, got {value}')
+        if rtfs[profile] <= 0:
+            raise ValueError(f'RTF of {profile} must be positive')
+    return rtfs
+
+
+def estimate(videos, rules, rtfs, default_profile, overhead_seconds):
+    """Cost and expected yield of every video with a known duration."""
+    views = [video.get('views') or 0 for video in videos]
+    median_views = statistics.median(views) if views else 0
+
+    estimates = []
+    for video in videos:
+        duration = video.get('duration') or 0
+        if duration <= 0:
+            continue
+        show, rule = show_rule(video.get('title'), rules)
+        profile = rule.get('profile', default_profile)
+        if profile not in rtfs:
+            raise ValueError(f'No RTF for profile {profile} (pass --rtf {profile}=... or a --benchmark report)')
+
+        views_factor = ((video.get('views') or 0) / median_views) ** VIEWS_EXPONENT if median_views else 1.0
+        estimates.append({
+            'video': video,
+            'show': show,
+            'profile': profile,
+            'compute_hours': (duration * rtfs[profile] + overhead_seconds) / 3600,
+            'expected_yield': rule['weight'] * duration / 3600 * max(views_factor, 0.5)
+        })
+    return estimates
+
+
+def select(estimates, budget_hours):
+    """Greedy 0/1 knapsack by yield per compute hour.
+
+    The greedy pick is compared with the single most valuable video that
+    fits, which keeps it within half of the optimum.
+    """
+    ranked = sorted(estimates, key=lambda e: (-e['expected_yield'] / e['compute_hours'],
+                                              -e['expected_yield'], e['video'].get('id', '')))
+    chosen, spent = [], 0.0
+    for candidate in ranked:
+        if spent + candidate['compute_hours'] <= budget_hours:
+            chosen.append(candidate)
+            spent += candidate['compute_hours']
+
+    fitting = [e for e in estimates if e['compute_hours'] <= budget_hours]
+    best = max(fitting, key=lambda e: e['expected_yield'], default=None)
+    if best and best['expected_yield'] > sum(e['expected_yield'] for e in chosen):
+        return [best]
+    return chosen
+
+
+def manifest_entry(candidate, rank, total, audio_template, output_dir):
+    video = candidate['video']
+    fields = {key: value for key, value in video.items() if isinstance(value, (str, int, float))}
+    entry = {
+        'audio': audio_template.format(**fields),
+        'id': video['id'],
+        # The manifest orders by priority first, so the schedule order holds
+        'priority': total - rank,
+        'date': video.get('date_formatted'),
+        # Same-day streams share a feed; transcribe_batch.py reuses their transcripts
+        'dedupe_group': video.get('date_formatted'),
+        'profile': candidate['profile'],
+        'title': video.get('title'),
+        'duration': video.get('duration'),
+        'show': candidate['show'],
+        'compute_hours': round(candidate['compute_hours'], 3),
+        'expected_yield': round(candidate['expected_yield'], 3)
+    }
+    if output_dir:
+        entry['output'] = str(Path(output_dir) / f"{video['id']}.json")
+    return entry
+
+
+def fetch_audio(entries, cache):
+    """Convert each entry's video from the audio cache to its 16 kHz mono WAV; returns the ids that failed."""
+    failed = []
+    for position, entry in enumerate(entries, 1):
+        audio = Path(entry['audio'])
+        if audio.exists():
+            continue
+        print(f"Fetching audio of {entry['id']} ({position}/{len(entries)})", file=sys.stderr)
+        try:
+            audio.parent.mkdir(parents=True, exist_ok=True)
+            cache.convert(entry['id'], audio, ['-ar', '16000', '-ac', '1', '-acodec', 'pcm_s16le'])
+        except (ValueError, RuntimeError, OSError) as e:
+            print(f"Could not fetch audio of {entry['id']}: {e}", file=sys.stderr)
+            failed.append(entry['id'])
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan a transcription backfill that fits a compute budget')
+    parser.add_argument('streams', nargs='?', default=str(DEFAULT_STREAMS), help='Stream catalogue JSON')
+    parser.add_argument('--budget-hours', type=float, required=True,
+                        help='Decoder hours to spend (GPU-hours, or CPU worker-hours)')
+    parser.add_argument('--rtf', action='append', default=[], metavar='PROFILE=RTF',
+                        help='Measured real-time factor of a profile (repeatable)')
+    parser.add_argument('--benchmark', default=None, help='benchmark_transcription.py report to take RTFs from')
+    parser.add_argument('--model', default='large-v3', help='Model whose benchmark RTFs to use')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, help='Profile for shows whose rule names none')
+    parser.add_argument('--show-weights', default=None, help='TOML or JSON file of title substring weights')
+    parser.add_argument('--overhead-seconds', type=float, default=60,
+                        help='Fixed cost per video (download, audio extraction)')
+    parser.add_argument('--audio-template', required=True,
+                        help='Audio of a video, formatted with its catalogue fields: a chunk_XXX.wav directory '
+                             'or a 16 kHz mono WAV, e.g. audio/{id}.wav')
+    parser.add_argument('--fetch-audio', action='store_true',
+                        help='Download scheduled videos through the audio cache and convert them to --audio-template')
+    parser.add_argument('--output-dir', default=None,
+                        help='Transcript directory; videos already transcribed there are not planned')
+    parser.add_argument('--output', default=None, help='Write the manifest (JSON lines) here instead of stdout')
+    add_audio_cache_arguments(parser)
+
+    args = parser.parse_args()
+    if args.fetch_audio and Path(args.audio_template).suffix.lower() != '.wav':
+        parser.error('--fetch-audio writes WAV files; give an --audio-template like audio/{id}.wav')
+
+    try:
+        rtfs = benchmark_rtfs(args.benchmark, args.model) if args.benchmark else {}
+        rtfs.update(parse_rtfs(args.rtf))
+        rules = load_show_weights(args.show_weights) if args.show_weights else SHOW_WEIGHTS
+        with open(args.streams, encoding='utf-8') as f:
+            videos = json.load(f)
+
+        if args.output_dir:
+            videos = [video for video in videos if not (Path(args.output_dir) / f"{video['id']}.json").exists()]
+        estimates = estimate(videos, rules, rtfs, args.profile, args.overhead_seconds)
+    except (OSError, ValueError) as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
+
+    chosen = select(estimates, args.budget_hours)
+    entries = [manifest_entry(candidate, rank, len(chosen), args.audio_template, args.output_dir)
+               for rank, candidate in enumerate(chosen)]
+    failed = fetch_audio(entries, open_audio_cache(args)) if args.fetch_audio else []
+
+    lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+    if args.output:
+        Path(args.output).write_text(lines, encoding='utf-8')
+        print(f"Manifest written to {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(lines)
+
+    total_yield = sum(e['expected_yield'] for e in estimates)
+    print(json.dumps({
+        'videos': len(estimates),
+        'scheduled': len(entries),
+        'audio_hours': round(sum(e['video']['duration'] for e in chosen) / 3600, 1),
+        'compute_hours': round(sum(e['compute_hours'] for e in chosen), 2),
+        'budget_hours': args.budget_hours,
+        'yield_share': round(sum(e['expected_yield'] for e in chosen) / total_yield, 3) if total_yield else None,
+        'profiles': {profile: sum(1 for e in chosen if e['profile'] == profile)
+                     for profile in sorted({e['profile'] for e in chosen})},
+        'full_backlog_compute_hours': round(sum(e['compute_hours'] for e in estimates), 1),
+        **({'audio_failed': failed} if args.fetch_audio else {})
+    }), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,7 @@ const __dirname = dirname(__filename);
 const WHISPER_CLI = join(process.env.HOME, 'whisper.cpp/build/bin/whisper-cli');
 const WHISPER_MODEL = join(process.env.HOME, 'whisper.cpp/models/ggml-large-v3-turbo.bin');
 const TEMP_DIR = join(__dirname, '../temp/whisper');
+const AUDIO_CACHE = join(__dirname, 'audio_cache.py');
 const CHUNK_DURATION = 30; // seconds per transcript chunk
 
 // Database config
@@ -96,34 +97,27 @@ async function getVideosNeedingTranscription(limit = 10, specificVideoId = null)
 }
 
 /**
- * Download audio from YouTube
+ * Fetch the audio through the shared cache and convert it to 16kHz WAV for whisper.cpp
+ * The cache entry stays locked until ffmpeg finishes, so no other process can evict it mid-read
  */
-function downloadAudio(youtubeUrl, outputPath) {
-  console.log(`  Downloading audio...`);
+function downloadAudio(youtubeUrl, wavPath) {
+  console.log(`  Fetching audio and converting to 16kHz WAV...`);
   // Use Firefox cookies to bypass bot detection
-  const cmd = `yt-dlp --cookies-from-browser firefox -x --audio-format mp3 --audio-quality 0 -o "${outputPath}.%(ext)s" "${youtubeUrl}"`;
+  const cmd = `python3 "${AUDIO_CACHE}" convert "${youtubeUrl}" --output="${wavPath}" --ffmpeg-args="-ar 16000 -ac 1" --ytdlp-args="--cookies-from-browser firefox"`;
 
+  let output;
   try {
-    execSync(cmd, { stdio: 'pipe', timeout: 1800000 }); // 30 min timeout for long videos
-    return `${outputPath}.mp3`;
+    output = execSync(cmd, { stdio: ['ignore', 'pipe', 'pipe'], timeout: 2100000 }); // 35 min timeout for long videos
   } catch (error) {
-    throw new Error(`Download failed: ${error.message}`);
-  }
-}
-
-/**
- * Convert MP3 to 16kHz WAV for whisper.cpp
- */
-function convertToWav(mp3Path, wavPath) {
-  console.log(`  Converting to 16kHz WAV...`);
-  const cmd = `ffmpeg -i "${mp3Path}" -ar 16000 -ac 1 -y "${wavPath}"`;
-
-  try {
-    execSync(cmd, { stdio: 'pipe', timeout: 300000 }); // 5 min timeout
-    return wavPath;
-  } catch (error) {
-    throw new Error(`Conversion failed: ${error.message}`);
+    let message = error.message;
+    try {
+      message = JSON.parse(error.stdout.toString()).error || message;
+    } catch {}
+    throw new Error(`Download failed: ${message}`);
   }
+  const result = JSON.parse(output.toString());
+  console.log(`  ${result.hit ? 'Audio cache hit' : 'Downloaded'}: ${result.source}`);
+  return result.path;
 }
 
 /**
@@ -275,20 +269,16 @@ async function processVideo(video) {
   console.log(`Duration: ${(video.duration_seconds / 3600).toFixed(1)} hours`);
   console.log(`${'='.repeat(60)}`);
 
-  const mp3Path = join(TEMP_DIR, `${video.id}.mp3`);
   const wavPath = join(TEMP_DIR, `${video.id}.wav`);
 
   try {
     // Mark as processing
     await updateVideoStatus(video.id, 'processing');
 
-    // Step 1: Download audio
-    const audioFile = downloadAudio(video.youtube_url, join(TEMP_DIR, video.id));
-
-    // Step 2: Convert to WAV
-    convertToWav(audioFile, wavPath);
+    // Step 1: Download audio and convert to WAV
+    downloadAudio(video.youtube_url, wavPath);
 
-    // Step 3: Transcribe with whisper
+    // Step 2: Transcribe with whisper
     const { segments, processingTime } = await transcribeWithWhisper(wavPath);
     console.log(`  Transcription completed in ${processingTime?.toFixed(1) || '?'}s`);
     console.log(`  Got ${segments.length} segments`);
@@ -297,10 +287,10 @@ async function processVideo(video) {
       throw new Error('No segments extracted from audio');
     }
 
-    // Step 4: Save to database
+    // Step 3: Save to database
     await saveTranscriptChunks(video.id, segments);
 
-    // Step 5: Mark as ready for Gemini processing (back to pending)
+    // Step 4: Mark as ready for Gemini processing (back to pending)
     await updateVideoStatus(video.id, 'pending');
 
     const totalTime = (Date.now() - startTime) / 1000;
@@ -316,7 +306,6 @@ async function processVideo(video) {
   } finally {
     // Cleanup temp files
     try {
-      if (existsSync(mp3Path)) unlinkSync(mp3Path);
       if (existsSync(wavPath)) unlinkSync(wavPath);
     } catch (e) {
       console.warn(`  Warning: Could not clean up temp files: ${e.message}`);
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cheap non-speech detection with NumPy, run before any model is loaded.
+
+Audio is cut into 32 ms frames; a frame counts as speech-like when it is
+loud enough and its spectrum is not flat (noise and hiss are flat, voiced
+speech is not). A stretch whose speech-like frame share is tiny, or whose
+loudness barely moves (hum, a held tone), is confidently non-speech and
+can be skipped without asking Whisper. Thresholds are conservative: music
+and jingles with any voice over them are kept for Silero VAD to handle.
+"""
+
+import argparse
+import json
+import sys
+
+SAMPLE_RATE = 16000
+FRAME = 512  # samples, 32 ms at 16 kHz
+
+# Frames quieter than this (dBFS) are silence regardless of the recording level
+ENERGY_FLOOR_DB = -45.0
+# ...and frames more than this far below the loud end of the stretch are background
+DYNAMIC_RANGE_DB = 30.0
+# Spectral flatness above this is noise-like (1.0 is white noise)
+MAX_FLATNESS = 0.4
+# Speech rises and falls with syllables; steadier loudness than this is not speech
+MIN_MODULATION_DB = 3.0
+DEFAULT_MIN_SPEECH_RATIO = 0.05
+
+
+def frame_features(samples):
+    """Per-frame energy (dBFS) and spectral flatness of float32 samples."""
+    import numpy as np
+
+    count = len(samples) // FRAME
+    if not count:
+        return np.empty(0), np.empty(0)
+
+    # Reshape is a view; the only copies are one chunk's windowed frames and spectrum
+    frames = np.asarray(samples[:count * FRAME], dtype=np.float32).reshape(count, FRAME)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+    power = np.abs(np.fft.rfft(frames * np.hanning(FRAME).astype(np.float32), axis=1)) ** 2 + 1e-10
+    flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy_db, flatness
+
+
+def speech_ratio(samples):
+    """Share of frames that look like speech (0.0 - 1.0)."""
+    import numpy as np
+
+    energy_db, flatness = frame_features(samples)
+    if not len(energy_db):
+        return 0.0
+
+    threshold = max(ENERGY_FLOOR_DB, np.percentile(energy_db, 95) - DYNAMIC_RANGE_DB)
+    active = (energy_db > threshold) & (flatness < MAX_FLATNESS)
+    if active.sum() < 2 or np.std(energy_db[active]) < MIN_MODULATION_DB:
+        return 0.0
+    return float(np.mean(active))
+
+
+def is_speech(samples, min_speech_ratio=DEFAULT_MIN_SPEECH_RATIO):
+    return speech_ratio(samples) >= min_speech_ratio
+
+
+def contains_speech(samples, min_speech_ratio=DEFAULT_MIN_SPEECH_RATIO, block_seconds=30):
+    """Whether any block_seconds stretch of a whole file is speech.
+
+    Judging the file in blocks keeps one short announcement in an hour of
+    music from being averaged away.
+    """
+    size = int(block_seconds * SAMPLE_RATE)
+    return any(is_speech(samples[start:start + size], min_speech_ratio)
+               for start in range(0, max(len(samples), 1), size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report which chunks the non-speech pre-pass would skip')
+    parser.add_argument('audio_dir', help='Chunk directory or one 16 kHz mono WAV/raw PCM file')
+    parser.add_argument('--chunk-seconds', type=float, default=30, help='Window length for a single audio file')
+    parser.add_argument('--min-speech-ratio', type=float, default=DEFAULT_MIN_SPEECH_RATIO,
+                        help='Chunks with a smaller share of speech-like frames are skipped')
+
+    args = parser.parse_args()
+
+    from audio_source import load_chunks
+
+    skipped_seconds = 0.0
+    for chunk in load_chunks(args.audio_dir, args.chunk_seconds):
+        samples = chunk.samples()
+        ratio = speech_ratio(samples)
+        skip = ratio < args.min_speech_ratio
+        if skip:
+            skipped_seconds += len(samples) / SAMPLE_RATE
+        print(json.dumps({'chunk_index': chunk.index, 'file': chunk.name,
+                          'speech_ratio': round(ratio, 3), 'skip': skip}))
+    print(f"Would skip {skipped_seconds:.1f}s of audio", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Where a transcription script's start-up time goes (--startup-report).
+
+The scripts import this module before anything else, so phases are timed
+from that moment: the scripts' own imports, the CUDA device probe, CUDA
+library preloading, importing faster-whisper and loading the model.
+Interpreter start-up before that is read from /proc on Linux.
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = {}
+
+    def mark(self, name):
+        """Count the time since the previous mark (or since start) as one phase."""
+        now = time.perf_counter()
+        self.add(name, now - self.last)
+        self.last = now
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def summary(self):
+        phases = {}
+        interpreter = interpreter_seconds(time.perf_counter() - self.started)
+        if interpreter is not None:
+            phases['interpreter'] = interpreter
+        phases.update(self.phases)
+        return {name: round(seconds, 3) for name, seconds in phases.items()}
+
+    def print(self):
+        print(json.dumps({'startup': self.summary()}), file=sys.stderr)
+
+
+def interpreter_seconds(since_import):
+    """Seconds between the process starting and this module being imported, or None off Linux."""
+    import os
+
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may contain spaces; fields after it are space separated
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    alive = uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    return max(alive - since_import, 0.0)
+
+
+STARTUP = StartupReport()
+
+
+def add_startup_arguments(parser):
+    parser.add_argument('--startup-report', action='store_true',
+                        help='Print where start-up time went (imports, CUDA preload, model load) to stderr')
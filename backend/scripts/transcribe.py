@@ -2,129 +2,466 @@
 """
 Transcription script using faster-whisper library.
 Called from Node.js transcriptionService.
+
+If a transcribe_server.py worker is listening on --socket (or the
+TRANSCRIBE_SOCKET environment variable), the job is handed to it so the
+model stays warm between calls. Otherwise the model is loaded in-process.
 """
 
+from startup_report import STARTUP, add_startup_arguments
+
 import os
 import argparse
+import atexit
 import json
 import sys
 from pathlib import Path
 
-# Preload CUDA libraries before importing torch/ctranslate2
-import ctypes
-cudnn_lib_path = os.path.expanduser('~/.local/lib/python3.11/site-packages/nvidia/cudnn/lib')
-cublas_lib_path = os.path.expanduser('~/.local/lib/python3.11/site-packages/nvidia/cublas/lib')
-nvjitlink_lib_path = os.path.expanduser('~/.local/lib/python3.11/site-packages/nvidia/nvjitlink/lib')
+from decode_profiles import DEFAULT_PROFILE, PROFILES, add_profile_arguments, resolve_profile
+from host_tuning import add_host_config_arguments, host_settings
+from transcription_cache import add_cache_arguments, audio_digest, cache_key, open_cache
+
+DEFAULT_SOCKET = os.getenv('TRANSCRIBE_SOCKET')
+
+# Decoding options passed to model.transcribe() unless a --profile says otherwise; also part of the cache key
+DECODE_OPTIONS = PROFILES[DEFAULT_PROFILE]
+
+
+# Which pip-installed CUDA libraries load on this host, so later runs skip scanning for them
+CUDA_MANIFEST = os.path.expanduser(os.getenv('TRANSCRIBE_CUDA_MANIFEST', '~/.cache/sayitownit/cuda-libs.json'))
+CUDA_PACKAGES = ['nvjitlink', 'cublas', 'cudnn']  # dependency order
+
+_cuda_preloaded = False
+
+
+def preload_cuda_libraries():
+    """Preload pip-installed CUDA libraries before ctranslate2 needs them; only needed for CUDA.
+
+    The libraries that loaded are recorded in CUDA_MANIFEST along with the
+    library directories' modification times; while those are unchanged,
+    later runs load just the recorded files instead of every .so found.
+    """
+    global _cuda_preloaded
+    if _cuda_preloaded:
+        return
+    _cuda_preloaded = True
+
+    import ctypes
+    import site
+
+    with STARTUP.phase('cuda_preload'):
+        lib_dirs = [os.path.join(site.getusersitepackages(), 'nvidia', package, 'lib') for package in CUDA_PACKAGES]
+        lib_dirs = [lib_dir for lib_dir in lib_dirs if os.path.isdir(lib_dir)]
+        if not lib_dirs:
+            return
+        key = {lib_dir: os.stat(lib_dir).st_mtime_ns for lib_dir in lib_dirs}
+
+        manifest = None
+        try:
+            with open(CUDA_MANIFEST, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+        scan = not manifest or manifest.get('dirs') != key
+        if scan:
+            libs = [str(lib) for lib_dir in lib_dirs for lib in sorted(Path(lib_dir).glob('*.so*'))]
+        else:
+            libs = manifest['libs']
 
-# Load libraries in dependency order
-for lib_path in [nvjitlink_lib_path, cublas_lib_path, cudnn_lib_path]:
-    if os.path.exists(lib_path):
-        for lib in sorted(Path(lib_path).glob('*.so*')):
+        loaded = []
+        for lib in libs:
             try:
-                ctypes.CDLL(str(lib), mode=ctypes.RTLD_GLOBAL)
+                ctypes.CDLL(lib, mode=ctypes.RTLD_GLOBAL)
+                loaded.append(lib)
             except OSError:
                 pass
 
-def transcribe_audio(audio_path, model_name, language, device, compute_type):
-    """Transcribe audio using faster-whisper."""
-    from faster_whisper import WhisperModel
+        if scan:
+            try:
+                os.makedirs(os.path.dirname(CUDA_MANIFEST), exist_ok=True)
+                with open(CUDA_MANIFEST, 'w', encoding='utf-8') as f:
+                    json.dump({'dirs': key, 'libs': loaded}, f, indent=2)
+            except OSError as e:
+                print(f"Could not write {CUDA_MANIFEST}: {e}", file=sys.stderr)
+
+
+def cuda_device_count():
+    """Number of CUDA devices, asked of the driver directly (no torch or ctranslate2 import)."""
+    import ctypes
+
+    with STARTUP.phase('device_probe'):
+        for name in ('libcuda.so.1', 'libcuda.so', 'nvcuda.dll'):
+            try:
+                cuda = ctypes.CDLL(name)
+                break
+            except OSError:
+                continue
+        else:
+            return 0
+
+        count = ctypes.c_int(0)
+        if cuda.cuInit(0) != 0 or cuda.cuDeviceGetCount(ctypes.byref(count)) != 0:
+            return 0
+        return count.value
+
+
+def resolve_device(device, compute_type):
+    """Resolve 'auto' device and compute type to concrete values; preloads CUDA libraries for CUDA."""
+    if device == 'auto':
+        device = 'cuda' if cuda_device_count() else 'cpu'
+
+    if device == 'cuda':
+        preload_cuda_libraries()
+
+    if compute_type == 'auto':
+        compute_type = 'float16' if device == 'cuda' else 'int8'
+
+    return device, compute_type
+
+
+def faster_whisper_installed():
+    """Whether faster-whisper can be imported, without paying for the import before the model is needed."""
+    import importlib.util
+    return importlib.util.find_spec('faster_whisper') is not None
+
+
+def load_model(model_name, device, compute_type, **kwargs):
+    """Load a faster-whisper model."""
+    if device == 'cuda':
+        preload_cuda_libraries()
+    with STARTUP.phase('faster_whisper_import'):
+        from faster_whisper import WhisperModel
 
     print(f"Loading faster-whisper model '{model_name}' on {device}...", file=sys.stderr)
-    model = WhisperModel(model_name, device=device, compute_type=compute_type)
+    with STARTUP.phase('model_load'):
+        return WhisperModel(model_name, device=device, compute_type=compute_type, **kwargs)
+
 
-    print(f"Transcribing {audio_path}...", file=sys.stderr)
+def iter_segments(model, audio, language, label=None, options=None):
+    """Start decoding and return (segments, info); segments are yielded as they are decoded.
+
+    audio is a file path or a float32 sample array at 16 kHz. options
+    replaces DECODE_OPTIONS for this call. Unless its loop_guard is off,
+    hallucination loops are cut out as they are decoded (see loop_guard.py).
+    """
+    print(f"Transcribing {label or audio}...", file=sys.stderr)
     lang = language if language and language != 'auto' else None
 
-    segments, info = model.transcribe(
-        str(audio_path),
-        language=lang,
-        beam_size=5,
-        vad_filter=True,
-        vad_parameters=dict(min_silence_duration_ms=500)
-    )
-
-    # Collect segments
-    segment_list = []
-    full_text = []
-
-    for segment in segments:
-        segment_list.append({
-            'start': segment.start,
-            'end': segment.end,
-            'text': segment.text.strip()
-        })
-        full_text.append(segment.text.strip())
+    if not hasattr(audio, 'shape'):
+        audio = str(audio)
+    options = dict(DECODE_OPTIONS if options is None else options)
+    guard = options.pop('loop_guard', None)
+    segments, info = decode_segments(model, audio, lang, options)
+
+    if guard:
+        from loop_guard import GuardedSegments
+
+        # The rest of the audio keeps the language detected on its start
+        segments = GuardedSegments(segments, guard,
+                                   lambda samples: decode_segments(model, samples, lang or info.language, options)[0],
+                                   audio, options.get('vad_parameters'))
+    return segments, info
+
+
+def decode_segments(model, audio, language, options):
+    segments, info = model.transcribe(audio, language=language, **options)
+
+    def generate():
+        for segment in segments:
+            yield {
+                'start': segment.start,
+                'end': segment.end,
+                'text': segment.text.strip(),
+                'avg_logprob': segment.avg_logprob,
+                'compression_ratio': segment.compression_ratio,
+                'no_speech_prob': segment.no_speech_prob
+            }
 
+    return generate(), info
+
+
+def transcribe_with_model(model, audio_path, language, options=None):
+    """Transcribe audio with an already loaded model."""
+    segments, info = iter_segments(model, audio_path, language, options=options)
+    return build_result(list(segments), info)
+
+
+def build_result(segments, info):
     return {
-        'text': ' '.join(full_text),
+        'text': ' '.join(segment['text'] for segment in segments),
         'language': info.language,
         'language_probability': info.language_probability,
         'duration': info.duration,
-        'segments': segment_list
+        'segments': segments
+    }
+
+
+def fallback_devices(device, compute_type):
+    """Devices to decode on, in order: the requested one, then CPU int8 if that is CUDA."""
+    return [(device, compute_type)] + ([('cpu', 'int8')] if device == 'cuda' else [])
+
+
+def transcribe_resumable(get_model, audio_path, language, devices, options=None, on_segment=None):
+    """Transcribe a file, resuming on the next device from the last finished segment if one fails.
+
+    get_model(device, compute_type) returns a loaded model. Segments
+    decoded before a failure are kept; only the audio after them is decoded
+    again, and its timestamps are shifted back onto the file. The result's
+    device_ranges record which device produced which seconds, and loops
+    the hallucination loops cut out, if any.
+    """
+    from audio_source import SAMPLE_RATE, load_samples
+    from loop_guard import loop_report, merge_reports
+
+    segments = []
+    device_ranges = []
+    loops = []
+    info = None
+    for attempt, (device, compute_type) in enumerate(devices):
+        resume = segments[-1]['end'] if segments else 0.0
+        part = None
+        try:
+            model = get_model(device, compute_type)
+            audio = load_samples(audio_path, int(resume * SAMPLE_RATE)) if resume else audio_path
+            # The remainder keeps the language detected on the start of the file
+            part, part_info = iter_segments(model, audio, language or (info and info.language),
+                                            label=f'{audio_path} from {resume:.1f}s' if resume else None,
+                                            options=options)
+            info = info or part_info
+            for segment in part:
+                if resume:
+                    segment = {**segment, 'start': round(segment['start'] + resume, 3),
+                               'end': round(segment['end'] + resume, 3)}
+                segments.append(segment)
+                if on_segment:
+                    on_segment(segment)
+        except Exception as e:
+            loops.append(shifted_loops(loop_report(part), resume))
+            if attempt == len(devices) - 1:
+                raise
+            end = segments[-1]['end'] if segments else resume
+            if end > resume:
+                device_ranges.append({'start': resume, 'end': end, 'device': device, 'compute_type': compute_type})
+            next_device, next_compute_type = devices[attempt + 1]
+            print(f"{device.upper()} failed at {end:.1f}s ({e}), resuming on {next_device} ({next_compute_type})...",
+                  file=sys.stderr)
+            continue
+
+        device_ranges.append({'start': resume, 'end': info.duration, 'device': device, 'compute_type': compute_type})
+        loops.append(shifted_loops(loop_report(part), resume))
+        break
+
+    result = {**build_result(segments, info), 'device_ranges': device_ranges}
+    loops = merge_reports(loops)
+    if loops:
+        result['loops'] = loops
+    return result
+
+
+def shifted_loops(report, offset):
+    """A loop report of audio decoded from offset on, on the whole file's timeline."""
+    if not report or not offset:
+        return report
+    return {**report, 'ranges': [{**r, 'start': round(r['start'] + offset, 3), 'end': round(r['end'] + offset, 3)}
+                                 for r in report['ranges']]}
+
+
+def emit(record):
+    """Write one NDJSON record to stdout and flush so the reader sees it immediately."""
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def stream_transcription(audio_path, model_name, language, device, compute_type, options=None, load_options=None):
+    """Emit one segment record per decoded segment, then a summary record."""
+    result = transcribe_resumable(lambda device, compute_type: load_model(model_name, device, compute_type,
+                                                                          **(load_options or {})),
+                                  audio_path, language, fallback_devices(device, compute_type), options,
+                                  on_segment=lambda segment: emit({'type': 'segment', **segment}))
+    emit({
+        'type': 'summary',
+        'language': result['language'],
+        'language_probability': result['language_probability'],
+        'duration': result['duration'],
+        'segment_count': len(result['segments']),
+        'device_ranges': result['device_ranges'],
+        'loops': result.get('loops')
+    })
+
+
+def transcribe_audio(audio_path, model_name, language, device, compute_type, options=None, load_options=None):
+    """Transcribe audio using faster-whisper, resuming on CPU from where CUDA failed."""
+    return transcribe_resumable(lambda device, compute_type: load_model(model_name, device, compute_type,
+                                                                        **(load_options or {})),
+                                audio_path, language, fallback_devices(device, compute_type), options)
+
+
+def transcribe_via_server(socket_path, audio_path, args, options):
+    """Send the job to a running transcribe_server.py. Returns None if unreachable."""
+    from transcribe_server import ServerUnavailable, call_server
+
+    params = {
+        'audio_path': str(audio_path.resolve()),
+        'model': args.model,
+        'language': args.language,
+        'device': args.device,
+        'compute_type': args.compute_type,
+        'profile': args.profile,
+        'options': options
     }
+    try:
+        return call_server(socket_path, 'transcribe', params)
+    except ServerUnavailable as e:
+        print(f"Transcription server unavailable ({e}), loading model locally...", file=sys.stderr)
+        return None
+
+
+def emit_result(result):
+    """Replay a complete result (e.g. from the server) as stream records."""
+    for segment in result['segments']:
+        emit({'type': 'segment', **segment})
+    emit({
+        'type': 'summary',
+        'language': result['language'],
+        'language_probability': result['language_probability'],
+        'duration': result['duration'],
+        'segment_count': len(result['segments']),
+        'device_ranges': result.get('device_ranges'),
+        'loops': result.get('loops')
+    })
+
+
+def non_speech_result(audio_path):
+    """Empty result if a NumPy pre-pass finds no speech anywhere in the file, else None."""
+    from audio_source import SAMPLE_RATE, load_samples
+    from speech_detect import contains_speech
+
+    samples = load_samples(audio_path)
+    if contains_speech(samples):
+        return None
+    return {
+        'text': '',
+        'language': None,
+        'language_probability': None,
+        'duration': len(samples) / SAMPLE_RATE,
+        'segments': [],
+        'skipped': 'non_speech'
+    }
+
+
+def output_result(result, stream):
+    if stream:
+        emit_result(result)
+    else:
+        print(json.dumps(result))
+
 
 def main():
+    STARTUP.mark('imports')
+
     parser = argparse.ArgumentParser(description='Transcribe audio using faster-whisper')
     parser.add_argument('audio_path', help='Path to the audio file')
     parser.add_argument('--model', default='large-v3', help='Model size (tiny, base, small, medium, large-v2, large-v3)')
     parser.add_argument('--language', default=None, help='Language code (e.g., en, hi) or None for auto-detect')
     parser.add_argument('--device', default='auto', help='Device to use (auto, cpu, cuda)')
     parser.add_argument('--compute-type', default='auto', help='Compute type (auto, int8, float16, float32)')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket of a running transcribe_server.py')
+    parser.add_argument('--stream', action='store_true', help='Emit NDJSON: one record per segment, then a summary')
+    parser.add_argument('--skip-non-speech', action='store_true',
+                        help='Return an empty transcript without loading a model if a NumPy pre-pass finds no speech')
+    add_profile_arguments(parser)
+    add_cache_arguments(parser)
+    add_host_config_arguments(parser)
+    add_startup_arguments(parser)
 
     args = parser.parse_args()
+    if args.startup_report:
+        atexit.register(STARTUP.print)
 
-    # Import here to fail fast if not installed
-    try:
-        from faster_whisper import WhisperModel
-    except ImportError:
+    audio_path = Path(args.audio_path)
+    if not audio_path.exists():
         print(json.dumps({
-            'error': 'faster-whisper not installed. Run: pip3 install faster-whisper'
+            'error': f'Audio file not found: {audio_path}'
         }))
         sys.exit(1)
 
-    audio_path = Path(args.audio_path)
-    if not audio_path.exists():
+    try:
+        options = resolve_profile(args.profile, args.profiles_file)
+    except (OSError, ValueError) as e:
         print(json.dumps({
-            'error': f'Audio file not found: {audio_path}'
+            'error': str(e)
         }))
         sys.exit(1)
 
     # Determine device and compute type
-    device = args.device
-    compute_type = args.compute_type
+    device, compute_type = resolve_device(args.device, args.compute_type)
+    tuned = host_settings(args.host_config, device, args.compute_type)
+    compute_type = tuned.get('compute_type', compute_type)
+    load_options = {'cpu_threads': tuned['cpu_threads']} if tuned.get('cpu_threads') else {}
 
-    if device == 'auto':
-        try:
-            import torch
-            device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        except ImportError:
-            device = 'cpu'
+    cache = open_cache(args)
+    if cache:
+        key = cache_key(audio_digest(audio_path), {
+            'model': args.model,
+            'compute_type': compute_type,
+            'language': args.language if args.language and args.language != 'auto' else None,
+            **options
+        })
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"Cache hit for {audio_path}, skipping transcription", file=sys.stderr)
+            output_result(cached, args.stream)
+            return
 
-    if compute_type == 'auto':
-        compute_type = 'float16' if device == 'cuda' else 'int8'
+    if args.skip_non_speech:
+        result = non_speech_result(audio_path)
+        if result is not None:
+            print(f"No speech detected in {audio_path}, skipping transcription", file=sys.stderr)
+            output_result(result, args.stream)
+            return
 
-    # Try CUDA first, fall back to CPU if it fails
-    try:
-        result = transcribe_audio(audio_path, args.model, args.language, device, compute_type)
-        print(json.dumps(result))
-    except Exception as e:
-        if device == 'cuda':
-            # CUDA failed, try CPU as fallback
-            print(f"CUDA failed ({e}), falling back to CPU...", file=sys.stderr)
-            try:
-                result = transcribe_audio(audio_path, args.model, args.language, 'cpu', 'int8')
-                print(json.dumps(result))
-                return
-            except Exception as cpu_error:
+    def finish(result):
+        # A CPU fallback result, local or from the server, does not belong under the requested compute type's key
+        if cache and all(r['device'] == device for r in result.get('device_ranges') or []):
+            cache.put(key, result)
+        output_result(result, args.stream)
+
+    if args.socket:
+        response = transcribe_via_server(args.socket, audio_path, args, options)
+        if response is not None:
+            if 'error' in response:
                 print(json.dumps({
-                    'error': f'Both CUDA and CPU failed: {cpu_error}'
+                    'error': response['error']['message']
                 }))
                 sys.exit(1)
-        else:
-            print(json.dumps({
-                'error': str(e)
-            }))
+            finish(response['result'])
+            return
+
+    # Fail fast if not installed; the import itself waits until a model is loaded
+    if not faster_whisper_installed():
+        print(json.dumps({
+            'error': 'faster-whisper not installed. Run: pip3 install faster-whisper'
+        }))
+        sys.exit(1)
+
+    # Streamed segments are not collected, so stream runs only read the cache
+    if args.stream:
+        try:
+            stream_transcription(audio_path, args.model, args.language, device, compute_type, options, load_options)
+        except Exception as e:
+            emit({'type': 'error', 'error': str(e)})
             sys.exit(1)
+        return
+
+    # Try CUDA first; if it fails, CPU continues from the last decoded segment
+    try:
+        result = transcribe_audio(audio_path, args.model, args.language, device, compute_type, options,
+                                  load_options)
+    except Exception as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
+    finish(result)
 
 if __name__ == '__main__':
     main()
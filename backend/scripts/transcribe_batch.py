@@ -2,150 +2,1265 @@
 """
 Batch transcription script using faster-whisper library.
 Processes multiple audio files with a single model load for efficiency.
+With --manifest, processes several videos (newest trading day first) with
+that same model load.
 """
 
+from startup_report import STARTUP, add_startup_arguments
+
 import os
 import argparse
+import atexit
 import json
+import re
 import sys
+import time
+from bisect import bisect_right
 from pathlib import Path
 
-# Preload CUDA libraries before importing torch/ctranslate2
-import ctypes
-cudnn_lib_path = os.path.expanduser('~/.local/lib/python3.11/site-packages/nvidia/cudnn/lib')
-cublas_lib_path = os.path.expanduser('~/.local/lib/python3.11/site-packages/nvidia/cublas/lib')
-nvjitlink_lib_path = os.path.expanduser('~/.local/lib/python3.11/site-packages/nvidia/nvjitlink/lib')
+from decode_profiles import add_profile_arguments, resolve_profile
+from host_tuning import add_host_config_arguments, host_settings, physical_cores
+from transcribe import DECODE_OPTIONS, emit, faster_whisper_installed, iter_segments, load_model, resolve_device
+from audio_fingerprint import (DEFAULT_FINGERPRINT_DIR, FingerprintStore, chunk_start, fingerprint,
+                               frames_to_seconds, seconds_to_frames)
+from audio_source import PCM_DTYPES, SAMPLE_RATE, load_chunks
+from loop_guard import GuardedSegments, loop_report
+from speech_detect import DEFAULT_MIN_SPEECH_RATIO, is_speech
+from transcription_cache import add_cache_arguments, cache_key, open_cache
+from transcription_metrics import DecodeTimer, RunMetrics, chunk_metrics, peak_rss_mb
+
+
+def transcribe_chunk(model, chunk, language, on_segment=None, options=None):
+    """Transcribe one chunk (file or window). Returns (result, audio_seconds).
+
+    on_segment is called for each segment as it is decoded.
+    """
+    timer = DecodeTimer()
+    segments, info = iter_segments(model, chunk.source(), language, label=chunk.name, options=options)
+
+    # Collect segments
+    segment_list = []
+    full_text = []
+
+    for segment in segments:
+        if on_segment:
+            on_segment(segment)
+        segment_list.append(segment)
+        full_text.append(segment['text'])
+
+    loops = loop_report(segments)
+    return {
+        **chunk.describe(),
+        'text': ' '.join(full_text),
+        'language': info.language,
+        'language_probability': info.language_probability,
+        'segments': segment_list,
+        **({'loops': loops} if loops else {}),
+        'metrics': timer.finish(info.duration, len(segment_list), info.duration - info.duration_after_vad, loops)
+    }, info.duration
+
+
+def skipped_chunk(chunk):
+    return {
+        **chunk.describe(),
+        'text': '',
+        'language': None,
+        'language_probability': None,
+        'segments': [],
+        'skipped': 'non_speech'
+    }
+
+
+def failed_chunk(chunk, error):
+    return {
+        **chunk.describe(),
+        'text': '',
+        'error': str(error)
+    }
+
+
+# Profile options the batched pipeline takes as they are; VAD runs up front per chunk,
+# and condition_on_previous_text does not apply to independently decoded clips
+BATCHED_OPTIONS = ('beam_size', 'best_of', 'temperature', 'without_timestamps')
+
+
+def speech_clips(audio, offset, sampling_rate, vad_options):
+    """Clips (in samples of the concatenated batch audio) covering the speech in one chunk.
+
+    Speech from the first to the last VAD region becomes one clip, split
+    into windows no longer than 30s so each clip is a single encoder input.
+    """
+    from faster_whisper.vad import get_speech_timestamps
+
+    speech = get_speech_timestamps(audio, vad_options)
+    if not speech:
+        return []
+
+    window = 30 * sampling_rate
+    clips = []
+    start, end = speech[0]['start'], speech[-1]['end']
+    while start < end:
+        clips.append({'start': offset + start, 'end': offset + min(start + window, end)})
+        start += window
+    return clips
+
+
+def decode_group(model, pipeline, group, language, batch_size, options=DECODE_OPTIONS):
+    """Transcribe several chunk files with one batched pipeline call per language.
+
+    Returns [(result, audio_seconds)] in the order of group.
+    """
+    import numpy as np
+    from faster_whisper.vad import VadOptions
+
+    sampling_rate = model.feature_extractor.sampling_rate
+    vad_options = VadOptions(**options.get('vad_parameters', {}))
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+
+    audios, offsets, clips, languages = [], [], [], []
+    offset = 0
+    for chunk in group:
+        audio = chunk.samples()
+        chunk_clips = speech_clips(audio, offset, sampling_rate, vad_options)
+
+        # Same per-chunk language as model.transcribe() would pick
+        if language:
+            chunk_language = (language, 1.0)
+        elif chunk_clips:
+            detected, probability, _ = model.detect_language(audio=audio)
+            chunk_language = (detected, probability)
+        else:
+            chunk_language = None
+
+        audios.append(audio)
+        offsets.append(offset)
+        clips.append(chunk_clips)
+        languages.append(chunk_language)
+        offset += len(audio)
+
+    batch_audio = np.concatenate(audios)
+    segments_by_chunk = [[] for _ in group]
+
+    for decode_language in sorted({lang for lang, _ in filter(None, languages)}):
+        language_clips = [
+            clip
+            for chunk_clips, chunk_language in zip(clips, languages)
+            if chunk_language and chunk_language[0] == decode_language
+            for clip in chunk_clips
+        ]
+        segments, _ = pipeline.transcribe(
+            batch_audio,
+            language=decode_language,
+            batch_size=batch_size,
+            vad_filter=False,
+            clip_timestamps=language_clips,
+            **{'without_timestamps': False,
+               **{key: value for key, value in options.items() if key in BATCHED_OPTIONS}}
+        )
+
+        for segment in segments:
+            # Map the segment back to the chunk it was cut from
+            i = bisect_right(offsets, segment.start * sampling_rate) - 1
+            base = offsets[i] / sampling_rate
+            segments_by_chunk[i].append({
+                'start': round(segment.start - base, 3),
+                'end': round(segment.end - base, 3),
+                'text': segment.text.strip(),
+                'avg_logprob': segment.avg_logprob,
+                'compression_ratio': segment.compression_ratio,
+                'no_speech_prob': segment.no_speech_prob
+            })
+
+    # The batch is timed as a whole; each chunk gets its share by audio length,
+    # and the batch's RSS growth is counted on its first chunk
+    decode_seconds = time.perf_counter() - started
+    rss_delta = peak_rss_mb() - rss_before
+
+    results = []
+    for i, (chunk, audio, chunk_clips, chunk_language, segment_list) in enumerate(
+            zip(group, audios, clips, languages, segments_by_chunk)):
+        segment_list.sort(key=lambda segment: segment['start'])
+        loops = None
+        if options.get('loop_guard'):
+            # The batch is already decoded, so loops can only be dropped, not skipped
+            guarded = GuardedSegments(iter(segment_list), options['loop_guard'])
+            segment_list = list(guarded)
+            loops = guarded.report()
+        audio_seconds = len(audio) / sampling_rate
+        speech_seconds = sum(clip['end'] - clip['start'] for clip in chunk_clips) / sampling_rate
+        # No speech at all: report the batch's language like the VAD-filtered path would
+        detected, probability = chunk_language or next(filter(None, languages), (language, None))
+        results.append(({
+            **chunk.describe(),
+            'text': ' '.join(segment['text'] for segment in segment_list),
+            'language': detected,
+            'language_probability': probability,
+            'segments': segment_list,
+            **({'loops': loops} if loops else {}),
+            'metrics': chunk_metrics(decode_seconds * len(audio) / len(batch_audio), audio_seconds,
+                                     len(segment_list), audio_seconds - speech_seconds, rss_delta if i == 0 else 0.0,
+                                     loops)
+        }, audio_seconds))
+    return results
+
+
+def transcribe_batched(model, chunks, language, batch_size, on_segment=None, options=DECODE_OPTIONS):
+    """Yield (result, audio_seconds) per chunk, in order, decoding batch_size chunks together.
+
+    Built on faster-whisper's BatchedInferencePipeline: the speech of each
+    chunk in a group is one clip, and all clips share encoder/decoder calls.
+    """
+    from faster_whisper import BatchedInferencePipeline
+
+    pipeline = BatchedInferencePipeline(model=model)
+
+    for group_start in range(0, len(chunks), batch_size):
+        group = chunks[group_start:group_start + batch_size]
+        print(f"Transcribing chunks {group_start+1}-{group_start+len(group)}/{len(chunks)} as one batch", file=sys.stderr)
+
+        try:
+            results = decode_group(model, pipeline, group, language, batch_size, options)
+        except Exception as e:
+            print(f"Error processing batch starting at {group[0].name}: {e}", file=sys.stderr)
+            results = [(failed_chunk(chunk, e), 0.0) for chunk in group]
+
+        for result, audio_seconds in results:
+            if on_segment:
+                for segment in result.get('segments', []):
+                    on_segment(result['chunk_index'], segment)
+            yield result, audio_seconds
+
+
+def transcribe_serial(model, chunks, language, on_segment=None, options=None):
+    """Yield (result, audio_seconds) per chunk, in order, using one loaded model."""
+    for i, chunk in enumerate(chunks):
+        print(f"Transcribing chunk {i+1}/{len(chunks)}: {chunk.name}", file=sys.stderr)
+        chunk_index = chunk.index
+
+        try:
+            yield transcribe_chunk(
+                model, chunk, language,
+                on_segment=(lambda segment: on_segment(chunk_index, segment)) if on_segment else None,
+                options=options
+            )
+        except Exception as e:
+            print(f"Error processing {chunk.name}: {e}", file=sys.stderr)
+            yield failed_chunk(chunk, e), 0.0
+
+
+# Model owned by each worker process of the sharded pool
+_worker_model = None
+# (model name, load seconds) until reported with the worker's first decoded chunk
+_worker_load = None
+
+
+def _init_worker(model_name, compute_type, cpu_threads):
+    global _worker_model, _worker_load
+    started = time.perf_counter()
+    _worker_model = load_model(model_name, 'cpu', compute_type, cpu_threads=cpu_threads)
+    _worker_load = (model_name, round(time.perf_counter() - started, 3))
+
+
+def _transcribe_in_worker(group, language, batch_size, options):
+    global _worker_load
+
+    if batch_size > 1:
+        results = list(transcribe_batched(_worker_model, group, language, batch_size, options=options))
+    else:
+        results = []
+        for chunk in group:
+            try:
+                results.append(transcribe_chunk(_worker_model, chunk, language, options=options))
+            except Exception as e:
+                print(f"Error processing {chunk.name}: {e}", file=sys.stderr)
+                results.append((failed_chunk(chunk, e), 0.0))
+
+    for result, _ in results:
+        if _worker_load and 'metrics' in result:
+            result['metrics'].update(model=_worker_load[0], model_load_seconds=_worker_load[1])
+            _worker_load = None
+    return results
+
+
+def open_worker_pool(model_name, compute_type, workers, cpu_threads=None):
+    """A pool of CPU worker processes, each with its own model.
+
+    cpu_threads defaults to sizing workers x threads to the physical cores.
+    """
+    cpu_threads = cpu_threads or max(1, physical_cores() // workers)
+    print(f"Starting {workers} workers for {model_name} ({cpu_threads} threads each)...", file=sys.stderr)
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn: forked children would inherit the parent's OpenMP/ctranslate2 thread state
+    context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=_init_worker,
+                               initargs=(model_name, compute_type, cpu_threads))
+
+
+def transcribe_sharded(chunks, pool, language, batch_size=1, options=DECODE_OPTIONS):
+    """Yield (result, audio_seconds) per chunk, in order, from a worker pool.
+
+    Chunks are handed out in groups of batch_size.
+    """
+    print(f"Sharding {len(chunks)} chunks across the worker pool...", file=sys.stderr)
+    futures = [
+        pool.submit(_transcribe_in_worker, chunks[i:i + batch_size], language, batch_size, options)
+        for i in range(0, len(chunks), batch_size)
+    ]
+
+    # Waiting in submission order releases results in chunk_index order
+    completed = 0
+    for future in futures:
+        for result, audio_seconds in future.result():
+            completed += 1
+            print(f"Completed chunk {completed}/{len(chunks)}: {result['file']}", file=sys.stderr)
+            yield result, audio_seconds
+
+
+class SharedModels:
+    """Models, or CPU worker pools, loaded once and reused by every video of a run."""
+
+    def __init__(self, device, workers, cpu_threads=None):
+        self.device = device
+        self.cpu_threads = cpu_threads
+        self.workers = workers
+        self.models = {}
+        self.pools = {}
+
+    def decode(self, files, model_name, compute_type, language, batch_size, options, run_metrics, on_segment=None):
+        """Yield (result, audio_seconds) per file, in order, with the resident model."""
+        key = (model_name, compute_type)
+        if self.workers > 1:
+            if key not in self.pools:
+                self.pools[key] = open_worker_pool(model_name, compute_type, self.workers, self.cpu_threads)
+            return transcribe_sharded(files, self.pools[key], language, batch_size, options)
+
+        if key not in self.models:
+            started = time.perf_counter()
+            kwargs = {'cpu_threads': self.cpu_threads} if self.cpu_threads else {}
+            self.models[key] = load_model(model_name, self.device, compute_type, **kwargs)
+            run_metrics.model_load(model_name, time.perf_counter() - started)
+        model = self.models[key]
+        print(f"Model ready. Processing {len(files)} chunks...", file=sys.stderr)
+        if batch_size > 1:
+            return transcribe_batched(model, files, language, batch_size, on_segment, options)
+        return transcribe_serial(model, files, language, on_segment, options)
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+        self.pools.clear()
+
+
+def merge_results(chunks, known, produce, on_produced=None):
+    """Yield (result, audio_seconds) per chunk, in order.
+
+    known maps chunk name -> callable returning that chunk's result without
+    decoding. produce(chunks) is called once with the remaining chunks (so
+    the model is never loaded when nothing is left) and must yield in order.
+    on_produced(chunk, result, audio_seconds) sees each produced result.
+    """
+    remaining = [chunk for chunk in chunks if chunk.name not in known]
+    produced = produce(remaining) if remaining else iter(())
+
+    for chunk in chunks:
+        if chunk.name in known:
+            yield known.pop(chunk.name)()
+            continue
+
+        result, audio_seconds = next(produced)
+        if on_produced:
+            on_produced(chunk, result, audio_seconds)
+        yield result, audio_seconds
+
+
+def with_cache(chunks, cache, options, decode):
+    """Yield (result, audio_seconds) per chunk, in order, decoding only cache misses."""
+    keys = {chunk.name: cache_key(chunk.digest(), options) for chunk in chunks}
+    known = {}
+    for chunk in chunks:
+        entry = cache.get(keys[chunk.name])
+        if entry is not None:
+            known[chunk.name] = lambda chunk=chunk, entry=entry: ({**chunk.describe(), **entry['result']},
+                                                                 entry['audio_seconds'])
+    print(f"Cache: {len(known)} hits, {len(chunks) - len(known)} misses", file=sys.stderr)
+
+    def store(chunk, result, audio_seconds):
+        if 'error' not in result:
+            # Identical audio can show up under another name, so the name is not stored;
+            # a cache hit is not a decode, so neither are the decode metrics
+            stored = {k: v for k, v in result.items() if k not in chunk.describe() and k != 'metrics'}
+            cache.put(keys[chunk.name], {'result': stored, 'audio_seconds': audio_seconds})
+
+    return merge_results(chunks, known, decode, store)
+
+
+class SpeechFilter:
+    """Energy/flatness pre-pass: chunks that are confidently non-speech are never decoded."""
+
+    def __init__(self, min_speech_ratio):
+        self.min_speech_ratio = min_speech_ratio
+        self.skipped_chunks = 0
+        self.skipped_seconds = 0.0
+
+    def apply(self, chunks, produce):
+        known = {}
+        for chunk in chunks:
+            samples = chunk.samples()
+            if not is_speech(samples, self.min_speech_ratio):
+                audio_seconds = len(samples) / SAMPLE_RATE
+                known[chunk.name] = lambda chunk=chunk, audio_seconds=audio_seconds: (
+                    skipped_chunk(chunk), audio_seconds)
+                self.skipped_chunks += 1
+                self.skipped_seconds += audio_seconds
+        print(f"Non-speech pre-pass: skipping {self.skipped_chunks}/{len(chunks)} chunks "
+              f"({self.skipped_seconds:.1f}s of audio)", file=sys.stderr)
+        return merge_results(chunks, known, produce)
+
+    def summary(self):
+        return {
+            'skipped_chunks': self.skipped_chunks,
+            'skipped_seconds': round(self.skipped_seconds, 3)
+        }
+
+
+# Stock calls name an action and a price: "buy above 450", "टारगेट 520", "₹480 का स्टॉप लॉस".
+# Topic words alone (share, nifty, भाव) are in nearly every chunk of a market show.
+# \w alone splits Devanagari words at their vowel signs
+CUE_WORD_CHARS = r'\w\u0900-\u0963\u0966-\u097f'
+CUE_ACTIONS = (
+    r'buy(?:s|ing)?', r'sell(?:s|ing)?', r'targets?', r'stop ?loss', r'sl', r'accumulate',
+    r'खरीद(?:ें|ना|ने|िए|ो|ी|ा)?', r'बेच(?:ें|ना|ने|िए|ो|ी|ा)?', r'टारगेट', r'स्टॉप ?लॉस'
+)
+# Most words allowed between the action and the price
+CUE_MAX_GAP_WORDS = 3
+
+
+def cue_pattern():
+    """An action word (CUE_ACTIONS) within CUE_MAX_GAP_WORDS words of a number or ₹, either way round."""
+    action = rf'(?<![{CUE_WORD_CHARS}])(?:{"|".join(CUE_ACTIONS)})(?![{CUE_WORD_CHARS}])'
+    price = rf'(?:₹\s*|(?<![{CUE_WORD_CHARS}]))[0-9\u0966-\u096f]'
+    gap = rf'(?:[^{CUE_WORD_CHARS}]+[{CUE_WORD_CHARS}]+){{0,{CUE_MAX_GAP_WORDS}}}[^{CUE_WORD_CHARS}]*'
+    return re.compile(rf'{action}{gap}{price}|{price}[0-9\u0966-\u096f,.]*{gap}{action}', re.IGNORECASE)
+
+
+CUE_PATTERN = cue_pattern()
+
+# Whisper's own fallback thresholds are -1.0 and 2.4; escalate a little before those
+DEFAULT_MIN_AVG_LOGPROB = -0.7
+DEFAULT_MAX_COMPRESSION_RATIO = 2.2
+
+
+class Cascade:
+    """Two-tier decoding: a small model over every chunk, the full model only where it matters.
+
+    A chunk is re-decoded with the accurate model when the fast pass failed,
+    any segment has a low avg_logprob or a high compression_ratio (a
+    repetition loop), the loop guard cut something out, or the text reads
+    like a stock call (CUE_PATTERN). Every result is marked with the tier
+    that produced it.
+    """
+
+    def __init__(self, min_avg_logprob=DEFAULT_MIN_AVG_LOGPROB,
+                 max_compression_ratio=DEFAULT_MAX_COMPRESSION_RATIO):
+        self.min_avg_logprob = min_avg_logprob
+        self.max_compression_ratio = max_compression_ratio
+        self.fast_chunks = 0
+        self.fast_seconds = 0.0
+        self.accurate_chunks = 0
+        self.accurate_seconds = 0.0
+        self.chunks = 0
+        self.reasons = {}
+
+    def escalation(self, result):
+        """Why the chunk needs the accurate model, or None if the fast result stands."""
+        if 'error' in result:
+            return 'error'
+        if result.get('loops', {}).get('ranges'):
+            return 'loop'
+        for segment in result['segments']:
+            # Results cached before the metrics were recorded cannot be judged
+            avg_logprob = segment.get('avg_logprob')
+            compression_ratio = segment.get('compression_ratio')
+            if avg_logprob is None or compression_ratio is None:
+                return 'no_metrics'
+            if avg_logprob < self.min_avg_logprob:
+                return 'low_logprob'
+            if compression_ratio > self.max_compression_ratio:
+                return 'high_compression'
+        if CUE_PATTERN.search(result['text']):
+            return 'cue_word'
+        return None
+
+    def apply(self, chunks, fast, accurate):
+        """Yield (result, audio_seconds) per chunk, in order.
+
+        fast(chunks) runs first over every chunk; accurate(chunks) then gets
+        only the escalated ones.
+        """
+        print(f"Cascade: fast pass over {len(chunks)} chunks...", file=sys.stderr)
+        known = {}
+        for chunk, (result, audio_seconds) in zip(chunks, fast(chunks)):
+            reason = self.escalation(result)
+            if reason:
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+                continue
+            self.fast_chunks += 1
+            self.fast_seconds += audio_seconds or 0.0
+            known[chunk.name] = lambda result=result, audio_seconds=audio_seconds: (
+                {**result, 'tier': 'fast'}, audio_seconds)
+
+        self.chunks += len(chunks)
+        escalated = len(chunks) - len(known)
+        print(f"Cascade: re-decoding {escalated}/{len(chunks)} chunks with the accurate model "
+              f"({json.dumps(self.reasons)}); {self.cue_word_share():.0%} of chunks escalated for cue_word",
+              file=sys.stderr)
+
+        def redecode(files):
+            for result, audio_seconds in accurate(files):
+                self.accurate_chunks += 1
+                self.accurate_seconds += audio_seconds or 0.0
+                yield {**result, 'tier': 'accurate'}, audio_seconds
+
+        return merge_results(chunks, known, redecode)
+
+    def summary(self):
+        return {
+            'fast_chunks': self.fast_chunks,
+            'fast_seconds': round(self.fast_seconds, 3),
+            'accurate_chunks': self.accurate_chunks,
+            'accurate_seconds': round(self.accurate_seconds, 3),
+            'escalations': self.reasons,
+            'cue_word_share': round(self.cue_word_share(), 4)
+        }
+
+    def cue_word_share(self):
+        """Share of chunks re-decoded only because they read like a stock call."""
+        return self.reasons.get('cue_word', 0) / self.chunks if self.chunks else 0.0
+
+
+class Deduper:
+    """Reuse transcripts of same-day videos whose audio overlaps this one, and index this one.
+
+    apply() answers chunks found in an already indexed video of the group and
+    hands the rest to produce(); record() wraps the final result stream and
+    stores this video's fingerprints and transcript once every chunk is done.
+    """
+
+    def __init__(self, store, video_id, chunk_seconds):
+        self.store = store
+        self.video_id = video_id
+        self.chunk_seconds = chunk_seconds
+        self.prints = {}
+        self.reused_chunks = 0
+        self.reused_seconds = 0.0
+        self.sources = {}
+
+    def chunk_print(self, chunk):
+        if chunk.name not in self.prints:
+            start = chunk_start(chunk, self.chunk_seconds)
+            self.prints[chunk.name] = fingerprint(chunk.samples(), seconds_to_frames(start))
+        return self.prints[chunk.name]
+
+    def apply(self, chunks, produce):
+        others = self.store.load_others(self.video_id)
+        known = {}
+        for chunk in chunks:
+            hashes, frames = self.chunk_print(chunk)
+            for other in others:
+                reused = self.reuse(chunk, other, hashes, frames)
+                if reused:
+                    known[chunk.name] = lambda reused=reused: reused
+                    break
+
+        print(f"Dedupe: {len(known)}/{len(chunks)} chunks found in {len(others)} indexed videos "
+              f"of the group {json.dumps(self.sources)}", file=sys.stderr)
+        return merge_results(chunks, known, produce)
+
+    def reuse(self, chunk, other, hashes, frames):
+        """(result, audio_seconds) for chunk cut from other's transcript, or None."""
+        offset = other.offset_for(hashes, frames)
+        if offset is None:
+            return None
+
+        audio_seconds = len(chunk.samples()) / SAMPLE_RATE
+        other_start = chunk_start(chunk, self.chunk_seconds) + frames_to_seconds(offset)
+        if not other.covers(other_start, other_start + audio_seconds):
+            return None
+
+        segments = other.excerpt(other_start, other_start + audio_seconds)
+        language, probability = other.language_at(other_start)
+        self.reused_chunks += 1
+        self.reused_seconds += audio_seconds
+        self.sources[other.video_id] = self.sources.get(other.video_id, 0) + 1
+        return {
+            **chunk.describe(),
+            'text': ' '.join(segment['text'] for segment in segments),
+            'language': language,
+            'language_probability': probability,
+            'segments': segments,
+            'reused_from': {'video_id': other.video_id, 'start_time': round(other_start, 3)}
+        }, audio_seconds
+
+    def record(self, chunks, results):
+        """Pass results through; after the last one, index this video's audio and transcript."""
+        import numpy as np
+
+        by_index = {chunk.index: chunk for chunk in chunks}
+        transcript = {'ranges': [], 'segments': [], 'languages': []}
+        for result, audio_seconds in results:
+            chunk = by_index.get(result['chunk_index'])
+            if chunk is not None and 'error' not in result:
+                start = chunk_start(chunk, self.chunk_seconds)
+                end = start + (audio_seconds or len(chunk.samples()) / SAMPLE_RATE)
+                transcript['ranges'].append([start, end])
+                transcript['languages'].append([start, end, result.get('language'),
+                                                result.get('language_probability')])
+                for segment in result.get('segments', []):
+                    transcript['segments'].append({
+                        **segment,
+                        'start': round(start + segment['start'], 3),
+                        'end': round(start + segment['end'], 3)
+                    })
+            yield result, audio_seconds
+
+        prints = [self.chunk_print(chunk) for chunk in chunks]
+        # Overlapping windows fingerprint and transcribe the same audio twice; keep one copy
+        pairs = np.unique(np.stack([np.concatenate([hashes for hashes, _ in prints]).astype(np.int64),
+                                    np.concatenate([frames for _, frames in prints])]), axis=1)
+        transcript['segments'] = list({
+            segment['start']: segment for segment in sorted(transcript['segments'], key=lambda s: s['start'])
+        }.values())
+        self.store.save(self.video_id, pairs[0], pairs[1], transcript)
+        print(f"Dedupe: indexed {self.video_id} ({pairs.shape[1]} hashes) in {self.store.dir}", file=sys.stderr)
+
+    def summary(self):
+        return {
+            'video_id': self.video_id,
+            'reused_chunks': self.reused_chunks,
+            'reused_seconds': round(self.reused_seconds, 3),
+            'sources': self.sources
+        }
+
+
+class ChunkJournal:
+    """Append-only JSON-lines record of finished chunks, kept next to --output.
+
+    Every chunk is fsynced as soon as it completes, so a crash loses at most
+    the chunk being decoded. The final --output document is assembled from
+    the journal, reading one entry at a time by byte offset.
+    """
+
+    def __init__(self, output_path):
+        self.path = Path(f'{output_path}.journal.jsonl')
+        self.file = None
+
+    @staticmethod
+    def parse(line):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # Torn write from a crash
+            return None
+        chunk = entry.get('chunk') if isinstance(entry, dict) else None
+        if not isinstance(chunk, dict) or 'chunk_index' not in chunk or 'file' not in chunk:
+            return None
+        return entry
+
+    def scan(self, chunks, include_failed=True):
+        """Map chunk file name -> byte offset of its latest valid entry."""
+        identities = {chunk.name: chunk.identity() for chunk in chunks}
+        offsets = {}
+        if not self.path.exists():
+            return offsets
 
-# Load libraries in dependency order
-for lib_path in [nvjitlink_lib_path, cublas_lib_path, cudnn_lib_path]:
-    if os.path.exists(lib_path):
-        for lib in sorted(Path(lib_path).glob('*.so*')):
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                entry = self.parse(line) if line.endswith(b'\n') else None
+                # The chunk must still be the audio that was transcribed
+                if entry and identities.get(entry['chunk']['file']) == entry.get('source_id'):
+                    if include_failed or 'error' not in entry['chunk']:
+                        offsets[entry['chunk']['file']] = offset
+                offset += len(line)
+        return offsets
+
+    def read(self, offset):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def open(self, resume):
+        if resume and self.path.exists():
+            # Drop a partially written last line so appends start on a fresh line
+            with open(self.path, 'rb+') as f:
+                data = f.read()
+                f.truncate(data.rfind(b'\n') + 1)
+            self.file = open(self.path, 'ab')
+        else:
+            self.file = open(self.path, 'wb')
+
+    def append(self, result, audio_seconds, source_id):
+        line = json.dumps({'chunk': result, 'audio_seconds': audio_seconds, 'source_id': source_id},
+                          ensure_ascii=False)
+        self.file.write(line.encode('utf-8') + b'\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def assemble(self, output_path, chunks, run=None):
+        """Write the --output document from the journal in chunk_index order, then drop the journal.
+
+        run holds the run-level fields (profile, metrics) written after the chunks.
+        """
+        offsets = self.scan(chunks)
+        ordered = sorted(
+            (chunk.index, offsets[chunk.name])
+            for chunk in chunks if chunk.name in offsets
+        )
+
+        tmp_path = Path(f'{output_path}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write('{\n  "chunks": [\n')
+            for i, (_, offset) in enumerate(ordered):
+                if i:
+                    f.write(',\n')
+                f.write('    ' + json.dumps(self.read(offset)['chunk'], ensure_ascii=False))
+            f.write(f'\n  ],\n  "total_chunks": {len(chunks)}')
+            for key, value in (run or {}).items():
+                f.write(f',\n  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}')
+            f.write('\n}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+        self.path.unlink()
+
+
+def with_journal(chunks, journal, resume, produce):
+    """Yield (result, audio_seconds) per chunk, in order, journaling each new result.
+
+    With resume, chunks that already have a valid, successful journal entry
+    are replayed from it and produce(chunks) only sees the rest.
+    """
+    done = journal.scan(chunks, include_failed=False) if resume else {}
+    if resume:
+        print(f"Resuming: {len(done)} chunks already journaled, {len(chunks) - len(done)} to go", file=sys.stderr)
+
+    def replay(offset):
+        entry = journal.read(offset)
+        return entry['chunk'], entry['audio_seconds']
+
+    known = {name: lambda offset=offset: replay(offset) for name, offset in done.items()}
+
+    journal.open(resume)
+    try:
+        yield from merge_results(chunks, known, produce,
+                                 lambda chunk, result, audio_seconds: journal.append(result, audio_seconds,
+                                                                                     chunk.identity()))
+    finally:
+        journal.close()
+
+
+class Throughput:
+    """Aggregate real-time factor over a run: wall time of the run per second of audio."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.audio_seconds = 0.0
+
+    def add(self, audio_seconds):
+        self.audio_seconds += audio_seconds or 0.0
+
+    def summary(self):
+        wall_seconds = time.monotonic() - self.started
+        rtf = wall_seconds / self.audio_seconds if self.audio_seconds else None
+        return {
+            'audio_seconds': round(self.audio_seconds, 3),
+            'wall_seconds': round(wall_seconds, 3),
+            'rtf': round(rtf, 4) if rtf is not None else None
+        }
+
+    def report(self):
+        summary = self.summary()
+        if summary['rtf']:
+            print(f"Transcribed {summary['audio_seconds']:.1f}s of audio in {summary['wall_seconds']:.1f}s "
+                  f"(RTF {summary['rtf']:.3f}, {1 / summary['rtf']:.1f}x real-time)", file=sys.stderr)
+        return summary
+
+
+def stream_chunks(results, chunks, output_path, journal, throughput, live_chunks, reports, profile=None):
+    """Emit NDJSON records per chunk as results arrive, then a summary.
+
+    Chunks in live_chunks already had their segment records emitted by the
+    decoder callback; for the rest (worker pool, cache, journal) they are
+    emitted from the finished chunk. reports maps a summary key to the
+    layer (cache, speech filter, cascade) whose summary() goes there.
+    """
+    failed = 0
+
+    for result, audio_seconds in results:
+        throughput.add(audio_seconds)
+        if 'error' in result:
+            failed += 1
+        elif result['chunk_index'] not in live_chunks:
+            for segment in result['segments']:
+                emit({'type': 'segment', 'chunk_index': result['chunk_index'], **segment})
+
+        emit({'type': 'chunk', **result})
+
+    summaries = {key: layer.summary() if layer else None for key, layer in reports.items()}
+    if journal:
+        journal.assemble(output_path, chunks, {'profile': profile, 'metrics': summaries.get('metrics')})
+        print(f"Results written to {output_path}", file=sys.stderr)
+
+    emit({
+        'type': 'summary',
+        'total_chunks': len(chunks),
+        'failed_chunks': failed,
+        'output': output_path,
+        'profile': profile,
+        **throughput.report(),
+        **summaries
+    })
+
+
+def finish_metrics(run_metrics, prometheus_path):
+    run_metrics.close()
+    if prometheus_path:
+        run_metrics.write_prometheus(prometheus_path)
+
+
+def transcribe_video(args, shared, chunks, options, compute_type, language=None, output_path=None,
+                     video_id=None, dedupe_group=None, stream=False, run_metrics=None, profile_name=None):
+    """Transcribe one video's chunks through the dedupe, speech, cascade, cache and journal layers.
+
+    Returns the output document. In stream mode NDJSON records are emitted
+    as chunks finish and the summary record is returned instead.
+    """
+    throughput = Throughput()
+    run_metrics = run_metrics or RunMetrics(video_id or 'batch')
+    profile = {'name': profile_name or args.profile, 'options': options}
+
+    on_segment = None
+    live_chunks = set()
+    if stream:
+        def on_segment(chunk_index, segment):
+            live_chunks.add(chunk_index)
+            emit({'type': 'segment', 'chunk_index': chunk_index, **segment})
+
+    def decode(files, model_name, compute_type, on_segment):
+        return shared.decode(files, model_name, compute_type, language, args.batch_size, options,
+                             run_metrics, on_segment)
+
+    cache = open_cache(args)
+
+    def decode_or_cache(files, model_name, compute_type, on_segment=None):
+        if not cache:
+            return decode(files, model_name, compute_type, on_segment)
+        key_options = {
+            'model': model_name,
+            'compute_type': compute_type,
+            'language': language,
+            'batched': args.batch_size > 1,
+            **options
+        }
+        return with_cache(files, cache, key_options, lambda rest: decode(rest, model_name, compute_type, on_segment))
+
+    cascade = None
+    if args.cascade:
+        cascade = Cascade(args.min_avg_logprob, args.max_compression_ratio)
+        fast_compute_type = args.fast_compute_type
+        if fast_compute_type == 'auto':
+            fast_compute_type = 'int8_float16' if shared.device == 'cuda' else 'int8'
+
+    speech_filter = SpeechFilter(args.min_speech_ratio) if args.skip_non_speech else None
+
+    def transcribe(files):
+        if cascade:
+            # Fast-pass segments are not streamed live: the chunk may still be re-decoded
+            return cascade.apply(files,
+                                 lambda rest: decode_or_cache(rest, args.fast_model, fast_compute_type),
+                                 lambda rest: decode_or_cache(rest, args.model, compute_type, on_segment))
+        return decode_or_cache(files, args.model, compute_type, on_segment)
+
+    def filter_speech(files):
+        if speech_filter:
+            return speech_filter.apply(files, transcribe)
+        return transcribe(files)
+
+    deduper = None
+    if dedupe_group:
+        deduper = Deduper(FingerprintStore(args.fingerprint_dir, dedupe_group), video_id, args.chunk_seconds)
+
+    def produce(files):
+        if deduper:
+            return deduper.apply(files, filter_speech)
+        return filter_speech(files)
+
+    # Journal finished chunks next to the output so a crashed run can --resume
+    journal = ChunkJournal(output_path) if output_path else None
+    if journal:
+        results = with_journal(chunks, journal, args.resume, produce)
+    else:
+        results = produce(chunks)
+    if deduper:
+        results = deduper.record(chunks, results)
+    results = run_metrics.observe(results)
+
+    reports = {'cache': cache, 'non_speech': speech_filter, 'cascade': cascade, 'dedupe': deduper,
+               'metrics': run_metrics}
+    if stream:
+        return stream_chunks(results, chunks, output_path, journal, throughput, live_chunks, reports, profile)
+
+    chunk_results = []
+    for result, audio_seconds in results:
+        throughput.add(audio_seconds)
+        chunk_results.append(result)
+    throughput.report()
+    if cache:
+        print(f"Cache stats: {json.dumps(cache.summary())}", file=sys.stderr)
+    if speech_filter:
+        print(f"Non-speech skipped: {json.dumps(speech_filter.summary())}", file=sys.stderr)
+    if cascade:
+        print(f"Cascade: {json.dumps(cascade.summary())}", file=sys.stderr)
+    if deduper:
+        print(f"Dedupe: {json.dumps(deduper.summary())}", file=sys.stderr)
+
+    run = {'profile': profile, 'metrics': run_metrics.summary()}
+    if journal:
+        journal.assemble(output_path, chunks, run)
+        print(f"Results written to {output_path}", file=sys.stderr)
+
+    return {
+        'chunks': chunk_results,
+        'total_chunks': len(chunks),
+        **run
+    }
+
+
+def trading_day(entry):
+    """Date of a manifest entry as an ordinal, 0 if it has none (date, date_formatted or upload_date)."""
+    import datetime
+
+    for key, pattern in (('date', '%Y-%m-%d'), ('date_formatted', '%Y-%m-%d'), ('upload_date', '%Y%m%d')):
+        if entry.get(key):
             try:
-                ctypes.CDLL(str(lib), mode=ctypes.RTLD_GLOBAL)
-            except OSError:
+                return datetime.datetime.strptime(str(entry[key]), pattern).toordinal()
+            except ValueError:
                 pass
+    return 0
+
+
+def load_manifest(path):
+    """Entries of a JSON list or JSON-lines manifest, in processing order.
+
+    An entry is a path or an object with audio (chunk directory or audio
+    file) and optionally id, output, priority, date, language, profile
+    and dedupe_group. Higher priority goes first, then the newest trading day,
+    then manifest order.
+    """
+    import heapq
+
+    text = Path(path).read_text(encoding='utf-8')
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not isinstance(entries, list):
+        raise ValueError(f'{path} must be a JSON list or JSON lines')
+
+    queue = []
+    for position, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {'audio': entry}
+        if not isinstance(entry, dict) or not (entry.get('audio') or entry.get('audio_dir')):
+            raise ValueError(f'Manifest entry {position + 1} has no audio path')
+        entry = {**entry, 'audio': entry.get('audio') or entry.get('audio_dir')}
+        heapq.heappush(queue, (-float(entry.get('priority') or 0), -trading_day(entry), position, entry))
+
+    return [heapq.heappop(queue)[-1] for _ in range(len(queue))]
+
+
+class ProgressLog:
+    """Combined JSON-lines progress of a manifest run, one record per video event."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8') if path else None
+
+    def write(self, **record):
+        record = {'time': round(time.time(), 3), **record}
+        print(f"Manifest: {json.dumps(record, ensure_ascii=False)}", file=sys.stderr)
+        if self.file:
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+def run_manifest(args, shared, options, compute_type):
+    """Transcribe every manifest entry with the shared models; a failing video does not stop the rest."""
+    entries = load_manifest(args.manifest)
+    progress = ProgressLog(args.progress_log)
+    totals = Throughput()
+    profiles = {args.profile: options}
+    videos = []
+
+    try:
+        for position, entry in enumerate(entries, 1):
+            audio = Path(entry['audio'])
+            video_id = str(entry.get('id') or entry.get('video_id') or audio.stem)
+            output_path = entry.get('output') or (Path(args.output_dir) / f'{video_id}.json' if args.output_dir else None)
+            status = {'video_id': video_id, 'audio': str(audio), 'output': str(output_path) if output_path else None,
+                      'position': position, 'total_videos': len(entries)}
+
+            if args.resume and output_path and Path(output_path).exists() \
+                    and not ChunkJournal(output_path).path.exists():
+                progress.write(status='done', **status)
+                videos.append({**status, 'status': 'done'})
+                continue
+
+            progress.write(status='started', **status)
+            started = time.monotonic()
+            try:
+                if not output_path:
+                    raise ValueError('Manifest entries need an output (or pass --output-dir)')
+                if not audio.exists():
+                    raise ValueError(f'Audio not found: {audio}')
+                chunks = load_chunks(audio, args.chunk_seconds, args.overlap_seconds, args.pcm_format)
+                if not chunks:
+                    raise ValueError(f'No chunk files found in {audio}')
+                Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+                language = entry.get('language') or args.language
+                dedupe_group = entry.get('dedupe_group') or (
+                    entry.get('date') or entry.get('date_formatted') if args.dedupe_by_date else None)
+                profile_name = entry.get('profile') or args.profile
+                if profile_name not in profiles:
+                    profiles[profile_name] = resolve_profile(profile_name, args.profiles_file)
+                run_metrics = RunMetrics(video_id, args.metrics_log)
+                try:
+                    result = transcribe_video(
+                        args, shared, chunks, profiles[profile_name], compute_type, profile_name=profile_name,
+                        language=language if language and language != 'auto' else None,
+                        output_path=output_path, video_id=video_id, dedupe_group=dedupe_group,
+                        run_metrics=run_metrics
+                    )
+                except Exception:
+                    run_metrics.close()
+                    raise
+                # The textfile holds the last finished video, as if each were its own run
+                finish_metrics(run_metrics, args.metrics_prom)
+                record = {
+                    **status,
+                    'status': 'completed',
+                    'total_chunks': result['total_chunks'],
+                    'failed_chunks': sum(1 for chunk in result['chunks'] if 'error' in chunk),
+                    'audio_seconds': result['metrics']['audio_seconds'],
+                    'wall_seconds': round(time.monotonic() - started, 3)
+                }
+                totals.add(result['metrics']['audio_seconds'])
+            except Exception as e:
+                print(f"Video {video_id} failed: {e}", file=sys.stderr)
+                record = {**status, 'status': 'failed', 'error': str(e),
+                          'wall_seconds': round(time.monotonic() - started, 3)}
+
+            progress.write(**record)
+            videos.append(record)
+    finally:
+        progress.close()
+
+    return {
+        'videos': videos,
+        'completed': sum(1 for video in videos if video['status'] in ('completed', 'done')),
+        'failed': sum(1 for video in videos if video['status'] == 'failed'),
+        **totals.report()
+    }
+
 
 def main():
+    STARTUP.mark('imports')
+
     parser = argparse.ArgumentParser(description='Batch transcribe audio using faster-whisper')
-    parser.add_argument('audio_dir', help='Directory containing audio chunks (chunk_XXX.wav)')
+    parser.add_argument('audio_dir', nargs='?', default=None,
+                        help='Directory containing audio chunks (chunk_XXX.wav), or one 16 kHz mono WAV/raw PCM file')
+    parser.add_argument('--manifest', default=None,
+                        help='JSON/JSONL list of chunk directories or audio files to transcribe with one model load')
+    parser.add_argument('--output-dir', default=None,
+                        help='With --manifest, write <id>.json here for entries without an output')
+    parser.add_argument('--progress-log', default=None, help='With --manifest, append per-video progress JSON lines here')
+    parser.add_argument('--dedupe-by-date', action='store_true',
+                        help="With --manifest, use each entry's date as its --dedupe-group")
     parser.add_argument('--model', default='large-v3', help='Model size (tiny, base, small, medium, large-v2, large-v3)')
     parser.add_argument('--language', default=None, help='Language code (e.g., en, hi) or None for auto-detect')
     parser.add_argument('--device', default='auto', help='Device to use (auto, cpu, cuda)')
     parser.add_argument('--compute-type', default='auto', help='Compute type (auto, int8, float16, float32)')
     parser.add_argument('--output', default=None, help='Output JSON file path')
+    parser.add_argument('--stream', action='store_true', help='Emit NDJSON records per segment and chunk, then a summary')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='CPU worker processes, each with its own model (default: autotuned, else 1)')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Chunks decoded together per batched encoder call (pass --language to skip per-chunk detection)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip chunks already completed in the --output journal of an interrupted run')
+    parser.add_argument('--chunk-seconds', type=float, default=30,
+                        help='Window length when audio_dir is a single audio file, else the length of each chunk file')
+    parser.add_argument('--overlap-seconds', type=float, default=0,
+                        help='Overlap between consecutive windows of a single audio file')
+    parser.add_argument('--pcm-format', default='s16le', choices=sorted(PCM_DTYPES),
+                        help='Sample format of a raw (headerless) PCM file')
+    parser.add_argument('--skip-non-speech', action='store_true',
+                        help='Skip chunks a NumPy energy/flatness pre-pass finds confidently non-speech')
+    parser.add_argument('--min-speech-ratio', type=float, default=DEFAULT_MIN_SPEECH_RATIO,
+                        help='With --skip-non-speech, chunks with a smaller share of speech-like frames are skipped')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Decode every chunk with --fast-model first; re-decode only uncertain or stock-call chunks with --model')
+    parser.add_argument('--fast-model', default='small', help='First-pass model for --cascade')
+    parser.add_argument('--fast-compute-type', default='auto',
+                        help='First-pass compute type for --cascade (auto: int8 on CPU, int8_float16 on CUDA)')
+    parser.add_argument('--min-avg-logprob', type=float, default=DEFAULT_MIN_AVG_LOGPROB,
+                        help='With --cascade, re-decode chunks with a segment below this avg_logprob')
+    parser.add_argument('--max-compression-ratio', type=float, default=DEFAULT_MAX_COMPRESSION_RATIO,
+                        help='With --cascade, re-decode chunks with a segment above this compression ratio')
+    parser.add_argument('--metrics-log', default=None,
+                        help='Append per-chunk and per-run metrics to this JSON-lines file')
+    parser.add_argument('--metrics-prom', default=None,
+                        help='Write run metrics to this Prometheus textfile (e.g. for node_exporter); '
+                             'with --manifest, rewritten after each video')
+    parser.add_argument('--dedupe-group', default=None,
+                        help='Reuse transcripts of videos in this group (e.g. the upload date) whose audio overlaps')
+    parser.add_argument('--video-id', default=None, help='Name this video is indexed under in its --dedupe-group')
+    parser.add_argument('--fingerprint-dir', default=DEFAULT_FINGERPRINT_DIR, help='Audio fingerprint index directory')
+    add_profile_arguments(parser)
+    add_cache_arguments(parser)
+    add_host_config_arguments(parser)
+    add_startup_arguments(parser)
 
     args = parser.parse_args()
+    if args.startup_report:
+        atexit.register(STARTUP.print)
 
-    # Import here to fail fast if not installed
-    try:
-        from faster_whisper import WhisperModel
-    except ImportError:
+    if bool(args.audio_dir) == bool(args.manifest):
         print(json.dumps({
-            'error': 'faster-whisper not installed. Run: pip3 install faster-whisper'
+            'error': 'Pass either audio_dir or --manifest'
         }))
         sys.exit(1)
 
-    audio_dir = Path(args.audio_dir)
-    if not audio_dir.exists():
+    if args.resume and not (args.output or args.manifest):
         print(json.dumps({
-            'error': f'Audio directory not found: {audio_dir}'
+            'error': '--resume requires --output'
         }))
         sys.exit(1)
 
-    # Find all chunk files
-    chunk_files = sorted(audio_dir.glob('chunk_*.wav'))
-    if not chunk_files:
+    if args.manifest and args.stream:
         print(json.dumps({
-            'error': f'No chunk files found in {audio_dir}'
+            'error': '--stream does not apply to --manifest; follow --progress-log instead'
+        }))
+        sys.exit(1)
+
+    if args.dedupe_group and not args.video_id:
+        print(json.dumps({
+            'error': '--dedupe-group requires --video-id'
+        }))
+        sys.exit(1)
+
+    # Fail fast if not installed; the import itself waits until a model is loaded
+    if not faster_whisper_installed():
+        print(json.dumps({
+            'error': 'faster-whisper not installed. Run: pip3 install faster-whisper'
+        }))
+        sys.exit(1)
+
+    try:
+        options = resolve_profile(args.profile, args.profiles_file)
+    except (OSError, ValueError) as e:
+        print(json.dumps({
+            'error': str(e)
         }))
         sys.exit(1)
 
     # Determine device and compute type
-    device = args.device
-    compute_type = args.compute_type
+    device, compute_type = resolve_device(args.device, args.compute_type)
+
+    tuned = host_settings(args.host_config, device, args.compute_type)
+    compute_type = tuned.get('compute_type', compute_type)
+    workers = args.workers or tuned.get('workers') or 1
+    if workers > 1 and device != 'cpu':
+        print(f"--workers only applies to CPU; using a single {device} process", file=sys.stderr)
+        workers = 1
+    # Tuned thread counts only hold for the process count they were measured with
+    if workers == 1:
+        cpu_threads = tuned.get('cpu_threads')
+    else:
+        cpu_threads = tuned.get('worker_cpu_threads') if workers == tuned.get('workers') else None
+    shared = SharedModels(device, workers, cpu_threads)
 
-    if device == 'auto':
+    if args.manifest:
         try:
-            import torch
-            device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        except ImportError:
-            device = 'cpu'
+            summary = run_manifest(args, shared, options, compute_type)
+        except (OSError, ValueError) as e:
+            print(json.dumps({
+                'error': f'Invalid manifest: {e}'
+            }))
+            sys.exit(1)
+        finally:
+            shared.close()
+        print(json.dumps(summary, ensure_ascii=False))
+        sys.exit(1 if summary['failed'] else 0)
 
-    if compute_type == 'auto':
-        compute_type = 'float16' if device == 'cuda' else 'int8'
+    audio_dir = Path(args.audio_dir)
+    if not audio_dir.exists():
+        print(json.dumps({
+            'error': f'Audio directory not found: {audio_dir}'
+        }))
+        sys.exit(1)
 
+    # Chunk files, or zero-copy windows of one memory-mapped audio file
     try:
-        # Load model ONCE
-        print(f"Loading faster-whisper model '{args.model}' on {device}...", file=sys.stderr)
-        model = WhisperModel(args.model, device=device, compute_type=compute_type)
-        print(f"Model loaded. Processing {len(chunk_files)} chunks...", file=sys.stderr)
-
-        language = args.language if args.language and args.language != 'auto' else None
-        results = []
+        chunks = load_chunks(audio_dir, args.chunk_seconds, args.overlap_seconds, args.pcm_format)
+    except ValueError as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
 
-        for i, chunk_file in enumerate(chunk_files):
-            print(f"Transcribing chunk {i+1}/{len(chunk_files)}: {chunk_file.name}", file=sys.stderr)
+    if not chunks:
+        print(json.dumps({
+            'error': f'No chunk files found in {audio_dir}'
+        }))
+        sys.exit(1)
 
-            try:
-                segments, info = model.transcribe(
-                    str(chunk_file),
-                    language=language,
-                    beam_size=5,
-                    vad_filter=True,
-                    vad_parameters=dict(min_silence_duration_ms=500)
-                )
-
-                # Collect segments
-                segment_list = []
-                full_text = []
-
-                for segment in segments:
-                    segment_list.append({
-                        'start': segment.start,
-                        'end': segment.end,
-                        'text': segment.text.strip()
-                    })
-                    full_text.append(segment.text.strip())
-
-                # Extract chunk index from filename
-                chunk_index = int(chunk_file.stem.split('_')[1])
-
-                results.append({
-                    'chunk_index': chunk_index,
-                    'file': chunk_file.name,
-                    'text': ' '.join(full_text),
-                    'language': info.language,
-                    'language_probability': info.language_probability,
-                    'segments': segment_list
-                })
-            except Exception as e:
-                print(f"Error processing {chunk_file.name}: {e}", file=sys.stderr)
-                chunk_index = int(chunk_file.stem.split('_')[1])
-                results.append({
-                    'chunk_index': chunk_index,
-                    'file': chunk_file.name,
-                    'text': '',
-                    'error': str(e)
-                })
-
-        output = {
-            'chunks': results,
-            'total_chunks': len(chunk_files)
-        }
+    try:
+        language = args.language if args.language and args.language != 'auto' else None
+        run_metrics = RunMetrics(args.video_id or audio_dir.stem, args.metrics_log)
+        output = transcribe_video(args, shared, chunks, options, compute_type, language=language,
+                                  output_path=args.output, video_id=args.video_id,
+                                  dedupe_group=args.dedupe_group, stream=args.stream, run_metrics=run_metrics)
+        finish_metrics(run_metrics, args.metrics_prom)
 
         # Output results
-        if args.output:
-            with open(args.output, 'w') as f:
-                json.dump(output, f, ensure_ascii=False, indent=2)
-            print(f"Results written to {args.output}", file=sys.stderr)
-
-        print(json.dumps(output, ensure_ascii=False))
+        if not args.stream:
+            print(json.dumps(output, ensure_ascii=False))
 
     except Exception as e:
-        print(json.dumps({
-            'error': str(e)
-        }))
+        if args.stream:
+            emit({'type': 'error', 'error': str(e)})
+        else:
+            print(json.dumps({
+                'error': str(e)
+            }))
         sys.exit(1)
+    finally:
+        shared.close()
 
 if __name__ == '__main__':
     main()
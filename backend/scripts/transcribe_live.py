@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Incremental transcription of a live stream with bounded latency.
+
+Follows a growing 16 kHz mono WAV/raw PCM file, a FIFO or stdin, decodes
+rolling windows with one resident model and emits NDJSON segment records
+as soon as they are final. The last --overlap-seconds of each window are
+held back and decoded again at the start of the next window, which begins
+where the last finalized segment ended; words repeated across that
+boundary are dropped. A window is decoded early, before it is full,
+whenever waiting longer would put the oldest pending audio behind
+--latency seconds. Hallucination loops cut out by the profile's loop
+guard are reported as flagged records.
+
+Try it locally by playing a recording into a FIFO at real-time speed:
+
+    mkfifo /tmp/live.pcm
+    python3 transcribe_live.py /tmp/live.pcm --latency 60 &
+    python3 transcribe_live.py --feed first_trade.wav /tmp/live.pcm
+
+or from a live stream:
+
+    yt-dlp -o - URL | ffmpeg -i - -f s16le -ar 16000 -ac 1 - | python3 transcribe_live.py -
+"""
+
+from startup_report import STARTUP, add_startup_arguments
+
+import os
+import argparse
+import atexit
+import json
+import re
+import stat
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from decode_profiles import add_profile_arguments, resolve_profile
+from transcribe import emit, faster_whisper_installed, iter_segments, load_model, resolve_device
+from loop_guard import loop_report
+from audio_source import PCM_DTYPES, SAMPLE_RATE, read_wav_header, read_wav_stream_header
+
+# Bytes read from the input at a time (0.1 s of 16-bit audio)
+READ_BYTES = 3200
+# How often a regular file is checked for growth once its end is reached
+POLL_SECONDS = 0.25
+# Words repeated across a window boundary are only dropped from this many on
+MIN_REPEATED_WORDS = 2
+# Characters of finalized text passed as the prompt of the next window
+PROMPT_CHARS = 200
+# \w alone splits Devanagari words at their vowel signs; the dandas stay punctuation
+WORD = re.compile(r'[\w\u0900-\u0963\u0966-\u097f]+')
+
+
+class PrefixedReader:
+    """A pipe with bytes already read from it pushed back in front."""
+
+    def __init__(self, prefix, f):
+        self.prefix = prefix
+        self.f = f
+
+    def read(self, size):
+        if self.prefix:
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            return data
+        return self.f.read(size)
+
+
+class LiveAudio:
+    """Samples of a growing input, read by a background thread.
+
+    The thread keeps draining the pipe while a window is decoded, so the
+    writer never blocks. Samples are kept from the last committed point on,
+    with the wall time each block arrived.
+    """
+
+    def __init__(self, path, pcm_format='s16le', idle_timeout=30):
+        import numpy as np
+
+        self.path = path
+        self.dtype = PCM_DTYPES[pcm_format]
+        self.idle_timeout = idle_timeout
+        self.buffer = np.empty(0, dtype=np.float32)
+        self.buffer_start = 0
+        self.arrivals = []  # (end sample, wall time) per block
+        self.finished = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.read_all, daemon=True)
+        self.thread.start()
+
+    @property
+    def end(self):
+        return self.buffer_start + len(self.buffer)
+
+    def read_all(self):
+        try:
+            if self.path == '-':
+                f = sys.stdin.buffer
+                self.follow(f, growing=False)
+            else:
+                # Opening a FIFO blocks until a writer connects
+                with open(self.path, 'rb', buffering=0) as f:
+                    self.follow(f, growing=stat.S_ISREG(os.fstat(f.fileno()).st_mode))
+        except Exception as e:
+            self.error = e
+        finally:
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def follow(self, f, growing):
+        head = b''
+        idle_since = time.monotonic()
+        while len(head) < 4:
+            block = f.read(4 - len(head))
+            if not block:
+                if not growing or time.monotonic() - idle_since > self.idle_timeout:
+                    return
+                time.sleep(POLL_SECONDS)
+                continue
+            head += block
+
+        f = PrefixedReader(head, f)
+        if head == b'RIFF':
+            self.dtype = read_wav_stream_header(f, self.path)
+
+        width = 2 if self.dtype == '<i2' else 4
+        pending = b''
+        idle_since = time.monotonic()
+        while True:
+            block = f.read(READ_BYTES)
+            if not block:
+                # A FIFO or stdin has ended; a regular file may still grow
+                if not growing or time.monotonic() - idle_since > self.idle_timeout:
+                    return
+                time.sleep(POLL_SECONDS)
+                continue
+            idle_since = time.monotonic()
+            pending += block
+            usable = len(pending) - len(pending) % width
+            if usable:
+                self.append(pending[:usable])
+                pending = pending[usable:]
+
+    def append(self, data):
+        import numpy as np
+
+        samples = np.frombuffer(data, dtype=self.dtype)
+        if self.dtype == '<i2':
+            samples = np.divide(samples, 32768.0, dtype=np.float32)
+        else:
+            samples = samples.astype(np.float32)
+        with self.condition:
+            self.buffer = np.concatenate([self.buffer, samples])
+            self.arrivals.append((self.end, time.monotonic()))
+            self.condition.notify_all()
+
+    def wait(self, timeout):
+        with self.condition:
+            if not self.finished:
+                self.condition.wait(timeout)
+
+    def samples(self, start, end):
+        with self.condition:
+            return self.buffer[start - self.buffer_start:end - self.buffer_start].copy()
+
+    def arrival(self, sample):
+        """Wall time at which the given sample had been received."""
+        with self.condition:
+            index = bisect_left(self.arrivals, (sample, 0.0))
+            if index == len(self.arrivals):
+                return time.monotonic()
+            return self.arrivals[index][1]
+
+    def discard_before(self, sample):
+        with self.condition:
+            drop = sample - self.buffer_start
+            if drop > 0:
+                self.buffer = self.buffer[drop:]
+                self.buffer_start = sample
+                keep = bisect_left(self.arrivals, (sample, 0.0))
+                self.arrivals = self.arrivals[keep:]
+
+
+def words(text):
+    return WORD.findall(text.lower())
+
+
+def trim_repeated(previous_words, text):
+    """text without leading words that repeat the end of what was already emitted."""
+    new_words = words(text)
+    for count in range(min(len(previous_words), len(new_words)), MIN_REPEATED_WORDS - 1, -1):
+        if previous_words[-count:] == new_words[:count]:
+            # Cut the original text after its count-th word, keeping its punctuation
+            match = list(WORD.finditer(text))[count - 1]
+            return text[match.end():].lstrip(' ,.;:!?।').strip()
+    return text
+
+
+class LiveTranscriber:
+    """Decodes rolling windows of a LiveAudio and emits finalized segments."""
+
+    def __init__(self, model, language, options, window_seconds, overlap_seconds, min_window_seconds,
+                 latency_target, fallback=None):
+        self.model = model
+        self.language = language
+        self.options = options
+        self.window = int(window_seconds * SAMPLE_RATE)
+        self.overlap = int(overlap_seconds * SAMPLE_RATE)
+        self.min_window = int(min_window_seconds * SAMPLE_RATE)
+        self.latency_target = latency_target
+        self.fallback = fallback
+
+        self.committed = 0  # samples before this are final
+        self.emitted_end = 0.0
+        self.text = ''
+        self.windows = 0
+        self.decode_seconds = 0.0
+        self.rtf = 0.5  # decode time per second of audio, until measured
+        self.latencies = []
+        self.loops = None
+        self.flagged_end = 0.0
+        self.suppressed_segments = 0
+        self.flagged_seconds = 0.0
+
+    def run(self, audio):
+        retry_at = 0
+        while True:
+            if audio.error:
+                raise audio.error
+            available = audio.end
+            pending = available - self.committed
+            if audio.finished and pending < SAMPLE_RATE // 10:
+                break
+
+            ready = pending >= self.window or (audio.finished and available > retry_at)
+            if not ready and pending >= self.min_window and available >= retry_at:
+                # Decode early if the oldest pending audio would otherwise finish past the target
+                age = time.monotonic() - audio.arrival(self.committed)
+                ready = age + self.rtf * pending / SAMPLE_RATE >= self.latency_target
+            if not ready:
+                audio.wait(POLL_SECONDS)
+                continue
+
+            end = min(available, self.committed + self.window)
+            final = audio.finished and end == available
+            progressed = self.decode(audio, end, final)
+            # Without progress, wait for more audio before decoding this window again
+            retry_at = 0 if progressed else end + self.min_window
+            audio.discard_before(self.committed)
+
+        self.summary(audio)
+
+    def decode(self, audio, end, final):
+        """Decode [committed, end) and emit what is final; returns whether committed moved."""
+        start = self.committed
+        samples = audio.samples(start, end)
+        options = dict(self.options)
+        if options.get('condition_on_previous_text') and self.text:
+            options['initial_prompt'] = self.text[-PROMPT_CHARS:]
+
+        started = time.perf_counter()
+        try:
+            segments = self.segments(samples, options)
+        except Exception as e:
+            if not self.fallback:
+                raise
+            print(f"CUDA failed ({e}), falling back to CPU...", file=sys.stderr)
+            self.model, self.fallback = self.fallback(), None
+            segments = self.segments(samples, options)
+        elapsed = time.perf_counter() - started
+        self.windows += 1
+        self.decode_seconds += elapsed
+        self.rtf = elapsed / (len(samples) / SAMPLE_RATE)
+
+        offset = start / SAMPLE_RATE
+        # Segments ending in the held-back tail may still change with more audio
+        limit = end / SAMPLE_RATE if final else (end - self.overlap) / SAMPLE_RATE
+        committed = None
+        held = None
+        for segment in segments:
+            segment = {**segment, 'start': round(offset + segment['start'], 3), 'end': round(offset + segment['end'], 3)}
+            if segment['end'] > limit:
+                held = segment
+                break
+            self.finalize(audio, segment)
+            committed = segment['end']
+        # A loop cut out of the final part is consumed; the next window starts after it
+        loop_end = self.flag_loops(offset, limit)
+        if loop_end is not None and (committed is None or loop_end > committed):
+            committed = loop_end
+
+        if final:
+            self.committed = end
+        elif committed is not None:
+            self.committed = int(committed * SAMPLE_RATE)
+        elif held is not None and held['start'] > offset + 1.0:
+            self.committed = int(held['start'] * SAMPLE_RATE)
+        elif end - start >= self.window:
+            # A full window without a finished segment: silence, or one very long
+            # segment, which will not get shorter with more audio, so emit it now
+            if held is not None:
+                self.finalize(audio, held)
+                limit = max(limit, held['end'])
+            self.committed = int(limit * SAMPLE_RATE)
+        self.committed = min(max(self.committed, start), end)
+        return self.committed > start
+
+    def segments(self, samples, options):
+        segments, _ = iter_segments(self.model, samples, self.language,
+                                    label=f'{self.committed / SAMPLE_RATE:.1f}s', options=options)
+        segments_list = list(segments)
+        self.loops = loop_report(segments)
+        return segments_list
+
+    def flag_loops(self, offset, limit):
+        """Emit the hallucination loops cut from the final part of the last window, once each.
+
+        Returns where the last of them ends (at most limit), or None.
+        """
+        loop_end = None
+        for flagged in (self.loops or {}).get('ranges', []):
+            flagged = {**flagged, 'start': round(offset + flagged['start'], 3), 'end': round(offset + flagged['end'], 3)}
+            # Overlapping windows decode the same loop again
+            if flagged['start'] >= limit or flagged['end'] <= self.flagged_end:
+                continue
+            self.suppressed_segments += flagged['suppressed_segments']
+            self.flagged_seconds += flagged['end'] - max(flagged['start'], self.flagged_end)
+            self.flagged_end = flagged['end']
+            emit({'type': 'flagged', **flagged})
+            loop_end = min(flagged['end'], limit)
+        return loop_end
+
+    def finalize(self, audio, segment):
+        # Already emitted from the previous window
+        if segment['end'] <= self.emitted_end + 0.05:
+            return
+        text = trim_repeated(words(self.text)[-20:], segment['text'])
+        if not text:
+            return
+
+        latency = time.monotonic() - audio.arrival(int(segment['end'] * SAMPLE_RATE))
+        self.latencies.append(latency)
+        self.emitted_end = segment['end']
+        self.text = f'{self.text} {text}'.strip()[-10 * PROMPT_CHARS:]
+        emit({'type': 'segment', **segment, 'text': text, 'latency_seconds': round(latency, 2)})
+
+    def summary(self, audio):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)], 2) if latencies else None
+
+        audio_seconds = audio.end / SAMPLE_RATE
+        emit({
+            'type': 'summary',
+            'audio_seconds': round(audio_seconds, 3),
+            'segment_count': len(latencies),
+            'windows': self.windows,
+            'decode_seconds': round(self.decode_seconds, 3),
+            'rtf': round(self.decode_seconds / audio_seconds, 4) if audio_seconds else None,
+            'latency_target': self.latency_target,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'latency_max': percentile(1.0),
+            'late_segments': sum(1 for latency in latencies if latency > self.latency_target),
+            'suppressed_segments': self.suppressed_segments,
+            'flagged_seconds': round(self.flagged_seconds, 3)
+        })
+
+
+def feed(wav_path, target, speed):
+    """Write a WAV to target (usually a FIFO) at speed x real time."""
+    dtype, offset, data_bytes = read_wav_header(wav_path)
+    bytes_per_second = SAMPLE_RATE * (2 if dtype == '<i2' else 4)
+    block = bytes_per_second // 10
+
+    with open(wav_path, 'rb') as source, open(target, 'wb') as sink:
+        sink.write(source.read(offset))
+        started = time.monotonic()
+        sent = 0
+        while sent < data_bytes:
+            data = source.read(min(block, data_bytes - sent))
+            if not data:
+                break
+            sink.write(data)
+            sink.flush()
+            sent += len(data)
+            delay = started + sent / bytes_per_second / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    print(f"Fed {sent / bytes_per_second:.1f}s of audio to {target}", file=sys.stderr)
+
+
+def main():
+    STARTUP.mark('imports')
+
+    parser = argparse.ArgumentParser(description='Transcribe a growing audio file, FIFO or stdin as it arrives')
+    parser.add_argument('audio_path', help="16 kHz mono WAV or raw PCM file/FIFO to follow, or '-' for stdin")
+    parser.add_argument('--model', default='large-v3', help='Model size (tiny, base, small, medium, large-v2, large-v3)')
+    parser.add_argument('--language', default=None, help='Language code (e.g., en, hi) or None for auto-detect')
+    parser.add_argument('--device', default='auto', help='Device to use (auto, cpu, cuda)')
+    parser.add_argument('--compute-type', default='auto', help='Compute type (auto, int8, float16, float32)')
+    parser.add_argument('--latency', type=float, default=60,
+                        help='Target seconds between audio arriving and its segment being emitted')
+    parser.add_argument('--window-seconds', type=float, default=30, help='Longest window decoded at once')
+    parser.add_argument('--overlap-seconds', type=float, default=3,
+                        help='Tail of each window held back and decoded again with the next one')
+    parser.add_argument('--min-window-seconds', type=float, default=5, help='Shortest window decoded early')
+    parser.add_argument('--pcm-format', default='s16le', choices=sorted(PCM_DTYPES),
+                        help='Sample format of raw PCM input (WAV input is detected)')
+    parser.add_argument('--idle-timeout', type=float, default=30,
+                        help='Seconds a regular file may stop growing before it counts as finished')
+    parser.add_argument('--feed', default=None, metavar='WAV',
+                        help='Instead of transcribing, write this WAV to audio_path at --speed x real time')
+    parser.add_argument('--speed', type=float, default=1.0, help='Playback speed for --feed')
+    add_profile_arguments(parser)
+    add_startup_arguments(parser)
+
+    args = parser.parse_args()
+    if args.startup_report:
+        atexit.register(STARTUP.print)
+
+    if args.feed:
+        try:
+            feed(args.feed, args.audio_path, args.speed)
+        except (OSError, ValueError) as e:
+            print(json.dumps({
+                'error': str(e)
+            }))
+            sys.exit(1)
+        return
+
+    if args.window_seconds < args.min_window_seconds + args.overlap_seconds:
+        print(json.dumps({
+            'error': '--window-seconds must be at least --min-window-seconds plus --overlap-seconds'
+        }))
+        sys.exit(1)
+
+    if args.audio_path != '-' and not os.path.exists(args.audio_path):
+        print(json.dumps({
+            'error': f'Audio file not found: {args.audio_path}'
+        }))
+        sys.exit(1)
+
+    try:
+        options = resolve_profile(args.profile, args.profiles_file)
+    except (OSError, ValueError) as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
+    if options.get('without_timestamps'):
+        # One untimed segment per window always ends in the held-back tail; windows need segment ends
+        print(f"Profile {args.profile} decodes without timestamps; live mode decodes with them", file=sys.stderr)
+        options = {**options, 'without_timestamps': False}
+
+    # Fail fast if not installed; the import itself waits until a model is loaded
+    if not faster_whisper_installed():
+        print(json.dumps({
+            'error': 'faster-whisper not installed. Run: pip3 install faster-whisper'
+        }))
+        sys.exit(1)
+
+    device, compute_type = resolve_device(args.device, args.compute_type)
+    language = args.language if args.language and args.language != 'auto' else None
+
+    try:
+        # Load the model before following the input, so no audio waits on it
+        model = load_model(args.model, device, compute_type)
+        fallback = (lambda: load_model(args.model, 'cpu', 'int8')) if device == 'cuda' else None
+        transcriber = LiveTranscriber(model, language, options, args.window_seconds, args.overlap_seconds,
+                                      args.min_window_seconds, args.latency, fallback)
+        transcriber.run(LiveAudio(args.audio_path, args.pcm_format, args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        emit({'type': 'error', 'error': str(e)})
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Long-lived transcription worker using faster-whisper.
+Keeps models resident and serves jobs over a local Unix socket, so each
+file no longer pays for the CUDA preload and model load.
+
+Protocol: one JSON object per line, JSON-RPC style.
+    -> {"id": 1, "method": "transcribe", "params": {"audio_path": "/tmp/a.wav", "model": "large-v3", "profile": "fast"}}
+    <- {"id": 1, "result": {"text": ..., "language": ..., "segments": [...]}}
+    <- {"id": 1, "error": {"code": -32000, "message": "..."}}
+
+Methods: transcribe, ping, status, shutdown. Several requests may be
+pipelined on one connection; responses carry the request id and are
+written as jobs finish, so they can arrive out of order.
+"""
+
+from startup_report import STARTUP, add_startup_arguments
+
+import os
+import argparse
+import json
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from decode_profiles import add_profile_arguments, resolve_profile
+from host_tuning import add_host_config_arguments, host_settings
+from transcribe import fallback_devices, faster_whisper_installed, load_model, resolve_device, transcribe_resumable
+
+DEFAULT_SOCKET = os.getenv('TRANSCRIBE_SOCKET', '/tmp/sayitownit-transcribe.sock')
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+SHUTTING_DOWN = -32001
+
+
+class ServerUnavailable(Exception):
+    """No transcription server is reachable on the socket."""
+
+
+class RpcError(Exception):
+    """Error returned to the client with a JSON-RPC error code."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class ModelPool:
+    """Resident models keyed by (model, device, compute_type), least recently used evicted first."""
+
+    def __init__(self, max_models=2, num_workers=1, cpu_threads=None):
+        self.max_models = max_models
+        self.num_workers = num_workers
+        self.cpu_threads = cpu_threads
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def get(self, model_name, device, compute_type):
+        key = (model_name, device, compute_type)
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key]
+
+        # Only one model loads at a time; jobs on already loaded models keep running
+        with self.load_lock:
+            with self.lock:
+                if key in self.models:
+                    return self.models[key]
+
+            kwargs = {'cpu_threads': self.cpu_threads} if self.cpu_threads else {}
+            model = load_model(model_name, device, compute_type, num_workers=self.num_workers, **kwargs)
+
+            with self.lock:
+                self.models[key] = model
+                while len(self.models) > self.max_models:
+                    evicted, _ = self.models.popitem(last=False)
+                    print(f"Evicted model {evicted}", file=sys.stderr)
+            return model
+
+    def loaded(self):
+        with self.lock:
+            return [
+                {'model': name, 'device': device, 'compute_type': compute_type}
+                for name, device, compute_type in self.models
+            ]
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Reads newline-delimited requests and writes responses as jobs complete."""
+
+    def handle(self):
+        write_lock = threading.Lock()
+        pending = []
+
+        for line in self.rfile:
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                self.send(write_lock, error_response(None, PARSE_ERROR, f'Invalid JSON: {e}'))
+                continue
+
+            future = self.server.submit(request)
+            future.add_done_callback(lambda f: self.send(write_lock, f.result()))
+            pending.append(future)
+
+            # Acknowledge first so the caller sees the response before the socket goes away
+            if isinstance(request, dict) and request.get('method') == 'shutdown':
+                self.server.graceful_shutdown()
+
+        # Keep the connection open until every submitted job has answered
+        wait(pending)
+
+    def send(self, write_lock, response):
+        data = (json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8')
+        with write_lock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, ValueError):
+                # Client went away; the job result is dropped
+                pass
+
+
+class TranscriptionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool, default_model, device, compute_type, max_concurrent,
+                 default_profile, profiles_file=None):
+        self.pool = pool
+        self.default_model = default_model
+        self.default_profile = default_profile
+        self.profiles_file = profiles_file
+        self.device = device
+        self.compute_type = compute_type
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self.stopping = threading.Event()
+        self.started_at = time.time()
+        self.stats_lock = threading.Lock()
+        self.stats = {'active': 0, 'completed': 0, 'failed': 0}
+        super().__init__(socket_path, RequestHandler)
+
+    def submit(self, request):
+        """Dispatch one request. Always returns a Future resolving to the response."""
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return completed(error_response(None, INVALID_REQUEST, 'Request must be an object with a method'))
+
+        request_id = request.get('id')
+        method = request['method']
+        params = request.get('params') or {}
+
+        if method == 'ping':
+            return completed(result_response(request_id, 'pong'))
+        if method == 'status':
+            return completed(result_response(request_id, self.status()))
+        if method == 'shutdown':
+            return completed(result_response(request_id, 'shutting down'))
+        if method != 'transcribe':
+            return completed(error_response(request_id, METHOD_NOT_FOUND, f'Unknown method: {method}'))
+        if self.stopping.is_set():
+            return completed(error_response(request_id, SHUTTING_DOWN, 'Server is shutting down'))
+
+        with self.stats_lock:
+            self.stats['active'] += 1
+        return self.executor.submit(self.run_job, request_id, params)
+
+    def run_job(self, request_id, params):
+        try:
+            result = self.transcribe(params)
+            response = result_response(request_id, result)
+            outcome = 'completed'
+        except RpcError as e:
+            response = error_response(request_id, e.code, str(e))
+            outcome = 'failed'
+        except Exception as e:
+            print(f"Job {request_id} failed: {e}", file=sys.stderr)
+            response = error_response(request_id, SERVER_ERROR, str(e))
+            outcome = 'failed'
+
+        with self.stats_lock:
+            self.stats['active'] -= 1
+            self.stats[outcome] += 1
+        return response
+
+    def transcribe(self, params):
+        audio_path = params.get('audio_path')
+        if not audio_path:
+            raise RpcError(INVALID_PARAMS, 'audio_path is required')
+        if not Path(audio_path).exists():
+            raise RpcError(INVALID_PARAMS, f'Audio file not found: {audio_path}')
+
+        # Clients may send the options of a profile the server does not know
+        options = params.get('options')
+        if options is None:
+            try:
+                options = resolve_profile(params.get('profile') or self.default_profile, self.profiles_file)
+            except (OSError, ValueError) as e:
+                raise RpcError(INVALID_PARAMS, str(e))
+
+        model_name = params.get('model') or self.default_model
+        device = params.get('device') or 'auto'
+        compute_type = params.get('compute_type') or 'auto'
+        if device == 'auto':
+            device, compute_type = self.device, (self.compute_type if compute_type == 'auto' else compute_type)
+        device, compute_type = resolve_device(device, compute_type)
+
+        # Try the requested device first; if CUDA fails, CPU continues from the last decoded segment
+        return transcribe_resumable(lambda device, compute_type: self.pool.get(model_name, device, compute_type),
+                                    audio_path, params.get('language'), fallback_devices(device, compute_type),
+                                    options)
+
+    def status(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        return {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started_at,
+            'device': self.device,
+            'compute_type': self.compute_type,
+            'models': self.pool.loaded(),
+            'jobs': stats,
+            'stopping': self.stopping.is_set()
+        }
+
+    def graceful_shutdown(self):
+        """Stop accepting jobs; in-flight jobs finish before the process exits."""
+        if self.stopping.is_set():
+            return
+        self.stopping.set()
+        print("Shutting down, waiting for in-flight jobs...", file=sys.stderr)
+        # shutdown() blocks until serve_forever() returns, so it cannot run on that thread
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+
+def completed(response):
+    future = Future()
+    future.set_result(response)
+    return future
+
+
+def result_response(request_id, result):
+    return {'id': request_id, 'result': result}
+
+
+def error_response(request_id, code, message):
+    return {'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def call_server(socket_path, method, params=None, timeout=None):
+    """Send one request to a running server and wait for its response."""
+    request_id = f'{os.getpid()}-{time.monotonic_ns()}'
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        sock.close()
+        raise ServerUnavailable(str(e))
+
+    with sock:
+        request = {'id': request_id, 'method': method, 'params': params or {}}
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with sock.makefile('r', encoding='utf-8') as reader:
+            for line in reader:
+                response = json.loads(line)
+                if response.get('id') == request_id:
+                    return response
+
+    raise ServerUnavailable('Connection closed before a response was received')
+
+
+def remove_stale_socket(socket_path):
+    """Remove a socket file left behind by a dead server. Fails if one is still running."""
+    if not os.path.exists(socket_path):
+        return
+    try:
+        call_server(socket_path, 'ping', timeout=2)
+    except (ServerUnavailable, OSError):
+        os.unlink(socket_path)
+        return
+    raise RuntimeError(f'A transcription server is already listening on {socket_path}')
+
+
+def main():
+    STARTUP.mark('imports')
+
+    parser = argparse.ArgumentParser(description='Run a warm faster-whisper transcription server')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket path to listen on')
+    parser.add_argument('--model', default='large-v3', help='Default model, loaded at startup')
+    parser.add_argument('--preload', nargs='*', default=[], help='Additional models to load at startup')
+    parser.add_argument('--max-models', type=int, default=2, help='Maximum number of resident models')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Jobs transcribed concurrently (default: autotuned num_workers, else 1)')
+    parser.add_argument('--device', default='auto', help='Device to use (auto, cpu, cuda)')
+    parser.add_argument('--compute-type', default='auto', help='Compute type (auto, int8, float16, float32)')
+    add_profile_arguments(parser)
+    add_host_config_arguments(parser)
+    parser.add_argument('--status', action='store_true', help='Print status of a running server and exit')
+    parser.add_argument('--stop', action='store_true', help='Ask a running server to shut down and exit')
+    add_startup_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        try:
+            response = call_server(args.socket, 'status' if args.status else 'shutdown', timeout=10)
+        except ServerUnavailable as e:
+            print(json.dumps({'error': f'Server not reachable: {e}'}))
+            sys.exit(1)
+        print(json.dumps(response.get('result', response), indent=2))
+        return
+
+    # Fail fast if not installed; the import itself waits until a model is loaded
+    if not faster_whisper_installed():
+        print(json.dumps({
+            'error': 'faster-whisper not installed. Run: pip3 install faster-whisper'
+        }))
+        sys.exit(1)
+
+    try:
+        resolve_profile(args.profile, args.profiles_file)
+    except (OSError, ValueError) as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
+
+    device, compute_type = resolve_device(args.device, args.compute_type)
+    tuned = host_settings(args.host_config, device, args.compute_type)
+    compute_type = tuned.get('compute_type', compute_type)
+    workers = args.workers or tuned.get('num_workers') or 1
+    cpu_threads = tuned.get('server_cpu_threads') if workers == tuned.get('num_workers') else None
+    pool = ModelPool(max_models=args.max_models, num_workers=workers, cpu_threads=cpu_threads)
+
+    try:
+        for model_name in [args.model] + args.preload:
+            pool.get(model_name, device, compute_type)
+
+        remove_stale_socket(args.socket)
+        server = TranscriptionServer(args.socket, pool, args.model, device, compute_type, workers,
+                                     args.profile, args.profiles_file)
+    except Exception as e:
+        print(json.dumps({
+            'error': str(e)
+        }))
+        sys.exit(1)
+
+    os.chmod(args.socket, 0o660)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: server.graceful_shutdown())
+
+    # Ready to serve: the server's start-up ends here, not at exit
+    if args.startup_report:
+        STARTUP.print()
+    print(f"Transcription server listening on {args.socket} ({device}, {compute_type})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.executor.shutdown(wait=True)
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        print("Transcription server stopped", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
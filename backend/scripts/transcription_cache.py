@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of transcription results.
+
+Entries are keyed by a hash of the audio bytes plus every decoding option
+that can change the output, and stored as JSON files under the cache dir.
+The total size is capped; least recently used entries are evicted first.
+Several processes may share one cache directory.
+"""
+
+import os
+import argparse
+import hashlib
+import json
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = os.path.expanduser(os.getenv('TRANSCRIBE_CACHE_DIR', '~/.cache/sayitownit/transcripts'))
+DEFAULT_MAX_MB = int(os.getenv('TRANSCRIBE_CACHE_MAX_MB', 2048))
+
+
+def audio_digest(audio_path, block_size=1 << 20):
+    """SHA-256 of the audio file contents."""
+    digest = hashlib.sha256()
+    with open(audio_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(digest, options):
+    """Key for audio with the given content digest decoded with options (model, compute_type, language, ...)."""
+    payload = json.dumps(options, sort_keys=True)
+    return hashlib.sha256(f'{digest}:{payload}'.encode('utf-8')).hexdigest()
+
+
+class TranscriptionCache:
+    """On-disk JSON entries with a size cap and LRU eviction (recency is the file mtime)."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        # {path: [mtime, size]}, scanned on first write
+        self.entries = None
+
+    def path_for(self, key):
+        return self.dir / key[:2] / f'{key}.json'
+
+    def get(self, key):
+        """Return the stored entry, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            return None
+
+        # Mark as recently used
+        try:
+            os.utime(path)
+            if self.entries is not None and path in self.entries:
+                self.entries[path][0] = time.time()
+        except OSError:
+            pass
+
+        self.stats['hits'] += 1
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry atomically, then evict down to the size cap."""
+        path = self.path_for(key)
+        path.parent.mkdir(exist_ok=True)
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.stats['writes'] += 1
+        self.scan()[path] = [time.time(), len(data)]
+        self.evict()
+
+    def scan(self):
+        if self.entries is None:
+            self.entries = {}
+            for path in self.dir.glob('*/*.json'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                self.entries[path] = [stat.st_mtime, stat.st_size]
+        return self.entries
+
+    def size(self):
+        return sum(size for _, size in self.scan().values())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = self.scan()
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+
+        for path, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                # Another process evicted it first
+                pass
+            del entries[path]
+            total -= size
+            self.stats['evictions'] += 1
+
+    def summary(self):
+        return {**self.stats, 'dir': str(self.dir)}
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Transcription cache directory')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_MB, help='Cache size cap in MB (LRU eviction)')
+    parser.add_argument('--no-cache', action='store_true', help='Always transcribe, never read or write the cache')
+
+
+def open_cache(args):
+    """Build the cache from parsed add_cache_arguments() options, or None if disabled."""
+    if args.no_cache:
+        return None
+    return TranscriptionCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or trim the transcription cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Transcription cache directory')
+    parser.add_argument('--max-mb', type=int, default=DEFAULT_MAX_MB, help='Size cap in MB to evict down to')
+    parser.add_argument('--evict', action='store_true', help='Evict least recently used entries down to --max-mb')
+
+    args = parser.parse_args()
+
+    cache = TranscriptionCache(args.cache_dir, args.max_mb * 1024 * 1024)
+    if args.evict:
+        cache.evict()
+    print(json.dumps({
+        'dir': str(cache.dir),
+        'entries': len(cache.scan()),
+        'size_mb': round(cache.size() / (1024 * 1024), 2),
+        'evictions': cache.stats['evictions']
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Per-chunk and per-run transcription metrics.
+
+Decoders attach a metrics block to every chunk they decode: wall time,
+audio duration, real-time factor, segment count, seconds Silero VAD
+removed, hallucination-loop segments suppressed and audio skipped past
+them, and how much the process's peak RSS grew. RunMetrics aggregates
+those over a run, adds model load times, and can export the totals as a
+Prometheus textfile (for node_exporter's textfile collector) and every
+record as a JSON-lines log.
+"""
+
+import os
+import json
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Chunks listed by RunMetrics.summary() as the slowest of the run
+SLOWEST_CHUNKS = 5
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class DecodeTimer:
+    """Measures one decode: wall time and peak RSS growth between start and finish()."""
+
+    def __init__(self):
+        self.rss_before = peak_rss_mb()
+        self.started = time.perf_counter()
+
+    def finish(self, audio_seconds, segment_count, vad_removed_seconds=0.0, loops=None):
+        decode_seconds = time.perf_counter() - self.started
+        return chunk_metrics(decode_seconds, audio_seconds, segment_count, vad_removed_seconds,
+                             peak_rss_mb() - self.rss_before, loops)
+
+
+def chunk_metrics(decode_seconds, audio_seconds, segment_count, vad_removed_seconds, rss_delta_mb, loops=None):
+    """loops is the chunk's loop_guard report, if the guard was on."""
+    return {
+        'decode_seconds': round(decode_seconds, 3),
+        'audio_seconds': round(audio_seconds or 0.0, 3),
+        'rtf': round(decode_seconds / audio_seconds, 4) if audio_seconds else None,
+        'segment_count': segment_count,
+        'vad_removed_seconds': round(max(vad_removed_seconds or 0.0, 0.0), 3),
+        'suppressed_segments': loops['suppressed_segments'] if loops else 0,
+        'loop_skipped_seconds': loops['skipped_seconds'] if loops else 0.0,
+        'peak_rss_delta_mb': round(rss_delta_mb, 1),
+        'pid': os.getpid()
+    }
+
+
+class RunMetrics:
+    """Totals over the chunks of one run, optionally logged as JSON lines while the run goes."""
+
+    def __init__(self, run_id, log_path=None):
+        self.run_id = run_id
+        self.started = time.monotonic()
+        self.chunks = {'decoded': 0, 'not_decoded': 0, 'failed': 0}
+        self.audio_seconds = 0.0
+        self.decoded_audio_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.segments = 0
+        self.vad_removed_seconds = 0.0
+        self.suppressed_segments = 0
+        self.loop_skipped_seconds = 0.0
+        self.model_loads = []
+        self.slowest = []
+        self.log = open(log_path, 'a', encoding='utf-8') if log_path else None
+
+    def model_load(self, model_name, seconds):
+        self.model_loads.append({'model': model_name, 'seconds': round(seconds, 3)})
+        self.write({'type': 'model_load', 'model': model_name, 'seconds': round(seconds, 3)})
+
+    def observe(self, results):
+        """Pass (result, audio_seconds) pairs through, counting each one."""
+        for result, audio_seconds in results:
+            self.add(result, audio_seconds)
+            yield result, audio_seconds
+
+    def add(self, result, audio_seconds):
+        self.audio_seconds += audio_seconds or 0.0
+        metrics = result.get('metrics')
+        if 'error' in result:
+            self.chunks['failed'] += 1
+        elif metrics is None:
+            # Cached, skipped, journaled or reused from another video
+            self.chunks['not_decoded'] += 1
+        else:
+            self.chunks['decoded'] += 1
+            self.decoded_audio_seconds += metrics['audio_seconds']
+            self.decode_seconds += metrics['decode_seconds']
+            self.segments += metrics['segment_count']
+            self.vad_removed_seconds += metrics['vad_removed_seconds']
+            self.suppressed_segments += metrics['suppressed_segments']
+            self.loop_skipped_seconds += metrics['loop_skipped_seconds']
+            if metrics.get('model_load_seconds'):
+                self.model_loads.append({'model': metrics.get('model'), 'seconds': metrics['model_load_seconds'],
+                                         'pid': metrics['pid']})
+            if metrics['rtf'] is not None:
+                self.slowest = sorted(self.slowest + [(metrics['rtf'], result['chunk_index'])],
+                                      reverse=True)[:SLOWEST_CHUNKS]
+
+        self.write({'type': 'chunk', 'chunk_index': result.get('chunk_index'), 'file': result.get('file'),
+                    'failed': 'error' in result, **(metrics or {})})
+
+    def summary(self):
+        return {
+            'chunks': dict(self.chunks),
+            'audio_seconds': round(self.audio_seconds, 3),
+            'decoded_audio_seconds': round(self.decoded_audio_seconds, 3),
+            'decode_seconds': round(self.decode_seconds, 3),
+            'decode_rtf': round(self.decode_seconds / self.decoded_audio_seconds, 4)
+            if self.decoded_audio_seconds else None,
+            'segments': self.segments,
+            'segments_per_second': round(self.segments / self.decode_seconds, 3) if self.decode_seconds else None,
+            'vad_removed_seconds': round(self.vad_removed_seconds, 3),
+            'suppressed_segments': self.suppressed_segments,
+            'loop_skipped_seconds': round(self.loop_skipped_seconds, 3),
+            'model_loads': self.model_loads,
+            'model_load_seconds': round(sum(load['seconds'] for load in self.model_loads), 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'wall_seconds': round(time.monotonic() - self.started, 3),
+            'slowest_chunks': [{'chunk_index': index, 'rtf': rtf} for rtf, index in self.slowest]
+        }
+
+    def write(self, record):
+        if self.log:
+            self.log.write(json.dumps({'run': self.run_id, 'time': round(time.time(), 3), **record},
+                                      ensure_ascii=False) + '\n')
+            self.log.flush()
+
+    def close(self):
+        """Log the run totals and close the log."""
+        if self.log:
+            self.write({'type': 'run', **self.summary()})
+            self.log.close()
+            self.log = None
+
+    def write_prometheus(self, path):
+        """Write the run totals as a Prometheus textfile, replacing the previous one atomically."""
+        summary = self.summary()
+        labels = f'run="{prometheus_label(self.run_id)}"'
+        samples = [
+            ('transcribe_audio_seconds', 'Seconds of audio in the run', summary['audio_seconds']),
+            ('transcribe_decoded_audio_seconds', 'Seconds of audio decoded by a model', summary['decoded_audio_seconds']),
+            ('transcribe_decode_seconds', 'Wall seconds spent decoding', summary['decode_seconds']),
+            ('transcribe_decode_rtf', 'Decode wall time per second of decoded audio', summary['decode_rtf']),
+            ('transcribe_segments', 'Segments decoded', summary['segments']),
+            ('transcribe_vad_removed_seconds', 'Seconds of audio removed by VAD', summary['vad_removed_seconds']),
+            ('transcribe_suppressed_segments', 'Hallucination-loop segments suppressed',
+             summary['suppressed_segments']),
+            ('transcribe_loop_skipped_seconds', 'Seconds of audio skipped past hallucination loops',
+             summary['loop_skipped_seconds']),
+            ('transcribe_model_load_seconds', 'Seconds spent loading models', summary['model_load_seconds']),
+            ('transcribe_peak_rss_bytes', 'Peak resident set size of the coordinating process',
+             int(summary['peak_rss_mb'] * 1024 * 1024)),
+            ('transcribe_wall_seconds', 'Wall seconds of the run', summary['wall_seconds']),
+            ('transcribe_last_run_timestamp_seconds', 'Unix time the run finished', round(time.time(), 3))
+        ]
+
+        lines = []
+        for name, description, value in samples:
+            if value is None:
+                continue
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} gauge', f'{name}{{{labels}}} {value}']
+        lines += ['# HELP transcribe_chunks Chunks in the run by outcome', '# TYPE transcribe_chunks gauge']
+        lines += [f'transcribe_chunks{{{labels},outcome="{outcome}"}} {count}'
+                  for outcome, count in summary['chunks'].items()]
+
+        path = Path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            # node_exporter only reads *.prom files, so the temp name is never half-read
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        print(f"Metrics written to {path}", file=sys.stderr)
+
+
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,98 @@
+import { spawn } from 'child_process';
+import path from 'path';
+
+const SCRIPT_PATH = path.join(path.dirname(new URL(import.meta.url).pathname), '../../scripts/audio_cache.py');
+
+/**
+ * Run an audio_cache.py command and parse the JSON it prints
+ */
+function runAudioCache(args) {
+  return new Promise((resolve, reject) => {
+    const cache = spawn('python3', [SCRIPT_PATH, ...args]);
+    let stdout = '';
+    let stderr = '';
+
+    cache.stdout.setEncoding('utf8');
+    cache.stdout.on('data', (data) => {
+      stdout += data;
+    });
+
+    cache.stderr.on('data', (data) => {
+      stderr += data.toString();
+      const line = data.toString().trim();
+      if (line) {
+        console.log('[audio-cache]', line);
+      }
+    });
+
+    cache.on('close', (code) => {
+      let result;
+      try {
+        result = JSON.parse(stdout);
+      } catch {
+        reject(new Error(`Audio cache exited with code ${code}: ${stderr}`));
+        return;
+      }
+      if (code !== 0 || result.error) {
+        reject(new Error(`Audio cache failed: ${result.error || stderr}`));
+        return;
+      }
+      resolve(result);
+    });
+
+    cache.on('error', (err) => {
+      reject(new Error(`Failed to spawn audio cache: ${err.message}`));
+    });
+  });
+}
+
+/**
+ * Shared YouTube audio cache (scripts/audio_cache.py)
+ *
+ * Every service that needs a video's audio fetches it through here, so a
+ * video is downloaded once - as the native opus/m4a stream - and each
+ * consumer converts from the cached file.
+ */
+export const audioCacheService = {
+  /**
+   * Path to the cached audio of a video, downloading it on a miss
+   * The file may be evicted by another process at any time; use convertAudio to read it
+   * @param {string} youtubeUrl - YouTube video URL
+   * @param {object} options - { ytdlpArgs: extra yt-dlp arguments string }
+   * @returns {object} - { path, hit, size_mb }
+   */
+  async fetchAudio(youtubeUrl, options = {}) {
+    const args = ['fetch', youtubeUrl];
+    if (options.ytdlpArgs) {
+      args.push(`--ytdlp-args=${options.ytdlpArgs}`);
+    }
+
+    const result = await runAudioCache(args);
+    console.log(`[audio-cache] ${result.hit ? 'Hit' : 'Downloaded'}: ${result.path} (${result.size_mb}MB)`);
+    return result;
+  },
+
+  /**
+   * Convert a video's cached audio with ffmpeg, downloading it on a miss
+   * The cache entry is locked until ffmpeg finishes, so it cannot be evicted mid-read
+   * @param {string} youtubeUrl - YouTube video URL
+   * @param {string} outputPath - File to write; {video_id} is replaced by the video ID
+   * @param {object} options - { ffmpegArgs: ffmpeg output arguments string, ytdlpArgs: extra yt-dlp arguments string }
+   * @returns {object} - { path, source, hit, size_mb }
+   */
+  async convertAudio(youtubeUrl, outputPath, options = {}) {
+    const args = ['convert', youtubeUrl, `--output=${outputPath}`];
+    if (options.ffmpegArgs) {
+      args.push(`--ffmpeg-args=${options.ffmpegArgs}`);
+    }
+    if (options.ytdlpArgs) {
+      args.push(`--ytdlp-args=${options.ytdlpArgs}`);
+    }
+
+    const result = await runAudioCache(args);
+    console.log(`[audio-cache] ${result.hit ? 'Hit' : 'Downloaded'}: ${result.source} -> ${result.path} (${result.size_mb}MB)`);
+    return result;
+  }
+};
+
+export default audioCacheService;
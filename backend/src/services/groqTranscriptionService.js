@@ -2,6 +2,7 @@ import fs from 'fs/promises';
 import path from 'path';
 import { spawn } from 'child_process';
 import { config } from '../config/index.js';
+import { audioCacheService } from './audioCacheService.js';
 
 const GROQ_API_URL = 'https://api.groq.com/openai/v1/audio/transcriptions';
 const GROQ_API_KEY = process.env.GROQ_API_KEY;
@@ -10,54 +11,17 @@ const MAX_FILE_SIZE = 25 * 1024 * 1024; // 25MB limit
 export const groqTranscriptionService = {
   /**
    * Download audio from YouTube video
+   * Converts the shared audio cache's copy to medium quality MP3 to keep the upload small
    */
   async downloadAudio(youtubeUrl, outputDir) {
     await fs.mkdir(outputDir, { recursive: true });
-    const outputTemplate = path.join(outputDir, '%(id)s.%(ext)s');
 
-    return new Promise((resolve, reject) => {
-      const args = [
-        '--js-runtimes', 'node',
-        '-x',
-        '--audio-format', 'mp3',
-        '--audio-quality', '5', // Medium quality to keep file size down
-        '-o', outputTemplate,
-        '--no-playlist',
-        youtubeUrl
-      ];
-
-      const ytdlp = spawn('yt-dlp', args);
-      let stderr = '';
-
-      ytdlp.stdout.on('data', (data) => {
-        console.log('[yt-dlp]', data.toString().trim());
-      });
-
-      ytdlp.stderr.on('data', (data) => {
-        stderr += data.toString();
-      });
-
-      ytdlp.on('close', async (code) => {
-        if (code !== 0) {
-          reject(new Error(`yt-dlp failed: ${stderr}`));
-          return;
-        }
-
-        try {
-          const files = await fs.readdir(outputDir);
-          const audioFile = files.find(f => f.endsWith('.mp3'));
-          if (audioFile) {
-            resolve(path.join(outputDir, audioFile));
-          } else {
-            reject(new Error('Audio file not found'));
-          }
-        } catch (err) {
-          reject(err);
-        }
-      });
-
-      ytdlp.on('error', reject);
+    const converted = await audioCacheService.convertAudio(youtubeUrl, path.join(outputDir, '{video_id}.mp3'), {
+      // Medium quality to keep file size down
+      ffmpegArgs: '-codec:a libmp3lame -q:a 5',
+      ytdlpArgs: '--js-runtimes node'
     });
+    return converted.path;
   },
 
   /**
@@ -1,8 +1,8 @@
-import { exec } from 'child_process';
+import { exec, spawn } from 'child_process';
 import { promisify } from 'util';
 import fs from 'fs/promises';
 import path from 'path';
-import { ollama } from '../config/index.js';
+import { config, ollama } from '../config/index.js';
 
 const execAsync = promisify(exec);
 
@@ -228,48 +228,122 @@ export const transcriptionService = {
   /**
    * Batch transcribe a directory of chunks using GPU (loads model once)
    * This is much faster than transcribing each chunk individually
+   *
+   * Runs the script in --stream mode: chunk records arrive as NDJSON while
+   * decoding continues, and options.onChunk is called for each one.
+   *
+   * options.profile picks a decoding profile (fast, balanced, accurate).
+   * With options.videoId and options.dedupeGroup (e.g. the upload date),
+   * chunks whose audio was already transcribed in another video of the
+   * group reuse that transcript.
    */
   async transcribeChunksBatch(chunksDir, options = {}) {
     const scriptPath = path.join(path.dirname(new URL(import.meta.url).pathname), '../../scripts/transcribe_batch.py');
     const language = options.language || 'auto';
-    const langArg = language === 'auto' ? '' : `--language ${language}`;
+    // Chunk times (and so deduped ranges) are index * chunk length
+    const args = [scriptPath, chunksDir, '--model', 'large-v3', '--stream',
+      '--chunk-seconds', String(config.processing.audioChunkSeconds)];
+    if (language !== 'auto') {
+      args.push('--language', language);
+    }
+    if (options.profile) {
+      args.push('--profile', options.profile);
+    }
+    if (options.videoId && options.dedupeGroup) {
+      args.push('--video-id', options.videoId, '--dedupe-group', options.dedupeGroup);
+    }
 
-    try {
-      console.log(`Batch transcribing chunks in ${chunksDir} using GPU...`);
-      const { stdout, stderr } = await execAsync(
-        `python3 "${scriptPath}" "${chunksDir}" --model large-v3 ${langArg}`,
-        { timeout: 3600000, maxBuffer: 100 * 1024 * 1024 } // 1 hour timeout for long videos
-      );
+    console.log(`Batch transcribing chunks in ${chunksDir} using GPU...`);
+
+    return new Promise((resolve, reject) => {
+      const python = spawn('python3', args);
+      const results = [];
+      let buffered = '';
+      let failure = null;
+
+      // 1 hour timeout for long videos
+      const timer = setTimeout(() => {
+        failure = 'Timed out after 1 hour';
+        python.kill();
+      }, 3600000);
+
+      const handleLine = (line) => {
+        if (!line.trim()) return;
+
+        let record;
+        try {
+          record = JSON.parse(line);
+        } catch {
+          console.warn('Ignoring malformed transcription output:', line.slice(0, 200));
+          return;
+        }
 
-      if (stderr) {
-        console.log('Transcription progress:', stderr);
-      }
+        if (record.type === 'error' || (!record.type && record.error)) {
+          failure = record.error;
+          return;
+        }
 
-      const result = JSON.parse(stdout);
+        if (record.type !== 'chunk') return;
+
+        // Convert to expected format
+        const chunk = {
+          chunkIndex: record.chunk_index,
+          // Windows of a single audio file carry their own times; chunk files are 30s each
+          startTime: record.start_time ?? record.chunk_index * 30,
+          endTime: record.end_time ?? (record.chunk_index + 1) * 30,
+          text: record.text || '',
+          language: record.language || 'unknown',
+          segments: record.segments || [],
+          error: record.error
+        };
+        results.push(chunk);
+
+        if (options.onChunk) {
+          options.onChunk(chunk);
+        }
+      };
 
-      if (result.error) {
-        throw new Error(result.error);
-      }
+      // Decode as a stream so a Devanagari character split across chunks stays whole
+      python.stdout.setEncoding('utf8');
+      python.stdout.on('data', (data) => {
+        buffered += data;
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        lines.forEach(handleLine);
+      });
+
+      python.stderr.on('data', (data) => {
+        console.log('Transcription progress:', data.toString().trim());
+      });
+
+      python.on('close', (code) => {
+        clearTimeout(timer);
+        handleLine(buffered);
+
+        if (failure || code !== 0) {
+          const message = failure || `transcribe_batch.py exited with code ${code}`;
+          console.error('Batch transcription failed:', message);
+          reject(new Error(`Batch transcription failed: ${message}`));
+          return;
+        }
 
-      // Convert to expected format
-      return result.chunks.map(chunk => ({
-        chunkIndex: chunk.chunk_index,
-        startTime: chunk.chunk_index * 30, // Assuming 30s chunks
-        endTime: (chunk.chunk_index + 1) * 30,
-        text: chunk.text || '',
-        language: chunk.language || 'unknown',
-        segments: chunk.segments || [],
-        error: chunk.error
-      }));
-    } catch (error) {
-      console.error('Batch transcription failed:', error.message);
-      throw new Error(`Batch transcription failed: ${error.message}`);
-    }
+        resolve(results);
+      });
+
+      python.on('error', (err) => {
+        clearTimeout(timer);
+        reject(new Error(`Batch transcription failed: ${err.message}`));
+      });
+    });
   },
 
   /**
    * Transcribe multiple chunks and merge results
    * Uses batch mode when faster-whisper is available for 10x+ speedup
+   *
+   * Video pipelines pass options.videoId and options.uploadDate (yt-dlp's
+   * YYYYMMDD, as in videoService.getVideoInfo) so chunks already
+   * transcribed in another video from the same day are reused.
    */
   async transcribeChunks(chunks, options = {}) {
     const backend = options.backend || await this.detectBackend();
@@ -279,7 +353,19 @@ export const transcriptionService = {
       const chunksDir = path.dirname(chunks[0].path);
       try {
         console.log(`Using batch transcription mode for ${chunks.length} chunks`);
-        const results = await this.transcribeChunksBatch(chunksDir, options);
+        const results = await this.transcribeChunksBatch(chunksDir, {
+          ...options,
+          dedupeGroup: options.dedupeGroup || options.uploadDate,
+          onChunk: (chunk) => {
+            if (options.onProgress) {
+              options.onProgress({
+                current: chunk.chunkIndex + 1,
+                total: chunks.length,
+                text: chunk.text
+              });
+            }
+          }
+        });
 
         // Update startTime/endTime from actual chunk info
         return results.map((result, i) => ({
@@ -3,6 +3,7 @@ import { promisify } from 'util';
 import fs from 'fs/promises';
 import path from 'path';
 import { config } from '../config/index.js';
+import { audioCacheService } from './audioCacheService.js';
 
 const execAsync = promisify(exec);
 
@@ -62,64 +63,17 @@ export const videoService = {
 
   /**
    * Download audio from a recorded video
-   * Returns path to downloaded audio file
+   * Returns path to a 16kHz mono WAV converted from the shared audio cache
    */
   async downloadAudio(youtubeUrl, outputDir) {
     await fs.mkdir(outputDir, { recursive: true });
 
-    const outputTemplate = path.join(outputDir, '%(id)s.%(ext)s');
-
-    return new Promise((resolve, reject) => {
-      const args = [
-        '--js-runtimes', 'node',
-        '-x', // Extract audio
-        '--audio-format', 'wav',
-        '--audio-quality', '0',
-        '--postprocessor-args', 'ffmpeg:-ar 16000 -ac 1', // 16kHz mono for Whisper
-        '-o', outputTemplate,
-        '--no-playlist',
-        youtubeUrl
-      ];
-
-      const ytdlp = spawn('yt-dlp', args);
-
-      let stdout = '';
-      let stderr = '';
-
-      ytdlp.stdout.on('data', (data) => {
-        stdout += data.toString();
-        console.log('[yt-dlp]', data.toString().trim());
-      });
-
-      ytdlp.stderr.on('data', (data) => {
-        stderr += data.toString();
-        console.error('[yt-dlp error]', data.toString().trim());
-      });
-
-      ytdlp.on('close', async (code) => {
-        if (code !== 0) {
-          reject(new Error(`yt-dlp exited with code ${code}: ${stderr}`));
-          return;
-        }
-
-        // Find the downloaded file
-        try {
-          const files = await fs.readdir(outputDir);
-          const audioFile = files.find(f => f.endsWith('.wav'));
-          if (audioFile) {
-            resolve(path.join(outputDir, audioFile));
-          } else {
-            reject(new Error('Audio file not found after download'));
-          }
-        } catch (err) {
-          reject(err);
-        }
-      });
-
-      ytdlp.on('error', (err) => {
-        reject(new Error(`Failed to spawn yt-dlp: ${err.message}`));
-      });
+    const converted = await audioCacheService.convertAudio(youtubeUrl, path.join(outputDir, '{video_id}.wav'), {
+      // 16kHz mono for Whisper
+      ffmpegArgs: '-ar 16000 -ac 1 -acodec pcm_s16le',
+      ytdlpArgs: '--js-runtimes node'
     });
+    return converted.path;
   },
 
   /**
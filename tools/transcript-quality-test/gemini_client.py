@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Thread-safe Gemini client for the quality test
+
+One pooled requests session is shared by every call. A semaphore caps how
+many calls are in flight at once, and a token bucket caps how often calls
+start. Calls retry with exponential backoff and jitter on 429, 5xx and
+connection errors, honouring Retry-After. Every call records its latency,
+attempts, time spent waiting for a slot or the rate limit, and the
+tokens Gemini reports, for the run summary.
+
+GEMINI_BASE_URL points the client somewhere else. The mock server below
+answers generateContent offline, with a chosen share of 429/503 errors:
+
+    python gemini_client.py mock-server --port 8089 --fail-rate 0.3
+    GEMINI_BASE_URL=http://127.0.0.1:8089 python test_transcript_quality.py --auto
+"""
+
+import os
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+DEFAULT_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", 4))
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_RPM", 60))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# (connect, read) seconds; long prompts take a while to generate
+DEFAULT_TIMEOUT = (10, 300)
+
+
+class TokenBucket:
+    """Allows rate calls per second on average, with bursts of up to burst calls"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class GeminiError(RuntimeError):
+    pass
+
+
+class GeminiClient:
+    """Gemini generateContent calls, safe to make from several threads at once"""
+
+    def __init__(self, api_key, model=GEMINI_MODEL, base_url=GEMINI_BASE_URL,
+                 concurrency=DEFAULT_CONCURRENCY, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 max_retries=5, backoff_seconds=2.0, max_backoff_seconds=60.0, timeout=DEFAULT_TIMEOUT):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = f"{base_url.rstrip('/')}/v1beta/models/{model}:generateContent"
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json", "x-goog-api-key": api_key})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60, burst=concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout = timeout
+        self.calls = []
+        self.calls_lock = threading.Lock()
+
+    def generate(self, prompt, max_tokens=8192, label=None):
+        """Text of Gemini's answer to prompt; raises GeminiError once retries are used up"""
+        import requests
+
+        body = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "temperature": 0.1,
+                "maxOutputTokens": max_tokens
+            }
+        }
+        call = {"label": label, "attempts": 0, "queued_seconds": 0.0, "throttled_seconds": 0.0}
+        queued = started = time.perf_counter()
+        try:
+            with self.slots:
+                started = time.perf_counter()
+                call["queued_seconds"] = round(started - queued, 3)
+                while True:
+                    call["throttled_seconds"] += self.bucket.acquire()
+                    call["attempts"] += 1
+                    try:
+                        response = self.session.post(self.url, json=body, timeout=self.timeout)
+                    except (requests.ConnectionError, requests.Timeout) as e:
+                        error, retry_after = f"{type(e).__name__}: {e}", None
+                    else:
+                        if response.ok:
+                            return self.answer(response.json(), call)
+                        error = f"Gemini API error: {response.status_code} - {response.text[:500]}"
+                        if response.status_code not in RETRY_STATUSES:
+                            raise GeminiError(error)
+                        retry_after = response.headers.get("Retry-After")
+
+                    if call["attempts"] > self.max_retries:
+                        raise GeminiError(f"{error} (gave up after {call['attempts']} attempts)")
+                    delay = self.backoff(call["attempts"], retry_after)
+                    print(f"  Gemini call {label or self.url} failed ({error[:120]}), retrying in {delay:.1f}s",
+                          file=sys.stderr, flush=True)
+                    time.sleep(delay)
+        finally:
+            call["latency_seconds"] = round(time.perf_counter() - started, 3)
+            call["throttled_seconds"] = round(call["throttled_seconds"], 3)
+            with self.calls_lock:
+                self.calls.append(call)
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds before retry number attempt: Retry-After if given, else full-jitter exponential"""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff_seconds)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempt - 1)))
+
+    def answer(self, result, call):
+        usage = result.get("usageMetadata", {})
+        call["prompt_tokens"] = usage.get("promptTokenCount", 0)
+        call["output_tokens"] = usage.get("candidatesTokenCount", 0)
+        try:
+            return result["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError) as e:
+            reason = (result.get("candidates") or [{}])[0].get("finishReason") or result.get("promptFeedback")
+            raise GeminiError(f"Gemini returned no text ({reason or e})")
+
+    def summary(self):
+        """Totals over every call so far"""
+        with self.calls_lock:
+            calls = list(self.calls)
+        return {
+            "calls": len(calls),
+            "retries": sum(call["attempts"] - 1 for call in calls),
+            "latency_seconds": round(sum(call["latency_seconds"] for call in calls), 3),
+            "prompt_tokens": sum(call.get("prompt_tokens", 0) for call in calls),
+            "output_tokens": sum(call.get("output_tokens", 0) for call in calls)
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def add_gemini_arguments(parser):
+    parser.add_argument("--gemini-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Most Gemini calls in flight at once")
+    parser.add_argument("--gemini-rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="Most Gemini calls started per minute")
+
+
+def serve_mock(port, fail_rate=0.0, delay=0.2):
+    """Answer generateContent like Gemini, failing fail_rate of requests with 429 or 503"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MockGemini(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(delay)
+            if random.random() < fail_rate:
+                status = random.choice([429, 503])
+                self.send_response(status)
+                self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": {"code": status, "message": "mock failure"}}).encode())
+                return
+
+            prompt = body["contents"][0]["parts"][0]["text"]
+            text = "[]" if "JSON array" in prompt else f"Mock analysis of a {len(prompt)} character prompt."
+            answer = {
+                "candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+                                  "totalTokenCount": (len(prompt) + len(text)) // 4}
+            }
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(answer).encode())
+
+        def log_message(self, format, *args):
+            print(f"[mock-gemini] {format % args}", file=sys.stderr)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockGemini)
+    print(f"Mock Gemini listening on http://127.0.0.1:{port}", file=sys.stderr, flush=True)
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline mock of the Gemini generateContent API")
+    parser.add_argument("command", choices=["mock-server"])
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 429/503")
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds before each answer")
+
+    args = parser.parse_args()
+    serve_mock(args.port, args.fail_rate, args.delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,20 +12,14 @@ Usage:
 """
 
 import sys
-print("Starting script...", flush=True)
-
 import os
 import json
 import argparse
 import subprocess
 import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-print("Basic imports done", flush=True)
-
-import psycopg2
-from psycopg2.extras import RealDictCursor
-print("psycopg2 imported", flush=True)
 
 # Add parent paths for imports
 SCRIPT_DIR = Path(__file__).parent
@@ -33,6 +27,11 @@ PROJECT_ROOT = SCRIPT_DIR.parent.parent
 print(f"PROJECT_ROOT: {PROJECT_ROOT}", flush=True)
 # Don't add backend to path - it has node modules that conflict
 # sys.path.insert(0, str(PROJECT_ROOT / "backend" / "src"))
+# backend/scripts is plain Python; it holds the shared audio cache
+sys.path.append(str(PROJECT_ROOT / "backend" / "scripts"))
+from audio_cache import add_audio_cache_arguments, open_audio_cache, video_id_from_url
+from transcript_metrics import DEFAULT_WINDOW_SECONDS, compare, metrics_table, overall_metrics, percent
+from gemini_client import GeminiClient, add_gemini_arguments
 print("Paths set", flush=True)
 
 # Configuration
@@ -46,21 +45,22 @@ DB_CONFIG = {
 print("DB_CONFIG set", flush=True)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = "gemini-2.0-flash"
-GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+# Pooled, rate limited Gemini client (gemini_client.py), opened in main()
+GEMINI = None
 print("GEMINI config set", flush=True)
 
 OUTPUT_DIR = SCRIPT_DIR / "output"
-TEMP_DIR = SCRIPT_DIR / "temp"
+# Shared audio cache (backend/scripts/audio_cache.py), opened in main()
+AUDIO_CACHE = None
 PROMPTS_DIR = PROJECT_ROOT / "backend" / "prompts"
-print("Directories set, importing requests...", flush=True)
-
-import requests
-print("All imports done, defining functions...", flush=True)
 
 
 def get_db_connection():
     """Get PostgreSQL connection"""
+    # Imported here so --help and the transcription steps don't pay for it
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
     print(f"  Connecting to DB: {DB_CONFIG['host']}:{DB_CONFIG['port']}", flush=True)
     conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
     print("  DB connected", flush=True)
@@ -113,18 +113,27 @@ def find_test_video(video_id=None, video_url=None, auto=False):
     return dict(video)
 
 
-def get_youtube_transcript(video_id):
-    """Get stored YouTube transcript from database"""
+def get_youtube_transcript(video_id, start=None, end=None):
+    """Get stored YouTube transcript from database, optionally only the chunks starting in [start, end)"""
     conn = get_db_connection()
     cur = conn.cursor()
 
     print(f"  Executing query for video_id: {video_id}", flush=True)
-    cur.execute("""
-        SELECT chunk_index, start_time_seconds, end_time_seconds, transcript_text
-        FROM transcripts
-        WHERE video_id = %s
-        ORDER BY chunk_index
-    """, (video_id,))
+    if start is None:
+        cur.execute("""
+            SELECT chunk_index, start_time_seconds, end_time_seconds, transcript_text
+            FROM transcripts
+            WHERE video_id = %s
+            ORDER BY chunk_index
+        """, (video_id,))
+    else:
+        cur.execute("""
+            SELECT chunk_index, start_time_seconds, end_time_seconds, transcript_text
+            FROM transcripts
+            WHERE video_id = %s
+              AND start_time_seconds >= %s AND start_time_seconds < %s
+            ORDER BY chunk_index
+        """, (video_id, start, end))
     print("  Query executed, fetching results...", flush=True)
 
     chunks = cur.fetchall()
@@ -150,40 +159,171 @@ def get_youtube_transcript(video_id):
     return result
 
 
-def download_audio(youtube_url, output_path):
-    """Download audio from YouTube using yt-dlp"""
-    print(f"  Downloading audio from {youtube_url}...")
+@contextmanager
+def download_audio(youtube_url, section=None):
+    """Audio of a YouTube video from the shared audio cache, downloaded with yt-dlp on a miss
+
+    section is a (start, end) pair in seconds; only that part is fetched.
+    The file is the native opus/m4a stream and belongs to the cache, which
+    will not evict it until the with block ends.
+    """
+    print(f"  Fetching audio of {youtube_url}...", flush=True)
+    hits = AUDIO_CACHE.stats['hits']
+    with AUDIO_CACHE.reading(video_id_from_url(youtube_url), youtube_url, section=section) as path:
+        print(f"  {'Audio cache hit' if AUDIO_CACHE.stats['hits'] > hits else 'Downloaded'}: {path}", flush=True)
+        yield path
+
+
+# whisper.cpp keeps a whole input in memory, so the audio is fed to it in blocks
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_BLOCK_SECONDS = 600
+# Blocks are cut at the quietest 100 ms within this many seconds of their end
+WHISPER_CUT_SEARCH_SECONDS = 5
+WHISPER_LINE = r'\[(\d{2}):(\d{2}):(\d{2}\.\d{3})\s*-->\s*\d{2}:\d{2}:\d{2}\.\d{3}\]\s*(.+)'
+
+
+def wav_header(data_bytes):
+    """44-byte header of a 16 kHz mono 16-bit WAV holding data_bytes of PCM"""
+    import struct
+
+    byte_rate = WHISPER_SAMPLE_RATE * 2
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_bytes, b'WAVE', b'fmt ', 16, 1, 1,
+                       WHISPER_SAMPLE_RATE, byte_rate, 2, 16, b'data', data_bytes)
+
+
+def quietest_cut(pcm, search_bytes):
+    """Byte offset of the quietest 100 ms frame in the last search_bytes of s16le PCM"""
+    frame = WHISPER_SAMPLE_RATE // 10 * 2
+    first = max(0, len(pcm) - search_bytes) // frame * frame
+    best, best_energy = len(pcm), None
+    for start in range(first, len(pcm) - frame + 1, frame):
+        energy = sum(abs(sample) for sample in memoryview(pcm)[start:start + frame].cast('h'))
+        if best_energy is None or energy < best_energy:
+            best, best_energy = start, energy
+    return best
+
+
+def pcm_blocks(stream, block_seconds=WHISPER_BLOCK_SECONDS, start_seconds=0):
+    """Yield (offset_seconds, pcm) blocks of a s16le 16 kHz mono stream, each cut at a quiet moment"""
+    block_bytes = block_seconds * WHISPER_SAMPLE_RATE * 2
+    search_bytes = WHISPER_CUT_SEARCH_SECONDS * WHISPER_SAMPLE_RATE * 2
+    carry = b''
+    offset = int(start_seconds * WHISPER_SAMPLE_RATE) * 2
+    while True:
+        pcm = bytearray(carry)
+        while len(pcm) < block_bytes:
+            data = stream.read(block_bytes - len(pcm))
+            if not data:
+                break
+            pcm += data
+        if len(pcm) < block_bytes:
+            if pcm:
+                yield offset / (WHISPER_SAMPLE_RATE * 2), pcm
+            return
+        cut = quietest_cut(pcm, search_bytes)
+        carry = pcm[cut:]
+        del pcm[cut:]
+        yield offset / (WHISPER_SAMPLE_RATE * 2), pcm
+        offset += cut
 
-    cmd = [
-        "yt-dlp",
-        "-x",  # Extract audio
-        "--audio-format", "mp3",
-        "--audio-quality", "0",  # Best quality
-        "-o", str(output_path),
-        "--no-playlist",
-        youtube_url
-    ]
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(f"yt-dlp failed: {result.stderr}")
-
-    # yt-dlp adds extension automatically
-    actual_path = Path(str(output_path) + ".mp3") if not output_path.suffix else output_path
-    if not actual_path.exists():
-        # Try without extension
-        for ext in [".mp3", ".m4a", ".webm", ".opus"]:
-            test_path = Path(str(output_path).replace(output_path.suffix, "") + ext)
-            if test_path.exists():
-                actual_path = test_path
-                break
+def drain(stream, lines):
+    """Read a pipe to its end in a thread, keeping its last lines"""
+    import threading
 
-    return actual_path
+    def read():
+        for line in stream:
+            lines.append(line.decode('utf-8', errors='replace'))
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    return thread
+
+
+class ChunkGrouper:
+    """Groups timestamped lines into 30-second chunks like YouTube's, as they arrive"""
+
+    def __init__(self):
+        self.chunks = []
+        self.current = {"start": 0, "end": 30, "texts": []}
+
+    def add(self, start_seconds, text):
+        chunk_index = int(start_seconds // 30)
+        chunk_start = chunk_index * 30
+        chunk_end = (chunk_index + 1) * 30
+
+        if start_seconds >= self.current["end"]:
+            self.flush()
+            self.current = {"start": chunk_start, "end": chunk_end, "texts": [text.strip()]}
+        else:
+            self.current["texts"].append(text.strip())
+            self.current["end"] = max(self.current["end"], chunk_end)
 
+    def flush(self):
+        if self.current["texts"]:
+            start_str = f"{int(self.current['start']//60):02d}:{int(self.current['start']%60):02d}"
+            end_str = f"{int(self.current['end']//60):02d}:{int(self.current['end']%60):02d}"
+            self.chunks.append(f"[{start_str}-{end_str}] {' '.join(self.current['texts'])}")
+            self.current["texts"] = []
 
-def transcribe_with_whisper(audio_path, model_size="large-v3-turbo"):
-    """Transcribe audio using whisper.cpp with GPU acceleration"""
+    def transcript(self):
+        self.flush()
+        return "\n\n".join(self.chunks)
+
+
+def run_whisper_block(whisper_cmd, pcm, offset_seconds, grouper):
+    """Pipe one block to whisper.cpp as a WAV on stdin; returns its reported total time in ms"""
     import re
+    import threading
+    from collections import deque
+
+    # Format: [00:00:00.000 --> 00:00:16.860]   Text here
+    line_pattern = re.compile(WHISPER_LINE)
+    stderr_lines = deque(maxlen=50)
+
+    process = subprocess.Popen(whisper_cmd + ["-f", "-"], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def feed():
+        try:
+            process.stdin.write(wav_header(len(pcm)))
+            process.stdin.write(pcm)
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    stderr_reader = drain(process.stderr, stderr_lines)
+
+    for raw in process.stdout:
+        # Decode with error handling for non-UTF8 characters in Hindi text
+        line = raw.decode('utf-8', errors='replace')
+        match = line_pattern.search(line)
+        if match:
+            h, m, s, text = match.groups()
+            grouper.add(offset_seconds + int(h) * 3600 + int(m) * 60 + float(s), text)
+
+    process.wait()
+    feeder.join()
+    stderr_reader.join()
+    if process.returncode != 0:
+        raise RuntimeError(f"whisper.cpp failed: {''.join(stderr_lines)}")
+
+    timing_match = re.search(r'total time\s*=\s*([\d.]+)\s*ms', ''.join(stderr_lines))
+    return float(timing_match.group(1)) if timing_match else None
+
+
+def transcribe_with_whisper(audio_path, model_size="large-v3-turbo", start_seconds=0):
+    """Transcribe audio using whisper.cpp with GPU acceleration
+
+    ffmpeg's 16 kHz PCM is piped through in blocks, and whisper's lines are
+    grouped into chunks as they arrive, so nothing is written to disk and
+    memory stays at about one block whatever the video length. Timestamps
+    start at start_seconds (where a downloaded section begins in the video).
+    """
+    from collections import deque
 
     # Whisper.cpp paths
     WHISPER_CLI = Path.home() / "whisper.cpp/build/bin/whisper-cli"
@@ -194,89 +334,116 @@ def transcribe_with_whisper(audio_path, model_size="large-v3-turbo"):
     if not WHISPER_MODEL.exists():
         raise RuntimeError(f"Whisper model not found at {WHISPER_MODEL}")
 
-    # Convert audio to 16kHz WAV (required by whisper.cpp)
-    wav_path = Path(str(audio_path).replace('.mp3', '_16k.wav'))
-    print(f"  Converting to 16kHz WAV...", flush=True)
-
     convert_cmd = [
-        "ffmpeg", "-i", str(audio_path),
-        "-ar", "16000", "-ac", "1",
-        "-y", str(wav_path)
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", str(audio_path),
+        "-f", "s16le", "-ar", str(WHISPER_SAMPLE_RATE), "-ac", "1",
+        "-"
     ]
-    result = subprocess.run(convert_cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(f"FFmpeg conversion failed: {result.stderr}")
-
-    print(f"  Running whisper.cpp with GPU (RTX 4090)...", flush=True)
-
-    # Run whisper.cpp
     whisper_cmd = [
         str(WHISPER_CLI),
         "-m", str(WHISPER_MODEL),
-        "-f", str(wav_path),
         "-l", "hi",  # Hindi
         "-t", "8",   # 8 threads
     ]
 
-    result = subprocess.run(whisper_cmd, capture_output=True)
-    # Decode with error handling for non-UTF8 characters in Hindi text
-    stdout = result.stdout.decode('utf-8', errors='replace')
-    stderr = result.stderr.decode('utf-8', errors='replace')
-    if result.returncode != 0:
-        raise RuntimeError(f"whisper.cpp failed: {stderr}")
+    print(f"  Running whisper.cpp with GPU (RTX 4090) on ffmpeg's 16kHz stream...", flush=True)
+    ffmpeg_errors = deque(maxlen=20)
+    ffmpeg = subprocess.Popen(convert_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    ffmpeg_reader = drain(ffmpeg.stderr, ffmpeg_errors)
 
-    # Clean up WAV file
-    if wav_path.exists():
-        wav_path.unlink()
+    grouper = ChunkGrouper()
+    total_ms = 0.0
+    try:
+        for offset_seconds, pcm in pcm_blocks(ffmpeg.stdout, start_seconds=start_seconds):
+            print(f"  Block at {int(offset_seconds // 60)} min ({len(pcm) / (WHISPER_SAMPLE_RATE * 2):.0f}s)...",
+                  flush=True)
+            total_ms += run_whisper_block(whisper_cmd, pcm, offset_seconds, grouper) or 0.0
+    except BaseException:
+        ffmpeg.kill()
+        raise
+    finally:
+        ffmpeg.wait()
+        ffmpeg_reader.join()
+
+    if ffmpeg.returncode != 0:
+        raise RuntimeError(f"FFmpeg conversion failed: {''.join(ffmpeg_errors)}")
+    if total_ms:
+        print(f"  Transcription completed in {total_ms/1000:.1f}s", flush=True)
 
-    # Parse whisper.cpp output - extract timestamps and text
-    # Format: [00:00:00.000 --> 00:00:16.860]   Text here
-    output = stdout + stderr  # whisper outputs to stderr
+    return grouper.transcript()
 
-    # Extract timing info from stderr
-    timing_match = re.search(r'total time\s*=\s*([\d.]+)\s*ms', output)
-    if timing_match:
-        total_ms = float(timing_match.group(1))
-        print(f"  Transcription completed in {total_ms/1000:.1f}s", flush=True)
 
-    # Parse transcript lines
-    transcript_pattern = r'\[(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})\]\s*(.+)'
-    matches = re.findall(transcript_pattern, output)
+def sample_windows(duration, count, window_seconds, seed=0):
+    """(start, end) of count windows, one at a random spot in each of count equal slices of the video
 
-    # Format transcript with timestamps (MM:SS format like YouTube)
-    formatted = []
-    current_chunk = {"start": 0, "end": 30, "texts": []}
+    Starts are on the 30-second grid the transcript chunks use; the seed
+    makes a sample reproducible.
+    """
+    import random
 
-    for start_time, end_time, text in matches:
-        # Parse start time (HH:MM:SS.mmm -> seconds)
-        h, m, s = start_time.split(':')
-        start_seconds = int(h) * 3600 + int(m) * 60 + float(s)
+    rng = random.Random(seed)
+    stratum = duration / count
+    window_seconds = min(window_seconds, stratum)
+    windows = []
+    for i in range(count):
+        start = int(i * stratum + rng.uniform(0, stratum - window_seconds))
+        start = max(start - start % 30, int(i * stratum) - int(i * stratum) % 30)
+        windows.append((start, int(min(start + window_seconds, duration))))
+    return windows
 
-        # Group into 30-second chunks like YouTube does
-        chunk_index = int(start_seconds // 30)
-        chunk_start = chunk_index * 30
-        chunk_end = (chunk_index + 1) * 30
 
-        if start_seconds >= current_chunk["end"]:
-            # Save current chunk
-            if current_chunk["texts"]:
-                start_str = f"{int(current_chunk['start']//60):02d}:{int(current_chunk['start']%60):02d}"
-                end_str = f"{int(current_chunk['end']//60):02d}:{int(current_chunk['end']%60):02d}"
-                formatted.append(f"[{start_str}-{end_str}] {' '.join(current_chunk['texts'])}")
+def format_range(start, end):
+    return f"{int(start//60):02d}:{int(start%60):02d}-{int(end//60):02d}:{int(end%60):02d}"
 
-            # Start new chunk
-            current_chunk = {"start": chunk_start, "end": chunk_end, "texts": [text.strip()]}
-        else:
-            current_chunk["texts"].append(text.strip())
-            current_chunk["end"] = max(current_chunk["end"], chunk_end)
 
-    # Don't forget last chunk
-    if current_chunk["texts"]:
-        start_str = f"{int(current_chunk['start']//60):02d}:{int(current_chunk['start']%60):02d}"
-        end_str = f"{int(current_chunk['end']//60):02d}:{int(current_chunk['end']%60):02d}"
-        formatted.append(f"[{start_str}-{end_str}] {' '.join(current_chunk['texts'])}")
+def sample_transcripts(video, args, duration_info):
+    """Download, transcribe and fetch only the sampled windows of a video
+
+    Returns the YouTube and Whisper transcripts of all windows (one section
+    per window) and the (start, end) of each window.
+    """
+    import time
+
+    windows = sample_windows(video['duration_seconds'], args.sample, args.window_seconds, args.seed)
+    print(f"  Sampling {len(windows)} windows: {', '.join(format_range(*w) for w in windows)}", flush=True)
+
+    download_seconds = whisper_seconds = 0.0
+    youtube_sections, whisper_sections = [], []
+    for start, end in windows:
+        print(f"\n  Window {format_range(start, end)}", flush=True)
+        youtube_text = get_youtube_transcript(video['id'], start, end)
+
+        started = time.time()
+        with download_audio(video['youtube_url'], section=(start, end)) as audio_file:
+            download_seconds += time.time() - started
 
-    return "\n\n".join(formatted)
+            started = time.time()
+            whisper_text = transcribe_with_whisper(audio_file, args.whisper_model, start_seconds=start)
+            whisper_seconds += time.time() - started
+
+        youtube_sections.append(f"### Window {format_range(start, end)}\n\n{youtube_text}")
+        whisper_sections.append(f"### Window {format_range(start, end)}\n\n{whisper_text}")
+
+    duration_info['download'] = f"{download_seconds:.1f}s ({len(windows)} sections)"
+    duration_info['whisper'] = f"{whisper_seconds:.1f}s ({len(windows)} sections)"
+    return "\n\n".join(youtube_sections), "\n\n".join(whisper_sections), windows
+
+
+def sampling_section(windows, metrics):
+    """Markdown table of WER/CER per sampled window, from the metrics windows inside each one"""
+    sampled = {
+        'windows': [{**overall_metrics([w for w in metrics['windows'] if start <= w['start'] < end]),
+                     'start': start, 'end': end} for start, end in windows],
+        'overall': metrics['overall']
+    }
+    return f"""## Sampled Windows
+Only these windows were downloaded, transcribed and compared; the
+metrics below cover them and nothing else.
+
+{metrics_table(sampled)}
+
+"""
 
 
 def load_channel_prompt(channel_name):
@@ -297,31 +464,13 @@ def load_channel_prompt(channel_name):
         return f.read()
 
 
-def call_gemini(prompt, max_tokens=8192):
-    """Call Gemini API"""
-    import requests
-
-    response = requests.post(
-        f"{GEMINI_URL}?key={GEMINI_API_KEY}",
-        headers={"Content-Type": "application/json"},
-        json={
-            "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {
-                "temperature": 0.1,
-                "maxOutputTokens": max_tokens
-            }
-        }
-    )
-
-    if not response.ok:
-        raise RuntimeError(f"Gemini API error: {response.status_code} - {response.text}")
-
-    result = response.json()
-    return result["candidates"][0]["content"]["parts"][0]["text"]
+def call_gemini(prompt, max_tokens=8192, label=None):
+    """Call Gemini API through the shared client; safe from several threads"""
+    return GEMINI.generate(prompt, max_tokens, label)
 
 
 def compare_transcripts(youtube_transcript, whisper_transcript):
-    """Use Gemini to compare transcripts"""
+    """Use Gemini for a prose comparison of the transcripts' openings (--llm-compare)"""
     print("  Comparing transcripts with Gemini...")
 
     prompt = f"""You are a transcript quality analyst. Compare these two transcripts of the same Hindi/Hinglish stock market TV show.
@@ -358,7 +507,7 @@ def compare_transcripts(youtube_transcript, whisper_transcript):
 
 Provide a structured analysis with clear sections."""
 
-    return call_gemini(prompt)
+    return call_gemini(prompt, label="compare transcripts")
 
 
 def extract_recommendations(transcript, channel_prompt, source_name):
@@ -375,7 +524,7 @@ TRANSCRIPT (Hindi/Hinglish - timestamps in [MM:SS-MM:SS] format):
 Extract ONLY actionable stock recommendations. Convert MM:SS to seconds (05:30 = 330).
 Return as JSON array."""
 
-    response = call_gemini(prompt)
+    response = call_gemini(prompt, label=f"extract {source_name}")
 
     # Try to parse JSON
     try:
@@ -427,12 +576,24 @@ def compare_recommendations(youtube_recs, whisper_recs):
 
 Provide counts and specific examples."""
 
-    return call_gemini(prompt)
+    return call_gemini(prompt, label="compare recommendations")
+
+
+def metrics_section(metrics):
+    """Markdown section with the per-window and overall WER/CER table"""
+    return f"""## Transcript Metrics
+Whisper scored against the YouTube transcript window by window, over all
+the audio that was transcribed. Text is normalized first (case, Devanagari
+nukta and chandrabindu variants, digits, punctuation).
+
+{metrics_table(metrics)}
+
+"""
 
 
 def generate_report(video, youtube_transcript, whisper_transcript,
                    transcript_comparison, youtube_recs, whisper_recs,
-                   recs_comparison, duration_info):
+                   recs_comparison, duration_info, windows=None, metrics=None):
     """Generate markdown report"""
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -442,6 +603,11 @@ def generate_report(video, youtube_transcript, whisper_transcript,
     yt_rec_count = len(youtube_recs) if isinstance(youtube_recs, list) else "N/A"
     wh_rec_count = len(whisper_recs) if isinstance(whisper_recs, list) else "N/A"
 
+    sampling = sampling_section(windows, metrics) if windows else ""
+    if transcript_comparison is None:
+        transcript_comparison = "*Skipped; rerun with `--llm-compare` for Gemini's narrative.*"
+    wer_section = metrics_section(metrics) if metrics else ""
+
     report = f"""# Transcript Quality Comparison Report
 
 **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
@@ -455,9 +621,10 @@ def generate_report(video, youtube_transcript, whisper_transcript,
 ## Processing Times
 - **Audio Download:** {duration_info.get('download', 'N/A')}
 - **Whisper Transcription:** {duration_info.get('whisper', 'N/A')}
+- **WER/CER Scoring:** {duration_info.get('metrics', 'N/A')}
 - **Gemini Analysis:** {duration_info.get('gemini', 'N/A')}
 
-## Recommendations Summary
+{sampling}{wer_section}## Recommendations Summary
 | Source | Count |
 |--------|-------|
 | YouTube Transcript | {yt_rec_count} |
@@ -510,6 +677,37 @@ def generate_report(video, youtube_transcript, whisper_transcript,
     return report_path
 
 
+def full_transcripts(video, args, duration_info):
+    """Steps 2-4 over the whole video; returns both transcripts"""
+    import time
+
+    # Step 2: Get YouTube transcript
+    print("\n[2/6] Fetching YouTube transcript from database...", flush=True)
+    youtube_transcript = get_youtube_transcript(video['id'])
+    print(f"  Got {len(youtube_transcript)} characters", flush=True)
+
+    # Step 3: Download audio (or reuse the shared audio cache's copy)
+    print("\n[3/6] Downloading audio...", flush=True)
+    start = time.time()
+    hits = AUDIO_CACHE.stats['hits']
+    with download_audio(video['youtube_url']) as audio_file:
+        if AUDIO_CACHE.stats['hits'] > hits:
+            duration_info['download'] = "skipped (cached)"
+        else:
+            duration_info['download'] = f"{time.time() - start:.1f}s"
+        print(f"  Time: {duration_info['download']}", flush=True)
+
+        # Step 4: Transcribe with Whisper
+        print(f"\n[4/6] Transcribing with Whisper {args.whisper_model}...", flush=True)
+        start = time.time()
+        whisper_transcript = transcribe_with_whisper(audio_file, args.whisper_model)
+    duration_info['whisper'] = f"{time.time() - start:.1f}s"
+    print(f"  Got {len(whisper_transcript)} characters", flush=True)
+    print(f"  Time: {duration_info['whisper']}", flush=True)
+
+    return youtube_transcript, whisper_transcript
+
+
 print("Functions defined, starting main...", flush=True)
 
 def main():
@@ -519,7 +717,18 @@ def main():
     parser.add_argument("--video-id", help="Video ID from database")
     parser.add_argument("--auto", action="store_true", help="Auto-pick a suitable video")
     parser.add_argument("--whisper-model", default="large-v3", help="Whisper model size")
-    parser.add_argument("--keep-audio", action="store_true", help="Keep downloaded audio file")
+    # Audio now stays in the shared audio cache; accepted so old invocations still work
+    parser.add_argument("--keep-audio", action="store_true", help=argparse.SUPPRESS)
+    add_audio_cache_arguments(parser)
+    parser.add_argument("--sample", type=int, default=None, metavar="N",
+                        help="Compare only N windows spread across the video instead of all of it")
+    parser.add_argument("--window-seconds", type=int, default=300, help="Length of each --sample window")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for where the --sample windows fall")
+    parser.add_argument("--metrics-window-seconds", type=int, default=DEFAULT_WINDOW_SECONDS,
+                        help="Length of each WER/CER window")
+    parser.add_argument("--llm-compare", action="store_true",
+                        help="Also ask Gemini for a prose comparison of the transcripts")
+    add_gemini_arguments(parser)
     print("Parser created", flush=True)
 
     args = parser.parse_args()
@@ -528,6 +737,8 @@ def main():
     if not any([args.video_url, args.video_id, args.auto]):
         parser.print_help()
         sys.exit(1)
+    if args.sample is not None and (args.sample < 1 or args.window_seconds < 30):
+        parser.error("--sample needs N >= 1 and --window-seconds >= 30")
 
     if not GEMINI_API_KEY:
         print("Error: GEMINI_API_KEY environment variable not set")
@@ -536,7 +747,10 @@ def main():
 
     # Ensure output directories exist
     OUTPUT_DIR.mkdir(exist_ok=True)
-    TEMP_DIR.mkdir(exist_ok=True)
+    global AUDIO_CACHE, GEMINI
+    AUDIO_CACHE = open_audio_cache(args)
+    GEMINI = GeminiClient(GEMINI_API_KEY, concurrency=args.gemini_concurrency,
+                          requests_per_minute=args.gemini_rpm)
     print("Directories ready", flush=True)
 
     duration_info = {}
@@ -553,52 +767,51 @@ def main():
         print(f"  Duration: {video['duration_seconds'] // 60} minutes", flush=True)
         print(f"  URL: {video['youtube_url']}", flush=True)
 
-        # Step 2: Get YouTube transcript
-        print("\n[2/6] Fetching YouTube transcript from database...", flush=True)
-        youtube_transcript = get_youtube_transcript(video['id'])
-        print(f"  Got {len(youtube_transcript)} characters", flush=True)
-
-        # Step 3: Download audio (or skip if exists)
-        print("\n[3/6] Downloading audio...", flush=True)
         import time
-        start = time.time()
-        audio_path = TEMP_DIR / f"audio_{video['id']}"
-        # Check if audio already exists
-        existing_audio = audio_path.with_suffix('.mp3')
-        if existing_audio.exists():
-            print(f"  Audio already exists: {existing_audio}", flush=True)
-            audio_file = existing_audio
-            duration_info['download'] = "skipped (cached)"
+        windows = None
+        if args.sample:
+            # Steps 2-4 on the sampled windows only
+            print(f"\n[2-4/6] Sampling {args.sample} x {args.window_seconds}s windows...", flush=True)
+            youtube_transcript, whisper_transcript, windows = sample_transcripts(video, args, duration_info)
         else:
-            print(f"  Downloading from YouTube...", flush=True)
-            audio_file = download_audio(video['youtube_url'], audio_path)
-            duration_info['download'] = f"{time.time() - start:.1f}s"
-            print(f"  Downloaded to: {audio_file}", flush=True)
-        print(f"  Time: {duration_info['download']}", flush=True)
+            youtube_transcript, whisper_transcript = full_transcripts(video, args, duration_info)
 
-        # Step 4: Transcribe with Whisper
-        print(f"\n[4/6] Transcribing with Whisper {args.whisper_model}...", flush=True)
+        # Step 5: Score transcripts locally and extract recommendations
+        print("\n[5/6] Scoring transcripts...", flush=True)
         start = time.time()
-        whisper_transcript = transcribe_with_whisper(audio_file, args.whisper_model)
-        duration_info['whisper'] = f"{time.time() - start:.1f}s"
-        print(f"  Got {len(whisper_transcript)} characters", flush=True)
-        print(f"  Time: {duration_info['whisper']}", flush=True)
+        metrics = compare(youtube_transcript, whisper_transcript, args.metrics_window_seconds, windows)
+        duration_info['metrics'] = f"{time.time() - start:.1f}s"
+        overall = metrics['overall']
+        print(f"  WER: {percent(overall['wer'])}, CER: {percent(overall['cer'])} "
+              f"over {overall['windows']} windows", flush=True)
 
-        # Step 5: Compare transcripts and extract recommendations
-        print("\n[5/6] Analyzing with Gemini...", flush=True)
+        print("\n  Analyzing with Gemini...", flush=True)
         start = time.time()
 
-        print("  Comparing transcripts...", flush=True)
-        transcript_comparison = compare_transcripts(youtube_transcript, whisper_transcript)
-
         print("  Loading channel prompt...", flush=True)
         channel_prompt = load_channel_prompt(video.get('channel_name'))
-        youtube_recs = extract_recommendations(youtube_transcript, channel_prompt, "YouTube")
-        whisper_recs = extract_recommendations(whisper_transcript, channel_prompt, "Whisper")
 
-        print("  Comparing recommendations...", flush=True)
-        recs_comparison = compare_recommendations(youtube_recs, whisper_recs)
-        duration_info['gemini'] = f"{time.time() - start:.1f}s"
+        # The extractions and the transcript comparison are independent; only
+        # the recommendation comparison needs both extractions
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            comparing = pool.submit(compare_transcripts, youtube_transcript, whisper_transcript) \
+                if args.llm_compare else None
+            youtube_extraction = pool.submit(extract_recommendations, youtube_transcript, channel_prompt, "YouTube")
+            whisper_extraction = pool.submit(extract_recommendations, whisper_transcript, channel_prompt, "Whisper")
+            youtube_recs, whisper_recs = youtube_extraction.result(), whisper_extraction.result()
+
+            print("  Comparing recommendations...", flush=True)
+            recs_comparison = compare_recommendations(youtube_recs, whisper_recs)
+            transcript_comparison = comparing.result() if comparing else None
+
+        gemini = GEMINI.summary()
+        for call in GEMINI.calls:
+            print(f"    {call['label']}: {call['latency_seconds']:.1f}s, {call['attempts']} attempt(s), "
+                  f"{call.get('prompt_tokens', 0)} in / {call.get('output_tokens', 0)} out tokens", flush=True)
+        duration_info['gemini'] = (f"{time.time() - start:.1f}s ({gemini['calls']} calls, {gemini['retries']} retries, "
+                                   f"{gemini['prompt_tokens']} prompt + {gemini['output_tokens']} output tokens)")
         print(f"  Time: {duration_info['gemini']}", flush=True)
 
         # Step 6: Generate report
@@ -606,15 +819,10 @@ def main():
         report_path = generate_report(
             video, youtube_transcript, whisper_transcript,
             transcript_comparison, youtube_recs, whisper_recs,
-            recs_comparison, duration_info
+            recs_comparison, duration_info, windows, metrics
         )
         print(f"  Report saved to: {report_path}", flush=True)
 
-        # Cleanup
-        if not args.keep_audio and audio_file.exists():
-            audio_file.unlink()
-            print("  Cleaned up audio file", flush=True)
-
         print("\n" + "="*60, flush=True)
         print("TEST COMPLETE", flush=True)
         print("="*60, flush=True)
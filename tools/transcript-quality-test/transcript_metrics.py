@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Local WER/CER comparison of two timestamped transcripts
+
+Both transcripts are the "[MM:SS-MM:SS] text" chunks get_youtube_transcript()
+and transcribe_with_whisper() produce. Chunks go into an interval index,
+words are spread evenly over their chunk's span, and each window of the
+timeline compares the words of both transcripts that fall in it. Counting
+runs the whole length of both transcripts. The YouTube transcript is the
+reference, so WER is Whisper's edits per YouTube word.
+
+Text is normalized before counting: lowercase Latin with accents removed,
+Devanagari with nukta and chandrabindu variants folded and its digits
+made ASCII, and no punctuation, dandas or [Music] style tags. Edit
+distances use Myers' bit-parallel algorithm, which processes 64+ cells of
+the DP band per machine word, so a 3-hour show is compared in seconds.
+
+    python3 transcript_metrics.py youtube.txt whisper.txt --window-seconds 300
+"""
+
+import argparse
+import bisect
+import html
+import json
+import re
+import unicodedata
+
+DEFAULT_WINDOW_SECONDS = 300
+
+TIMESTAMP = re.compile(r'\[(\d+):(\d{2})-(\d+):(\d{2})\]')
+# \w alone splits Devanagari words at their vowel signs
+WORD = re.compile(r'[\w\u0900-\u0963\u0966-\u097f]+')
+TAG = re.compile(r'\[[^\]]*\]|\([^)]*\)')
+DIGIT_GROUPS = re.compile(r'(?<=\d)[,_](?=\d)')
+
+NUKTA = '\u093c'
+DEVANAGARI_FOLD = str.maketrans({
+    '\u0901': '\u0902',  # chandrabindu -> anusvara
+    '\u200c': None,  # zero width non-joiner
+    '\u200d': None,  # zero width joiner
+    **{chr(0x0966 + d): str(d) for d in range(10)}
+})
+
+
+def normalize_words(text):
+    """Words of text with script variants folded, for counting edits"""
+    text = TAG.sub(' ', html.unescape(text))
+    # NFD splits precomposed nukta letters (क़ -> क + ़) and Latin accents off their base
+    text = unicodedata.normalize('NFD', text.casefold())
+    text = ''.join(c for c in text if c != NUKTA and not '\u0300' <= c <= '\u036f')
+    text = unicodedata.normalize('NFC', text).translate(DEVANAGARI_FOLD)
+    return WORD.findall(DIGIT_GROUPS.sub('', text))
+
+
+def parse_chunks(transcript):
+    """(start, end, words) of every timestamped chunk; other lines (### Window headers) are skipped"""
+    transcript = '\n'.join(line for line in transcript.splitlines() if not line.startswith('###'))
+    matches = list(TIMESTAMP.finditer(transcript))
+    chunks = []
+    for i, match in enumerate(matches):
+        start = int(match.group(1)) * 60 + int(match.group(2))
+        end = int(match.group(3)) * 60 + int(match.group(4))
+        text_end = matches[i + 1].start() if i + 1 < len(matches) else len(transcript)
+        # Give zero-length chunks a second so their words still land in a window
+        chunks.append((start, max(end, start + 1), normalize_words(transcript[match.end():text_end])))
+    return chunks
+
+
+class IntervalIndex:
+    """Intervals sorted by start with a running maximum of their ends, for overlap queries
+
+    overlapping() bisects to the last interval starting before the query
+    ends and walks back only while an earlier interval can still reach
+    into the query, so it costs O(log n + k) on transcripts, whose chunks
+    barely overlap.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda interval: interval[0])
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = []
+        for interval in self.intervals:
+            self.max_ends.append(max(interval[1], self.max_ends[-1] if self.max_ends else interval[1]))
+
+    def overlapping(self, lo, hi):
+        """Intervals that overlap [lo, hi), in start order"""
+        found = []
+        i = bisect.bisect_left(self.starts, hi) - 1
+        while i >= 0 and self.max_ends[i] > lo:
+            if self.intervals[i][1] > lo:
+                found.append(self.intervals[i])
+            i -= 1
+        return found[::-1]
+
+    def end(self):
+        return self.max_ends[-1] if self.max_ends else 0
+
+
+def words_between(index, lo, hi):
+    """Words timed in [lo, hi); each chunk's words are spread evenly over its span"""
+    words = []
+    for start, end, chunk_words in index.overlapping(lo, hi):
+        step = (end - start) / len(chunk_words) if chunk_words else 0
+        for i, word in enumerate(chunk_words):
+            if lo <= start + (i + 0.5) * step < hi:
+                words.append(word)
+    return words
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two sequences (of words or characters)
+
+    Myers/Hyyrö bit-parallel: each column of the DP matrix is kept as bit
+    vectors of vertical +1/-1 deltas in a Python int, so one step of the
+    longer sequence updates the whole column at once.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    if m == 0:
+        return len(a)
+
+    peq = {}
+    for i, symbol in enumerate(b):
+        peq[symbol] = peq.get(symbol, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for symbol in a:
+        eq = peq.get(symbol, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
+
+
+def window_metrics(reference, hypothesis, start, end):
+    """WER/CER of one window's hypothesis words against its reference words"""
+    reference_chars, hypothesis_chars = ' '.join(reference), ' '.join(hypothesis)
+    word_errors = edit_distance(reference, hypothesis)
+    char_errors = edit_distance(reference_chars, hypothesis_chars)
+    return {
+        'start': start,
+        'end': end,
+        'reference_words': len(reference),
+        'hypothesis_words': len(hypothesis),
+        'word_errors': word_errors,
+        'wer': round(word_errors / len(reference), 4) if reference else None,
+        'reference_chars': len(reference_chars),
+        'char_errors': char_errors,
+        'cer': round(char_errors / len(reference_chars), 4) if reference_chars else None
+    }
+
+
+def compare(reference_transcript, hypothesis_transcript, window_seconds=DEFAULT_WINDOW_SECONDS, spans=None):
+    """Per-window and overall WER/CER of hypothesis against reference
+
+    Windows tile the whole length of both transcripts, or tile each of
+    spans ((start, end) pairs) when only those parts were transcribed.
+    Windows where both transcripts are empty are left out.
+    """
+    reference = IntervalIndex(parse_chunks(reference_transcript))
+    hypothesis = IntervalIndex(parse_chunks(hypothesis_transcript))
+    spans = spans or [(0, max(reference.end(), hypothesis.end()))]
+
+    windows = []
+    for span_start, span_end in spans:
+        for start in range(int(span_start), int(span_end), window_seconds):
+            end = min(start + window_seconds, span_end)
+            reference_words = words_between(reference, start, end)
+            hypothesis_words = words_between(hypothesis, start, end)
+            if reference_words or hypothesis_words:
+                windows.append(window_metrics(reference_words, hypothesis_words, start, end))
+    return {'windows': windows, 'overall': overall_metrics(windows)}
+
+
+def overall_metrics(windows):
+    """Errors over all windows divided by all reference words/characters"""
+    totals = {key: sum(w[key] for w in windows)
+              for key in ('reference_words', 'hypothesis_words', 'word_errors', 'reference_chars', 'char_errors')}
+    return {
+        **totals,
+        'windows': len(windows),
+        'wer': round(totals['word_errors'] / totals['reference_words'], 4) if totals['reference_words'] else None,
+        'cer': round(totals['char_errors'] / totals['reference_chars'], 4) if totals['reference_chars'] else None
+    }
+
+
+def format_time(seconds):
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
+
+def percent(value):
+    return "N/A" if value is None else f"{value:.1%}"
+
+
+def metrics_table(metrics, reference_name="YouTube", hypothesis_name="Whisper"):
+    """Markdown table of per-window and overall metrics"""
+    rows = [f"| {format_time(w['start'])}-{format_time(w['end'])} | {w['reference_words']} "
+            f"| {w['hypothesis_words']} | {percent(w['wer'])} | {percent(w['cer'])} |"
+            for w in metrics['windows']]
+    overall = metrics['overall']
+    rows.append(f"| **Overall** | **{overall['reference_words']}** | **{overall['hypothesis_words']}** "
+                f"| **{percent(overall['wer'])}** | **{percent(overall['cer'])}** |")
+    return (f"| Window | {reference_name} words | {hypothesis_name} words | WER | CER |\n"
+            f"|--------|{'-' * (len(reference_name) + 8)}|{'-' * (len(hypothesis_name) + 8)}|-----|-----|\n"
+            + "\n".join(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WER/CER of one timestamped transcript against another")
+    parser.add_argument("reference", help="Reference transcript file (e.g. YouTube)")
+    parser.add_argument("hypothesis", help="Transcript file to score (e.g. Whisper)")
+    parser.add_argument("--window-seconds", type=int, default=DEFAULT_WINDOW_SECONDS, help="Length of each window")
+    parser.add_argument("--json", action="store_true", help="Print the metrics as JSON instead of a table")
+
+    args = parser.parse_args()
+
+    with open(args.reference, encoding="utf-8") as f:
+        reference = f.read()
+    with open(args.hypothesis, encoding="utf-8") as f:
+        hypothesis = f.read()
+    metrics = compare(reference, hypothesis, args.window_seconds)
+    print(json.dumps(metrics, indent=2) if args.json else metrics_table(metrics, "Reference", "Hypothesis"))
+
+
+if __name__ == "__main__":
+    main()